@@ -2,83 +2,258 @@ import ast
 import inspect
 import os
 import re
+from functools import lru_cache
 from string import Template
-from typing import List, Callable, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-import click
-from dotenv import load_dotenv
-from openai import OpenAI
 import platform
 
+import file_edit
+from agent_events import DEBUG, NORMAL, QUIET, EventCallback, bind_arguments, usage_dict
+from llm_client import create_client
 from prompt_template import react_system_prompt_template
+from terminal import TerminalBackend
+
+
+# parse_action 回退路径使用的正则：顶层需要关注的字符、各种引号的字符串主体、关键字参数、转义序列
+_ACTION_TOKEN = re.compile(r"""["'()\[\]{},]""")
+_STRING_BODY = {
+    '"': re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL),
+    "'": re.compile(r"[^'\\]*(?:\\.[^'\\]*)*'", re.DOTALL),
+    '"""': re.compile(r'[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*"""', re.DOTALL),
+    "'''": re.compile(r"[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*'''", re.DOTALL),
+}
+_KEYWORD_ARG = re.compile(r"([A-Za-z_]\w*)\s*=(?!=)\s*(.*)", re.DOTALL)
+_ESCAPE_SEQUENCE = re.compile(r"\\(.)", re.DOTALL)
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "\\": "\\", '"': '"', "'": "'"}
+
+
+def _unescape(match) -> str:
+    char = match.group(1)
+    return _ESCAPES.get(char, "\\" + char)
+
+
+@lru_cache(maxsize=None)
+def describe_tool(func) -> str:
+    """工具在系统提示中的一行说明；优先使用 week4 工具注册表预先生成的文本，每个函数只计算一次"""
+    description = getattr(func, "react_description", None)
+    if description is not None:
+        return description
+    return f"- {func.__name__}{inspect.signature(func)}: {inspect.getdoc(func)}"
+
+
+class ReActStreamParser:
+    """增量解析流式输出中的 <thought>/<action>/<final_answer> 标签，遇到完整的结束标签即判定为完成"""
+
+    CLOSING_TAGS = ("</action>", "</final_answer>")
+    _MAX_TAG_LEN = max(len(tag) for tag in CLOSING_TAGS)
+
+    def __init__(self):
+        self.buffer = ""
+        self.thought = None
+        self.done = False
+        self.dropped = ""
+        # finish() 补回的结束标签（服务端按 stop 序列停止时，结束标签本身不会出现在输出中）
+        self.restored_tag = None
+
+    def feed(self, text: str) -> bool:
+        """追加一段增量文本，返回是否已经收到完整的 </action> 或 </final_answer>"""
+        if self.done:
+            self.dropped += text
+            return True
+
+        # 只在新增部分（加上可能跨 chunk 的标签长度）中查找，保证整体线性
+        scan_from = max(0, len(self.buffer) - self._MAX_TAG_LEN)
+        self.buffer += text
+
+        if self.thought is None:
+            end = self.buffer.find("</thought>", scan_from)
+            if end != -1:
+                start = self.buffer.find("<thought>")
+                self.thought = self.buffer[start + len("<thought>"):end] if start != -1 else ""
+
+        positions = [(self.buffer.find(tag, scan_from), tag) for tag in self.CLOSING_TAGS]
+        positions = [(idx, tag) for idx, tag in positions if idx != -1]
+        if positions:
+            idx, tag = min(positions)
+            end = idx + len(tag)
+            self.dropped = self.buffer[end:]
+            self.buffer = self.buffer[:end]
+            self.done = True
+        return self.done
+
+    def finish(self) -> str:
+        """结束解析；被 stop 序列截掉的结束标签在这里补回"""
+        if not self.done:
+            for tag in ("action", "final_answer"):
+                if f"<{tag}>" in self.buffer and f"</{tag}>" not in self.buffer:
+                    self.restored_tag = f"</{tag}>"
+                    self.buffer += self.restored_tag
+        return self.buffer
+
+    def stopped_at_tag(self, finish_reason: Optional[str]) -> bool:
+        """
+        生成是否在结束标签处提前停止：客户端自己收到了完整的结束标签，
+        或者服务端命中 stop 序列（finish_reason 为 stop 且结束标签需要补回）。需要先调用 finish()
+        """
+        return self.done or (finish_reason == "stop" and self.restored_tag is not None)
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+class _NoopTracer:
+    """未传入 tracer 时使用，接口与 week4/tracing.py 的 Tracer 相同"""
+    enabled = False
+
+    def span(self, name: str, **attributes):
+        return _NoopSpan()
+
+
+# 输出级别（QUIET / NORMAL / DEBUG）和事件结构定义在 agent_events.py，与 FunctionCallingAgent 共用
+# NORMAL 级别下观察结果最多显示的字符数
+OBSERVATION_PREVIEW_CHARS = 200
 
-load_dotenv()
 
 class ReActAgent:
-    def __init__(self, tools: List[Callable], model: str, project_directory: str):
-        self.tools = { func.__name__: func for func in tools }
+    # 流式模式下传给 API 的 stop 序列
+    STOP_SEQUENCES = ["</action>", "</final_answer>"]
+
+    def __init__(self, tools: List[Callable], model: str, project_directory: str, stream: bool = False,
+                 client=None, tracer=None, verbosity: int = NORMAL,
+                 on_model_call: Optional[EventCallback] = None,
+                 on_tool_call: Optional[EventCallback] = None,
+                 on_final: Optional[EventCallback] = None):
+        # 按名称排序，保证工具列表顺序稳定，系统提示前缀在多次运行间字节一致
+        self.tools = { func.__name__: func for func in sorted(tools, key=lambda f: f.__name__) }
         self.model = model
         self.project_directory = project_directory
-        self.client = OpenAI(
-            base_url=os.getenv("BASE_URL"),
-            api_key=os.getenv("OPENAI_API_KEY"),
-        )
+        self._client = client
+        self.stream = stream
+        self.tracer = tracer or _NoopTracer()
+        self.verbosity = verbosity
+        self.hooks = {"on_model_call": on_model_call, "on_tool_call": on_tool_call, "on_final": on_final}
+        self._system_prompt = None
+        self.token_usage = self._empty_token_usage()
+
+    @property
+    def client(self):
+        """首次调用模型时才创建客户端：openai 的导入推迟到真正需要的时候"""
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    def _create_client(self):
+        return create_client()
+
+    @property
+    def system_prompt(self) -> str:
+        """系统提示只渲染一次并缓存，使请求前缀可以命中服务端的 prompt caching"""
+        if self._system_prompt is None:
+            self._system_prompt = self.render_system_prompt(react_system_prompt_template)
+        return self._system_prompt
 
     def run(self, user_input: str):
+        with self.tracer.span("task", agent="react", model=self.model, query_chars=len(user_input)) as task_span:
+            final_answer = self._run(user_input)
+            task_span.set(**self.token_usage)
+            return final_answer
+
+    def _run(self, user_input: str):
+        self.token_usage = self._empty_token_usage()
         messages = [
-            {"role": "system", "content": self.render_system_prompt(react_system_prompt_template)},
+            {"role": "system", "content": self.system_prompt},
             {"role": "user", "content": f"<question>{user_input}</question>"}
         ]
-        print(self.render_system_prompt(react_system_prompt_template))
+        if self.verbosity >= DEBUG:
+            print(self.system_prompt)
 
+        iteration = 0
         while True:
+            iteration += 1
 
             # 请求模型
-            content = self.call_model(messages)
+            with self.tracer.span("model_call", iteration=iteration, messages=len(messages)) as span:
+                if self.tracer.enabled:
+                    span.set(payload_chars=sum(len(m["content"]) for m in messages))
+                usage_before = dict(self.token_usage)
+                content = self.call_model(messages)
+                usage = {key: self.token_usage[key] - usage_before[key]
+                         for key in ("prompt_tokens", "cached_tokens", "completion_tokens")}
+                span.set(**usage)
+            self._emit("on_model_call", iteration=iteration, content=content, usage=usage)
 
             # 检测 Thought
-            thought_match = re.search(r"<thought>(.*?)</thought>", content, re.DOTALL)
-            if thought_match:
-                thought = thought_match.group(1)
-                print(f"\n\n💭 Thought: {thought}")
+            if self.verbosity >= NORMAL:
+                thought_match = re.search(r"<thought>(.*?)</thought>", content, re.DOTALL)
+                if thought_match:
+                    thought = thought_match.group(1)
+                    print(f"\n\n💭 Thought: {thought}")
 
             # 检测模型是否输出 Final Answer，如果是的话，直接返回
             if "<final_answer>" in content:
-                final_answer = re.search(r"<final_answer>(.*?)</final_answer>", content, re.DOTALL)
-                return final_answer.group(1)
+                final_answer = re.search(r"<final_answer>(.*?)</final_answer>", content, re.DOTALL).group(1)
+                self._emit("on_final", answer=final_answer, iterations=iteration)
+                return final_answer
 
             # 检测 Action
-            action_match = re.search(r"<action>(.*?)</action>", content, re.DOTALL)
-            if not action_match:
-                raise RuntimeError("模型未输出 <action>")
-            action = action_match.group(1)
-            tool_name, args = self.parse_action(action)
+            with self.tracer.span("parse", payload_chars=len(content)):
+                action_match = re.search(r"<action>(.*?)</action>", content, re.DOTALL)
+                if not action_match:
+                    raise RuntimeError("模型未输出 <action>")
+                action = action_match.group(1)
+                tool_name, args, kwargs = self.parse_action(action)
 
-            print(f"\n\n🔧 Action: {tool_name}({', '.join(args)})")
+            if self.verbosity >= NORMAL:
+                arg_list = [str(arg) for arg in args] + [f"{key}={value}" for key, value in kwargs.items()]
+                print(f"\n\n🔧 Action: {tool_name}({', '.join(arg_list)})")
             # 只有终端命令才需要询问用户，其他的工具直接执行
             should_continue = input(f"\n\n是否继续？（Y/N）") if tool_name == "run_terminal_command" else "y"
             if should_continue.lower() != 'y':
-                print("\n\n操作已取消。")
+                if self.verbosity >= NORMAL:
+                    print("\n\n操作已取消。")
                 return "操作被用户取消"
 
-            try:
-                observation = self.tools[tool_name](*args)
-            except Exception as e:
-                observation = f"工具执行错误：{str(e)}"
-            print(f"\n\n🔍 Observation：{observation}")
-            obs_msg = f"<observation>{observation}</observation>"
-            messages.append({"role": "user", "content": obs_msg})
+            with self.tracer.span("tool_call", tool=tool_name) as span:
+                try:
+                    observation = self.tools[tool_name](*args, **kwargs)
+                except Exception as e:
+                    observation = f"工具执行错误：{str(e)}"
+                span.set(result_chars=len(str(observation)))
+            self._emit("on_tool_call", iteration=iteration, tool=tool_name,
+                       arguments=bind_arguments(self.tools.get(tool_name), args, kwargs), result=observation)
+            if self.verbosity >= DEBUG:
+                print(f"\n\n🔍 Observation：{observation}")
+            elif self.verbosity >= NORMAL:
+                preview = str(observation)
+                if len(preview) > OBSERVATION_PREVIEW_CHARS:
+                    preview = preview[:OBSERVATION_PREVIEW_CHARS] + f"...（共 {len(preview)} 个字符）"
+                print(f"\n\n🔍 Observation：{preview}")
+            # 组装下一次请求的消息历史（每轮一个 span）
+            with self.tracer.span("history", iteration=iteration) as span:
+                obs_msg = f"<observation>{observation}</observation>"
+                messages.append({"role": "user", "content": obs_msg})
+                span.set(messages=len(messages))
+                if self.tracer.enabled:
+                    span.set(payload_chars=sum(len(m["content"]) for m in messages))
 
+    def _emit(self, event: str, **payload):
+        """触发事件回调；未注册回调时没有任何开销"""
+        callback = self.hooks[event]
+        if callback is not None:
+            callback(payload)
 
     def get_tool_list(self) -> str:
         """生成工具列表字符串，包含函数签名和简要说明"""
-        tool_descriptions = []
-        for func in self.tools.values():
-            name = func.__name__
-            signature = str(inspect.signature(func))
-            doc = inspect.getdoc(func)
-            tool_descriptions.append(f"- {name}{signature}: {doc}")
-        return "\n".join(tool_descriptions)
+        return "\n".join(describe_tool(func) for func in self.tools.values())
 
     def render_system_prompt(self, system_prompt_template: str) -> str:
         """渲染系统提示模板，替换变量"""
@@ -91,80 +266,174 @@ class ReActAgent:
         )
 
     def call_model(self, messages):
-        print("\n\n正在请求模型，请稍等...")
-        response = self.client.chat.completions.create(
+        if self.verbosity >= NORMAL:
+            print("\n\n正在请求模型，请稍等...")
+        if self.stream:
+            content = self.call_model_streaming(messages)
+        else:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+            )
+            self.record_usage(response.usage)
+            content = self._truncate_after_closing_tag(response.choices[0].message.content, response.usage)
+        messages.append({"role": "assistant", "content": content})
+        return content
+
+    def call_model_streaming(self, messages) -> str:
+        """流式请求模型，一旦收到完整的 </action> 或 </final_answer> 就关闭连接，不再为多余输出付费"""
+        stream = self.client.chat.completions.create(
             model=self.model,
             messages=messages,
+            stop=self.STOP_SEQUENCES,
+            stream=True,
+            stream_options={"include_usage": True},
         )
-        content = response.choices[0].message.content
-        messages.append({"role": "assistant", "content": content})
+        parser = ReActStreamParser()
+        chunk_count = 0
+        finish_reason = None
+        try:
+            for chunk in stream:
+                if chunk.usage is not None:
+                    self.record_usage(chunk.usage)
+                if not chunk.choices:
+                    continue
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                chunk_count += 1
+                if parser.feed(delta):
+                    if self.verbosity >= DEBUG:
+                        print(f"\n\n⏹ 已收到完整标签，提前结束生成（共 {chunk_count} 个 chunk）")
+                    break
+        finally:
+            stream.close()
+
+        # 同一个 chunk 中结束标签之后的内容属于多余输出，按字符数粗略折算
+        if parser.dropped:
+            self.token_usage["wasted_output_tokens"] += max(1, len(parser.dropped) // 4)
+        content = parser.finish()
+        if parser.stopped_at_tag(finish_reason):
+            self.token_usage["early_stops"] += 1
         return content
 
-    def parse_action(self, code_str: str) -> Tuple[str, List[str]]:
-        match = re.match(r'(\w+)\((.*)\)', code_str, re.DOTALL)
+    def _truncate_after_closing_tag(self, content: str, usage) -> str:
+        """非流式模式下，丢弃结束标签之后的多余输出（例如模型自己编造的 <observation>），并统计浪费的输出 token"""
+        parser = ReActStreamParser()
+        parser.feed(content)
+        if parser.dropped.strip():
+            completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+            wasted = round(completion_tokens * len(parser.dropped) / len(content)) if content else 0
+            self.token_usage["wasted_output_tokens"] += wasted
+            if self.verbosity >= DEBUG:
+                print(f"\n\n✂️ 丢弃结束标签之后的多余输出（约 {wasted} tokens），使用 stream=True 可以避免生成这部分内容")
+        return parser.finish()
+
+    @staticmethod
+    def _empty_token_usage() -> dict:
+        return {"prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "calls": 0,
+                "early_stops": 0, "wasted_output_tokens": 0}
+
+    def record_usage(self, usage) -> Dict[str, int]:
+        """从 API 返回的 usage 中累计 prompt（命中缓存/未命中）与 completion token 数，返回本次调用的 usage 字典"""
+        call_usage = usage_dict(usage)
+        if usage is None:
+            return call_usage
+        prompt_tokens, cached_tokens = call_usage["prompt_tokens"], call_usage["cached_tokens"]
+
+        for key, value in call_usage.items():
+            self.token_usage[key] += value
+        self.token_usage["calls"] += 1
+
+        if self.verbosity >= DEBUG:
+            print(f"\n\n📦 Prompt tokens: {prompt_tokens}（缓存命中 {cached_tokens}，未命中 {prompt_tokens - cached_tokens}）")
+        return call_usage
+
+    @staticmethod
+    def parse_action(code_str: str) -> Tuple[str, List[Any], Dict[str, Any]]:
+        """解析 <action> 中的函数调用，返回 (函数名, 位置参数, 关键字参数)"""
+        code_str = code_str.strip()
+
+        # 快速路径：合法的 Python 调用表达式直接交给 ast 解析（C 实现，线性时间）
+        try:
+            call = ast.parse(code_str, mode="eval").body
+        except SyntaxError:
+            call = None
+        if isinstance(call, ast.Call) and isinstance(call.func, ast.Name):
+            # *args / **kwargs 展开无法还原成具体参数，静默丢弃会让工具缺少参数运行
+            if any(isinstance(arg, ast.Starred) for arg in call.args) or any(kw.arg is None for kw in call.keywords):
+                raise ValueError("Argument unpacking (*args / **kwargs) is not supported in actions; "
+                                 "pass each argument explicitly")
+            try:
+                args = [ast.literal_eval(arg) for arg in call.args]
+                kwargs = {kw.arg: ast.literal_eval(kw.value) for kw in call.keywords}
+                return call.func.id, args, kwargs
+            except ValueError:
+                pass
+
+        # 回退路径：字符串里常有真实换行等 Python 不接受的内容，用单遍扫描切分参数
+        return ReActAgent._tokenize_action(code_str)
+
+    @staticmethod
+    def _tokenize_action(code_str: str) -> Tuple[str, List[Any], Dict[str, Any]]:
+        """单遍扫描参数列表：用正则整段跳过字符串字面量，只在顶层逗号处切片，不逐字符拼接"""
+        match = re.match(r'(\w+)\s*\((.*)\)', code_str, re.DOTALL)
         if not match:
             raise ValueError("Invalid function call syntax")
 
         func_name = match.group(1)
-        args_str = match.group(2).strip()
-
-        # 手动解析参数，特别处理包含多行内容的字符串
-        args = []
-        current_arg = ""
-        in_string = False
-        string_char = None
-        i = 0
-        paren_depth = 0
-        
-        while i < len(args_str):
-            char = args_str[i]
-            
-            if not in_string:
-                if char in ['"', "'"]:
-                    in_string = True
-                    string_char = char
-                    current_arg += char
-                elif char == '(':
-                    paren_depth += 1
-                    current_arg += char
-                elif char == ')':
-                    paren_depth -= 1
-                    current_arg += char
-                elif char == ',' and paren_depth == 0:
-                    # 遇到顶层逗号，结束当前参数
-                    args.append(self._parse_single_arg(current_arg.strip()))
-                    current_arg = ""
-                else:
-                    current_arg += char
-            else:
-                current_arg += char
-                if char == string_char and (i == 0 or args_str[i-1] != '\\'):
-                    in_string = False
-                    string_char = None
-            
-            i += 1
-        
+        args_str = match.group(2)
+
+        args, kwargs = [], {}
+        pos = segment_start = depth = 0
+        while True:
+            token = _ACTION_TOKEN.search(args_str, pos)
+            if not token:
+                break
+            char = token.group()
+            pos = token.end()
+            if char in "\"'":
+                quote = char * 3 if args_str.startswith(char * 3, token.start()) else char
+                body = _STRING_BODY[quote].match(args_str, token.start() + len(quote))
+                if not body:
+                    raise ValueError("Unterminated string literal in action")
+                pos = body.end()
+            elif char in "([{":
+                depth += 1
+            elif char in ")]}":
+                depth -= 1
+            elif depth == 0:
+                # 遇到顶层逗号，结束当前参数
+                ReActAgent._add_arg(args_str[segment_start:token.start()], args, kwargs)
+                segment_start = pos
+
         # 添加最后一个参数
-        if current_arg.strip():
-            args.append(self._parse_single_arg(current_arg.strip()))
-        
-        return func_name, args
-    
-    def _parse_single_arg(self, arg_str: str):
+        ReActAgent._add_arg(args_str[segment_start:], args, kwargs)
+        return func_name, args, kwargs
+
+    @staticmethod
+    def _add_arg(arg_str: str, args: List[Any], kwargs: Dict[str, Any]):
+        arg_str = arg_str.strip()
+        if not arg_str:
+            return
+        keyword = _KEYWORD_ARG.match(arg_str)
+        if keyword:
+            kwargs[keyword.group(1)] = ReActAgent._parse_single_arg(keyword.group(2))
+        else:
+            args.append(ReActAgent._parse_single_arg(arg_str))
+
+    @staticmethod
+    def _parse_single_arg(arg_str: str):
         """解析单个参数"""
         arg_str = arg_str.strip()
-        
-        # 如果是字符串字面量
-        if (arg_str.startswith('"') and arg_str.endswith('"')) or \
-           (arg_str.startswith("'") and arg_str.endswith("'")):
-            # 移除外层引号并处理转义字符
-            inner_str = arg_str[1:-1]
-            # 处理常见的转义字符
-            inner_str = inner_str.replace('\\"', '"').replace("\\'", "'")
-            inner_str = inner_str.replace('\\n', '\n').replace('\\t', '\t')
-            inner_str = inner_str.replace('\\r', '\r').replace('\\\\', '\\')
-            return inner_str
-        
+
+        # 如果是字符串字面量，移除外层引号并一次性处理转义字符
+        for quote in ('"""', "'''", '"', "'"):
+            if len(arg_str) >= 2 * len(quote) and arg_str.startswith(quote) and arg_str.endswith(quote):
+                inner_str = arg_str[len(quote):-len(quote)]
+                return _ESCAPE_SEQUENCE.sub(_unescape, inner_str)
+
         # 尝试使用 ast.literal_eval 解析其他类型
         try:
             return ast.literal_eval(arg_str)
@@ -193,15 +462,27 @@ def write_to_file(file_path, content):
         f.write(content.replace("\\n", "\n"))
     return "写入成功"
 
+def edit_file(file_path, search="", replace="", diff=""):
+    """修改文件的一部分而不重写整个文件（修改已有文件时优先使用，比 write_to_file 输出少得多）：search 为文件中恰好出现一次的原文，replace 为替换后的内容；也可以不传 search，改为传入 unified diff"""
+    if diff:
+        return file_edit.edit_file(file_path, diff=diff)
+    return file_edit.edit_file(file_path, edits=[{"search": search, "replace": replace}])
+
+_terminal = TerminalBackend()
+
+
+def set_terminal_backend(backend: TerminalBackend):
+    """替换 run_terminal_command 使用的执行后端（超时、输出上限、常驻 shell 等）"""
+    global _terminal
+    _terminal.close()
+    _terminal = backend
+
+
 def run_terminal_command(command):
     """用于执行终端命令"""
-    import subprocess
-    run_result = subprocess.run(command, shell=True, capture_output=True, text=True)
-    return "执行成功" if run_result.returncode == 0 else run_result.stderr
+    return _terminal.run(command).to_observation()
 
-@click.command()
-@click.argument('project_directory',type=click.Path(file_okay=False, dir_okay=True))
-def main(project_directory):
+def main(project_directory, stream, command_timeout, persistent_shell, verbosity):
     project_dir = os.path.abspath(project_directory)
     
     # 如果目录不存在，自动创建
@@ -209,8 +490,11 @@ def main(project_directory):
         os.makedirs(project_dir)
         print(f"已创建项目目录: {project_dir}")
 
-    tools = [read_file, write_to_file, run_terminal_command]
-    agent = ReActAgent(tools=tools, model="gemini-2.5-flash", project_directory=project_dir)
+    set_terminal_backend(TerminalBackend(timeout=command_timeout, persistent_shell=persistent_shell, cwd=project_dir))
+
+    tools = [read_file, write_to_file, edit_file, run_terminal_command]
+    agent = ReActAgent(tools=tools, model="gemini-2.5-flash", project_directory=project_dir, stream=stream,
+                       verbosity=verbosity)
 
     task = input("请输入任务：")
 
@@ -218,5 +502,26 @@ def main(project_directory):
 
     print(f"\n\n✅ Final Answer：{final_answer}")
 
+    usage = agent.token_usage
+    print(f"\n📊 Prompt tokens: {usage['prompt_tokens']}（缓存命中 {usage['cached_tokens']}），"
+          f"Completion tokens: {usage['completion_tokens']}，模型调用 {usage['calls']} 次")
+    print(f"📊 提前停止生成 {usage['early_stops']} 次，浪费的输出 tokens 约 {usage['wasted_output_tokens']}")
+
+def cli():
+    """命令行入口；click 只在作为脚本运行时才导入，其他模块 import agent 时不承担这部分开销"""
+    import click
+
+    @click.command()
+    @click.argument('project_directory',type=click.Path(file_okay=False, dir_okay=True))
+    @click.option('--stream/--no-stream', default=False, help='流式请求模型，收到完整的 </action> 后立即停止生成')
+    @click.option('--command-timeout', default=120.0, show_default=True, help='终端命令超时时间（秒）')
+    @click.option('--persistent-shell/--no-persistent-shell', default=False, help='所有终端命令复用同一个 shell 会话')
+    @click.option('--verbosity', type=click.IntRange(QUIET, DEBUG), default=NORMAL, show_default=True,
+                  help='控制台输出级别：0 静默，1 常规，2 调试（含系统提示和完整观察结果）')
+    def command(project_directory, stream, command_timeout, persistent_shell, verbosity):
+        main(project_directory, stream, command_timeout, persistent_shell, verbosity)
+
+    command()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
\ No newline at end of file
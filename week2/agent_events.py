@@ -0,0 +1,46 @@
+"""
+Agent 的控制台输出级别与事件回调
+ReActAgent、AsyncReActAgent 和 week4 的 FunctionCallingAgent 共用这里的常量和事件结构，
+同一个回调函数可以挂到任意一种 agent 上。回调接收一个字典：
+
+    on_model_call: {"iteration", "content", "usage"}
+    on_tool_call:  {"iteration", "tool", "arguments", "result"}
+    on_final:      {"answer", "iterations"}
+
+- usage 为本次模型调用的 {"prompt_tokens", "cached_tokens", "completion_tokens"}
+- arguments 为参数名到参数值的字典（ReAct 的位置参数按工具函数签名绑定到参数名）
+- AsyncReActAgent 的事件额外带有 "task_id"
+
+用法:
+    from agent_events import NORMAL, EventCallback
+    agent = ReActAgent(..., on_tool_call=lambda event: print(event["tool"], event["arguments"]))
+"""
+
+import inspect
+from typing import Any, Callable, Dict, List
+
+# 控制台输出级别：QUIET 不输出任何内容，NORMAL 常规输出（工具结果截断），DEBUG 额外输出系统提示和完整工具结果
+QUIET, NORMAL, DEBUG = 0, 1, 2
+
+# 事件回调：接收一个描述事件的字典
+EventCallback = Callable[[Dict[str, Any]], None]
+
+
+def usage_dict(usage) -> Dict[str, int]:
+    """把 API 返回的 usage 对象转换为事件中的 usage 字典；usage 缺失的字段按 0 计"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details else 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+    }
+
+
+def bind_arguments(func, args: List[Any], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """把位置参数和关键字参数合并为参数名到值的字典；签名不匹配时位置参数记为 arg0、arg1 ..."""
+    if func is not None:
+        try:
+            return dict(inspect.signature(func).bind(*args, **kwargs).arguments)
+        except (TypeError, ValueError):
+            pass
+    return {**{f"arg{i}": value for i, value in enumerate(args)}, **kwargs}
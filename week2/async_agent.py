@@ -0,0 +1,174 @@
+"""
+异步版 ReAct Agent
+模型调用与工具调用都是异步的，一个进程可以同时驱动多个互不相关的任务；
+run_terminal_command 的确认由可替换的异步审批回调完成，不再阻塞在 input() 上
+"""
+
+import asyncio
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from agent import ReActAgent, ReActStreamParser
+from agent_events import NORMAL, EventCallback, bind_arguments, usage_dict
+from llm_client import create_client
+
+# 审批回调：接收 (工具名, 位置参数, 关键字参数)，返回是否允许执行
+ApprovalCallback = Callable[[str, List[Any], Dict[str, Any]], Awaitable[bool]]
+
+# 需要审批才能执行的工具
+TOOLS_REQUIRING_APPROVAL = {"run_terminal_command"}
+
+
+async def console_approval(tool_name: str, args: List[Any], kwargs: Dict[str, Any]) -> bool:
+    """默认审批方式：在线程中读取终端输入，不阻塞事件循环"""
+    answer = await asyncio.to_thread(input, f"\n\n是否继续执行 {tool_name}？（Y/N）")
+    return answer.lower() == "y"
+
+
+async def auto_approve(tool_name: str, args: List[Any], kwargs: Dict[str, Any]) -> bool:
+    """自动批准所有操作，用于批量任务和压测"""
+    return True
+
+
+class AsyncReActAgent(ReActAgent):
+    def __init__(self, tools: List[Callable], model: str, project_directory: str, stream: bool = False,
+                 client=None, approval_callback: Optional[ApprovalCallback] = None, tracer=None,
+                 verbosity: int = NORMAL, on_model_call: Optional[EventCallback] = None,
+                 on_tool_call: Optional[EventCallback] = None, on_final: Optional[EventCallback] = None):
+        super().__init__(
+            tools=tools,
+            model=model,
+            project_directory=project_directory,
+            stream=stream,
+            client=client,
+            tracer=tracer,
+            verbosity=verbosity,
+            on_model_call=on_model_call,
+            on_tool_call=on_tool_call,
+            on_final=on_final,
+        )
+        self.approval_callback = approval_callback or console_approval
+
+    def _create_client(self):
+        return create_client(async_client=True)
+
+    async def run(self, user_input: str, task_id: str = "task"):
+        """处理单个任务；多个 run 可以在同一个事件循环里并发执行，token_usage 在它们之间累计"""
+        with self.tracer.span("task", agent="async_react", model=self.model, task_id=task_id,
+                              query_chars=len(user_input)):
+            return await self._run(user_input, task_id)
+
+    async def _run(self, user_input: str, task_id: str):
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": f"<question>{user_input}</question>"}
+        ]
+
+        iteration = 0
+        while True:
+            iteration += 1
+            # 多个任务并发时 token_usage 是共享的，所以本次调用的 usage 单独收集
+            usage = usage_dict(None)
+            with self.tracer.span("model_call", messages=len(messages)):
+                content = await self.call_model(messages, usage)
+            self._emit("on_model_call", task_id=task_id, iteration=iteration, content=content, usage=usage)
+
+            if self.verbosity >= NORMAL:
+                thought_match = re.search(r"<thought>(.*?)</thought>", content, re.DOTALL)
+                if thought_match:
+                    print(f"\n\n[{task_id}] 💭 Thought: {thought_match.group(1)}")
+
+            if "<final_answer>" in content:
+                final_answer = re.search(r"<final_answer>(.*?)</final_answer>", content, re.DOTALL).group(1)
+                self._emit("on_final", task_id=task_id, answer=final_answer, iterations=iteration)
+                return final_answer
+
+            action_match = re.search(r"<action>(.*?)</action>", content, re.DOTALL)
+            if not action_match:
+                raise RuntimeError("模型未输出 <action>")
+            with self.tracer.span("parse", payload_chars=len(content)):
+                tool_name, args, kwargs = self.parse_action(action_match.group(1))
+            if self.verbosity >= NORMAL:
+                print(f"\n\n[{task_id}] 🔧 Action: {tool_name}")
+
+            if tool_name in TOOLS_REQUIRING_APPROVAL and not await self.approval_callback(tool_name, args, kwargs):
+                if self.verbosity >= NORMAL:
+                    print(f"\n\n[{task_id}] 操作已取消。")
+                return "操作被用户取消"
+
+            with self.tracer.span("tool_call", tool=tool_name) as span:
+                observation = await self.call_tool(tool_name, args, kwargs)
+                span.set(result_chars=len(str(observation)))
+            self._emit("on_tool_call", task_id=task_id, iteration=iteration, tool=tool_name,
+                       arguments=bind_arguments(self.tools.get(tool_name), args, kwargs), result=observation)
+            # 组装下一次请求的消息历史（每轮一个 span）
+            with self.tracer.span("history", iteration=iteration) as span:
+                messages.append({"role": "user", "content": f"<observation>{observation}</observation>"})
+                span.set(messages=len(messages))
+                if self.tracer.enabled:
+                    span.set(payload_chars=sum(len(m["content"]) for m in messages))
+
+    async def run_many(self, tasks: List[str], concurrency: int = 8) -> List[Any]:
+        """并发处理多个任务，最多同时运行 concurrency 个；单个任务失败不会影响其他任务"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(index: int, task: str):
+            async with semaphore:
+                return await self.run(task, task_id=f"task-{index}")
+
+        return await asyncio.gather(
+            *(run_one(i, task) for i, task in enumerate(tasks)),
+            return_exceptions=True,
+        )
+
+    async def call_tool(self, tool_name: str, args: List[Any], kwargs: Dict[str, Any]) -> str:
+        """工具函数是同步的，放到线程池里执行，避免阻塞其他任务"""
+        try:
+            return await asyncio.to_thread(self.tools[tool_name], *args, **kwargs)
+        except Exception as e:
+            return f"工具执行错误：{str(e)}"
+
+    async def call_model(self, messages, call_usage: Optional[Dict[str, int]] = None):
+        """call_usage 不为 None 时写入本次调用的 usage"""
+        if self.stream:
+            content = await self.call_model_streaming(messages, call_usage)
+        else:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+            )
+            self._record_call_usage(response.usage, call_usage)
+            content = self._truncate_after_closing_tag(response.choices[0].message.content, response.usage)
+        messages.append({"role": "assistant", "content": content})
+        return content
+
+    def _record_call_usage(self, usage, call_usage: Optional[Dict[str, int]]):
+        recorded = self.record_usage(usage)
+        if call_usage is not None:
+            call_usage.update(recorded)
+
+    async def call_model_streaming(self, messages, call_usage: Optional[Dict[str, int]] = None) -> str:
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            stop=self.STOP_SEQUENCES,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        parser = ReActStreamParser()
+        finish_reason = None
+        try:
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    self._record_call_usage(chunk.usage, call_usage)
+                if chunk.choices:
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if parser.feed(chunk.choices[0].delta.content):
+                        break
+        finally:
+            await stream.close()
+        content = parser.finish()
+        if parser.stopped_at_tag(finish_reason):
+            self.token_usage["early_stops"] += 1
+        return content
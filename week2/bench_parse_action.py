@@ -0,0 +1,110 @@
+"""
+parse_action 微基准测试
+对比旧版逐字符拼接解析器与新版（ast 快速路径 + 单遍扫描回退）在 1 MB 参数上的耗时
+
+用法: python bench_parse_action.py [--size-kb 1024] [--repeat 5]
+"""
+
+import argparse
+import ast
+import statistics
+import time
+
+from agent import ReActAgent
+
+
+def legacy_parse_action(code_str: str):
+    """旧版实现（逐字符拼接 + 链式 replace），仅作为基准对照"""
+    import re
+    match = re.match(r'(\w+)\((.*)\)', code_str, re.DOTALL)
+    func_name = match.group(1)
+    args_str = match.group(2).strip()
+
+    args = []
+    current_arg = ""
+    in_string = False
+    string_char = None
+    i = 0
+    paren_depth = 0
+    while i < len(args_str):
+        char = args_str[i]
+        if not in_string:
+            if char in ['"', "'"]:
+                in_string = True
+                string_char = char
+                current_arg += char
+            elif char == '(':
+                paren_depth += 1
+                current_arg += char
+            elif char == ')':
+                paren_depth -= 1
+                current_arg += char
+            elif char == ',' and paren_depth == 0:
+                args.append(_legacy_parse_single_arg(current_arg.strip()))
+                current_arg = ""
+            else:
+                current_arg += char
+        else:
+            current_arg += char
+            if char == string_char and (i == 0 or args_str[i-1] != '\\'):
+                in_string = False
+                string_char = None
+        i += 1
+    if current_arg.strip():
+        args.append(_legacy_parse_single_arg(current_arg.strip()))
+    return func_name, args
+
+
+def _legacy_parse_single_arg(arg_str: str):
+    if (arg_str.startswith('"') and arg_str.endswith('"')) or \
+       (arg_str.startswith("'") and arg_str.endswith("'")):
+        inner_str = arg_str[1:-1]
+        inner_str = inner_str.replace('\\"', '"').replace("\\'", "'")
+        inner_str = inner_str.replace('\\n', '\n').replace('\\t', '\t')
+        inner_str = inner_str.replace('\\r', '\r').replace('\\\\', '\\')
+        return inner_str
+    try:
+        return ast.literal_eval(arg_str)
+    except (SyntaxError, ValueError):
+        return arg_str
+
+
+def make_payload(size_kb: int, raw_newlines: bool) -> str:
+    """构造一个类似 write_to_file 写代码时的 action，raw_newlines=True 时字符串里含真实换行（走回退路径）"""
+    line = 'print("hello, world")  # 注释 \\t tab\n'
+    body = line * (size_kb * 1024 // len(line.encode("utf-8")) + 1)
+    if not raw_newlines:
+        body = body.replace("\n", "\\n")
+    body = body.replace('"', '\\"')
+    return f'write_to_file(file_path="/tmp/bench.py", content="{body}")'
+
+
+def bench(func, payload: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(payload)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="parse_action 微基准测试")
+    parser.add_argument("--size-kb", type=int, default=1024, help="参数大小（KB）")
+    parser.add_argument("--repeat", type=int, default=5, help="每种情况重复次数，取中位数")
+    options = parser.parse_args()
+
+    print(f"参数大小: {options.size_kb} KB, 重复 {options.repeat} 次（中位数）")
+    print("-" * 60)
+    for label, raw_newlines in [("转义换行 (ast 快速路径)", False), ("真实换行 (单遍扫描回退)", True)]:
+        payload = make_payload(options.size_kb, raw_newlines)
+        new_time = bench(ReActAgent.parse_action, payload, options.repeat)
+        # 旧版在 1 MB 上需要数十秒，只跑一次
+        legacy_time = bench(legacy_parse_action, payload, 1)
+        print(f"{label}:")
+        print(f"  旧版: {legacy_time * 1000:8.1f} ms  (1 次)")
+        print(f"  新版: {new_time * 1000:8.1f} ms  ({legacy_time / new_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+基于 search/replace 块或 unified diff 的文件编辑
+write_to_file / write_file 要求模型输出整个文件才能改一行，输出 token 和生成延迟都随文件大小增长。
+这里只让模型输出要修改的片段：
+- search/replace：每个 search 必须在文件中恰好出现一次（找不到或有多处匹配都拒绝执行，避免改错位置）
+- unified diff：逐个 hunk 校验上下文和删除行；行号不对时在全文中查找唯一匹配的位置
+所有修改先在内存中完成，全部校验通过后写入同目录的临时文件再 rename，失败时原文件保持不变
+
+用法:
+    from file_edit import edit_file
+    edit_file("app.py", edits=[{"search": "DEBUG = True", "replace": "DEBUG = False"}])
+    edit_file("app.py", diff=unified_diff_text)
+"""
+
+import os
+import re
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_LINE = re.compile(r"[^\n]*\n|[^\n]+$")
+
+
+class EditError(ValueError):
+    """锚点文本不匹配、diff 格式错误等，文件不会被修改"""
+
+
+def atomic_write(file_path: str, content: str) -> None:
+    """写入同目录下的临时文件后 rename，读者只会看到旧文件或完整的新文件"""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(file_path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(file_path):
+            os.chmod(temp_path, os.stat(file_path).st_mode & 0o7777)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def apply_search_replace(text: str, edits: List[Dict[str, str]]) -> str:
+    """依次应用 search/replace 块，后一个块在前一个块修改后的文本上查找"""
+    for number, edit in enumerate(edits, 1):
+        if not isinstance(edit, dict):
+            raise EditError(f"edit #{number}: expected an object with 'search' and 'replace'")
+        search, replace = edit.get("search"), edit.get("replace", "")
+        if not search:
+            raise EditError(f"edit #{number}: 'search' must be a non-empty string")
+        count = text.count(search)
+        if count == 0:
+            raise EditError(f"edit #{number}: search text not found{_closest_line_hint(text, search)}")
+        if count > 1:
+            raise EditError(f"edit #{number}: search text matches {count} places, include more context")
+        text = text.replace(search, replace, 1)
+    return text
+
+
+def _closest_line_hint(text: str, search: str) -> str:
+    """找不到时提示 search 第一行在文件中的位置（通常是缩进或空白不一致）"""
+    first_line = search.strip().splitlines()[0].strip() if search.strip() else ""
+    if not first_line:
+        return ""
+    for number, line in enumerate(text.splitlines(), 1):
+        if first_line in line:
+            return f" (first line appears at line {number} with different surrounding text or whitespace)"
+    return ""
+
+
+def parse_unified_diff(diff: str) -> List[Tuple[int, List[str], List[str]]]:
+    """解析 unified diff，返回 [(旧文件起始行号, 旧行列表, 新行列表)]；--- / +++ 文件头可以省略"""
+    hunks = []
+    current = None
+    for line in _split_lines(diff):
+        line = _strip_ending(line)
+        match = _HUNK_HEADER.match(line)
+        if match:
+            current = (int(match.group(1)), [], [])
+            hunks.append(current)
+        elif current is None:
+            # 第一个 hunk 之前的 diff --git / --- / +++ 等文件头
+            continue
+        elif line.startswith("\\"):
+            # "\ No newline at end of file"
+            continue
+        elif line.startswith("-"):
+            current[1].append(line[1:])
+        elif line.startswith("+"):
+            current[2].append(line[1:])
+        elif line.startswith(" ") or line == "":
+            current[1].append(line[1:])
+            current[2].append(line[1:])
+        else:
+            raise EditError(f"invalid diff line: {line!r}")
+    if not hunks:
+        raise EditError("diff contains no hunks (expected lines starting with '@@ -a,b +c,d @@')")
+    return hunks
+
+
+def _split_lines(text: str) -> List[str]:
+    """只按 LF 分行并保留行尾（str.splitlines 还会在换页符、\\x1c 等字符处分行）"""
+    return _LINE.findall(text)
+
+
+def _strip_ending(line: str) -> str:
+    if line.endswith("\r\n"):
+        return line[:-2]
+    return line[:-1] if line.endswith("\n") else line
+
+
+def apply_unified_diff(text: str, diff: str) -> str:
+    """应用 unified diff；未改动的行保留原有行尾，hunk 中的行使用文件中占多数的行尾（LF 或 CRLF）"""
+    raw_lines = _split_lines(text)
+    lines = [_strip_ending(line) for line in raw_lines]
+    endings = [line[len(content):] for line, content in zip(raw_lines, lines)]
+    newline = "\r\n" if endings.count("\r\n") > endings.count("\n") else "\n"
+    # 后面的 hunk 按原文件行号定位，所以记录前面的 hunk 造成的行数偏移
+    offset = 0
+    for number, (start, old, new) in enumerate(parse_unified_diff(diff), 1):
+        position = _locate(lines, old, start - 1 + offset if old else start + offset)
+        if position is None:
+            raise EditError(f"hunk #{number} (line {start}): context does not match the file")
+        lines[position:position + len(old)] = new
+        endings[position:position + len(old)] = [newline] * len(new)
+        offset += len(new) - len(old)
+    # 原文件末尾没有换行时保持不变
+    if text and not text.endswith("\n") and endings:
+        endings[-1] = ""
+    return "".join(line + ending for line, ending in zip(lines, endings))
+
+
+def _locate(lines: List[str], old: List[str], expected: int) -> Optional[int]:
+    """优先使用 diff 给出的行号；不匹配时在全文中查找，只有唯一匹配才接受"""
+    if not old:
+        return min(max(expected, 0), len(lines))
+    if lines[expected:expected + len(old)] == old:
+        return expected
+    matches = [i for i in range(len(lines) - len(old) + 1) if lines[i:i + len(old)] == old]
+    return matches[0] if len(matches) == 1 else None
+
+
+def edit_file(file_path: str, edits: Optional[List[Dict[str, str]]] = None, diff: Optional[str] = None) -> str:
+    """
+    用 search/replace 块或 unified diff 修改文件，返回修改摘要
+
+    Raises:
+        EditError: 参数不合法、锚点不匹配或 diff 无法应用（文件保持不变）
+        FileNotFoundError: 文件不存在
+    """
+    if bool(edits) == bool(diff):
+        raise EditError("provide exactly one of 'edits' or 'diff'")
+    with open(file_path, "r", encoding="utf-8", newline="") as f:
+        original = f.read()
+
+    updated = apply_search_replace(original, edits) if edits else apply_unified_diff(original, diff)
+    if updated == original:
+        return f"No changes to {file_path}"
+    atomic_write(file_path, updated)
+
+    old_lines, new_lines = original.count("\n"), updated.count("\n")
+    kind = f"{len(edits)} edit(s)" if edits else "diff"
+    return f"Successfully applied {kind} to {file_path} ({new_lines - old_lines:+d} lines)"
@@ -0,0 +1,331 @@
+"""
+LLM 响应的录制 / 回放缓存
+开发时反复运行 compare.py、FunctionCallingAgent 的演示或 RAG 流程，完全相同的请求每次都会重新发给服务商。
+wrap_client 在客户端这一层加一个磁盘缓存，所有入口创建客户端时都经过它：
+- 键为请求参数（model、messages、tools、temperature 等）规范化 JSON 的 SHA-256
+- 模式由环境变量 LLM_CACHE 选择：
+    passthrough（默认）：不使用缓存，直接返回原始客户端
+    record：命中时直接返回缓存的响应，未命中时请求服务商并写入缓存
+    replay：只从缓存读取，未命中时抛出 CacheMissError，不访问网络（基准测试结果可复现）
+- 存储：SQLite 单文件（LLM_CACHE_PATH），响应 JSON 用 zlib 压缩；
+  总大小超过 LLM_CACHE_MAX_MB 时按最近最少使用的顺序淘汰
+- 流式请求（同步和异步客户端）按 chunk 录制和回放：调用方提前 close 时只录制已经收到的 chunk，
+  流在中途出错时不写入缓存（否则之后每次回放都是截断的输出）
+
+用法:
+    client = wrap_client(OpenAI(...))
+    LLM_CACHE=record python compare.py    # 第一次运行时录制
+    LLM_CACHE=replay python compare.py    # 之后离线回放
+    python llm_cache.py --stats | --clear
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+MODES = ("passthrough", "record", "replay")
+LLM_CACHE_MODE = os.getenv("LLM_CACHE", "passthrough")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".llm_cache.sqlite"))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "256"))
+
+# 不影响模型输出的请求参数，不参与计算缓存键
+_IGNORED_PARAMS = {"timeout", "extra_headers", "extra_query"}
+
+
+class CacheMissError(RuntimeError):
+    """replay 模式下请求不在缓存中"""
+
+
+def _jsonable(value: Any) -> Any:
+    # 历史消息里可能有 SDK 返回的 pydantic 对象（例如 Function Calling 的 assistant 消息）
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def request_key(params: Dict[str, Any]) -> str:
+    """请求参数的规范化 JSON（键排序、去掉无关参数）的 SHA-256"""
+    canonical = {key: value for key, value in params.items() if key not in _IGNORED_PARAMS and value is not None}
+    text = json.dumps(canonical, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=_jsonable)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# ============= 存储 =============
+class ResponseCache:
+    def __init__(self, path: str = LLM_CACHE_PATH, max_bytes: int = int(LLM_CACHE_MAX_MB * 1024 * 1024)):
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = None
+        self._pid = None
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        # 连接不能跨 fork 使用，进程池的子进程各自重新连接
+        if self._db is None or self._pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, model TEXT, value BLOB NOT NULL, "
+                "size INTEGER NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL, hits INTEGER DEFAULT 0)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self._pid = os.getpid()
+        return self._db
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            db = self._connection()
+            row = db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            db.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+            self.stats["hits"] += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, model: Optional[str], data: Any) -> None:
+        value = zlib.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            db = self._connection()
+            db.execute("INSERT OR REPLACE INTO responses (key, model, value, size, created, last_used) "
+                       "VALUES (?, ?, ?, ?, ?, ?)", (key, model, value, len(value), now, now))
+            self.stats["stores"] += 1
+            self._evict(db)
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        """超过上限时删除最久未使用的条目，直到总大小降到上限的 90%"""
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * 0.9)
+        doomed, freed = [], 0
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if freed >= target:
+                break
+            doomed.append((key,))
+            freed += size
+        db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.stats["evictions"] += len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection().execute("DELETE FROM responses")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_mb": size / 1024 / 1024,
+            "max_mb": self.max_bytes / 1024 / 1024,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_cache(path: str = LLM_CACHE_PATH) -> ResponseCache:
+    """同一进程内的所有客户端共享一个缓存实例"""
+    return ResponseCache(path)
+
+
+# ============= 响应的序列化 =============
+def _dump(response) -> Optional[Dict[str, Any]]:
+    return response.model_dump(mode="json") if hasattr(response, "model_dump") else None
+
+
+def _restore(data: Dict[str, Any], stream_class):
+    """还原为 SDK 的响应类型，调用方拿到的对象与直接请求时一致；流式响应用 stream_class 包装"""
+    from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+    if "chunks" in data:
+        return stream_class([ChatCompletionChunk.model_validate(chunk) for chunk in data["chunks"]])
+    return ChatCompletion.model_validate(data["response"])
+
+
+class _ReplayStream:
+    """回放录制的 chunk，接口与 SDK 的 Stream 相同（可迭代、可 close）"""
+
+    def __init__(self, chunks: List[Any]):
+        self._chunks = chunks
+
+    def __iter__(self):
+        return iter(self._chunks)
+
+    def close(self) -> None:
+        pass
+
+
+class _AsyncReplayStream(_ReplayStream):
+    """回放录制的 chunk，接口与 SDK 的 AsyncStream 相同（async for、await close()）"""
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            yield chunk
+
+    async def close(self) -> None:
+        pass
+
+
+class _RecordingStream:
+    """
+    边向调用方转发 chunk 边录制，迭代结束或调用方 close 时写入缓存；
+    底层流在迭代中抛出异常时不写入，避免把不完整的输出当作完整响应回放
+    """
+
+    def __init__(self, stream, on_finish):
+        self._stream = stream
+        self._on_finish = on_finish
+        self._chunks = []
+        self._finished = False
+        self._failed = False
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                self._chunks.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            # 调用方提前停止迭代（例如收到结束标签后 break），不算出错
+            raise
+        except BaseException:
+            self._failed = True
+            raise
+        self._finish()
+
+    def _finish(self) -> None:
+        if not self._finished and not self._failed and self._chunks:
+            self._finished = True
+            self._on_finish([_dump(chunk) for chunk in self._chunks])
+
+    def close(self) -> None:
+        self._finish()
+        self._stream.close()
+
+
+class _AsyncRecordingStream(_RecordingStream):
+    """_RecordingStream 的异步版本，包装 SDK 的 AsyncStream"""
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._stream:
+                self._chunks.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            raise
+        except BaseException:
+            # 包括 asyncio.CancelledError：任务被取消时同样只收到了部分输出
+            self._failed = True
+            raise
+        self._finish()
+
+    async def close(self) -> None:
+        self._finish()
+        await self._stream.close()
+
+
+# ============= 客户端包装 =============
+class CachedClient:
+    """包装 OpenAI 客户端，chat.completions.create 经过缓存，其余属性直接转发"""
+
+    replay_stream = _ReplayStream
+    recording_stream = _RecordingStream
+
+    def __init__(self, client, cache: ResponseCache, mode: str):
+        self._client = client
+        self.cache = cache
+        self.mode = mode
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+    def _lookup(self, params: Dict[str, Any]):
+        key = request_key(params)
+        data = self.cache.get(key)
+        if data is not None:
+            return key, _restore(data, self.replay_stream)
+        if self.mode == "replay":
+            raise CacheMissError(f"LLM request for model {params.get('model')!r} is not in the cache "
+                                 f"({self.cache.path}); run with LLM_CACHE=record first")
+        return key, None
+
+    def _store(self, key: str, params: Dict[str, Any], response):
+        if params.get("stream"):
+            return self.recording_stream(response, lambda chunks: self.cache.put(key, params.get("model"),
+                                                                             {"chunks": chunks}))
+        data = _dump(response)
+        if data is not None:
+            self.cache.put(key, params.get("model"), {"response": data})
+        return response
+
+    def _create(self, **params):
+        key, cached = self._lookup(params)
+        if cached is not None:
+            return cached
+        return self._store(key, params, self._client.chat.completions.create(**params))
+
+
+class AsyncCachedClient(CachedClient):
+    """AsyncOpenAI 的包装；流式响应用异步版本的录制 / 回放流"""
+
+    replay_stream = _AsyncReplayStream
+    recording_stream = _AsyncRecordingStream
+
+    async def _create(self, **params):
+        key, cached = self._lookup(params)
+        if cached is not None:
+            return cached
+        return self._store(key, params, await self._client.chat.completions.create(**params))
+
+
+def wrap_client(client, mode: Optional[str] = None, path: Optional[str] = None):
+    """按 LLM_CACHE 模式包装客户端；passthrough 时原样返回，没有任何额外开销"""
+    mode = (mode or LLM_CACHE_MODE).lower()
+    if mode not in MODES:
+        raise ValueError(f"Unknown LLM_CACHE mode: {mode} (expected one of {', '.join(MODES)})")
+    if mode == "passthrough":
+        return client
+    cache = get_cache(path or LLM_CACHE_PATH)
+    if inspect.iscoroutinefunction(client.chat.completions.create):
+        return AsyncCachedClient(client, cache, mode)
+    return CachedClient(client, cache, mode)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM 响应缓存管理")
+    parser.add_argument("--path", default=LLM_CACHE_PATH, help="缓存文件")
+    parser.add_argument("--stats", action="store_true", help="显示条目数和占用空间")
+    parser.add_argument("--clear", action="store_true", help="清空缓存")
+    options = parser.parse_args()
+
+    cache = ResponseCache(options.path)
+    if options.clear:
+        cache.clear()
+        print(f"🧹 已清空 {cache.path}")
+    metrics = cache.metrics()
+    print(f"📦 {cache.path}: {metrics['entries']} 条响应，{metrics['size_mb']:.2f} / {metrics['max_mb']:.0f} MB")
+    if options.stats:
+        with cache._lock:
+            rows = cache._connection().execute(
+                "SELECT model, COUNT(*), SUM(size), SUM(hits) FROM responses GROUP BY model ORDER BY 2 DESC").fetchall()
+        for model, count, size, hits in rows:
+            print(f"   - {model}: {count} 条，{size / 1024:.1f} KB，累计命中 {hits} 次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+OpenAI 客户端工厂
+ReActAgent、AsyncReActAgent、FunctionCallingAgent、compare.py、MCP 客户端和 RAG 流程都通过这里创建客户端：
+- 导入本模块时加载 .env（BASE_URL、OPENAI_API_KEY 等），之后读取环境变量的代码都能看到
+- openai 在第一次创建客户端时才导入（导入较慢，--help 等短命令不需要）
+- 客户端按 LLM_CACHE 模式包装（见 llm_cache.py）
+
+用法:
+    from llm_client import create_client, get_client
+    client = get_client()                       # 进程内共享的同步客户端
+    client = create_client(async_client=True)   # 新建 AsyncOpenAI 客户端
+"""
+
+import os
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def create_client(async_client: bool = False):
+    """按 BASE_URL / OPENAI_API_KEY 新建 OpenAI（或 AsyncOpenAI）客户端"""
+    from openai import AsyncOpenAI, OpenAI
+    from llm_cache import wrap_client
+
+    client_class = AsyncOpenAI if async_client else OpenAI
+    return wrap_client(client_class(
+        base_url=os.getenv("BASE_URL"),
+        api_key=os.getenv("OPENAI_API_KEY"),
+    ))
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    """进程内共享的同步客户端，第一次调用时才创建"""
+    return create_client()
@@ -0,0 +1,89 @@
+"""
+AsyncReActAgent 压测
+使用本地的桩 LLM（固定延迟、脚本化回复），测量 N 个并发 agent 时每分钟能完成多少任务
+
+用法: python load_test.py [--tasks 200] [--latency 0.2] [--concurrency 1 4 16 64]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from agent import read_file
+from agent_events import QUIET
+from async_agent import AsyncReActAgent, auto_approve
+
+
+class StubLLM:
+    """模拟 AsyncOpenAI 的 chat.completions.create：第一轮返回读取文件的 action，拿到 observation 后给出最终答案"""
+
+    def __init__(self, latency: float, file_path: str):
+        self.latency = latency
+        self.file_path = file_path
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if messages[-1]["content"].startswith("<observation>"):
+            content = "<thought>已经读到文件内容。</thought><final_answer>完成</final_answer>"
+        else:
+            content = f'<thought>先读取文件。</thought><action>read_file("{self.file_path}")</action>'
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=None,
+        )
+
+
+async def run_load(concurrency: int, task_count: int, latency: float, file_path: str) -> dict:
+    stub = StubLLM(latency, file_path)
+    agent = AsyncReActAgent(
+        tools=[read_file],
+        model="stub",
+        project_directory=os.path.dirname(file_path),
+        client=stub,
+        approval_callback=auto_approve,
+        verbosity=QUIET,
+    )
+    tasks = [f"读取 {file_path}（任务 {i}）" for i in range(task_count)]
+
+    start = time.perf_counter()
+    results = await agent.run_many(tasks, concurrency=concurrency)
+    elapsed = time.perf_counter() - start
+
+    failures = sum(1 for result in results if isinstance(result, Exception))
+    return {
+        "concurrency": concurrency,
+        "elapsed": elapsed,
+        "tasks_per_minute": (task_count - failures) / elapsed * 60,
+        "model_calls": stub.calls,
+        "failures": failures,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="AsyncReActAgent 压测（本地桩 LLM）")
+    parser.add_argument("--tasks", type=int, default=200, help="每个并发度下运行的任务数")
+    parser.add_argument("--latency", type=float, default=0.2, help="桩 LLM 每次调用的延迟（秒）")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64], help="要测试的并发度")
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "data.txt")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write("Hello, World!\n")
+
+        print(f"任务数: {options.tasks}, 桩 LLM 延迟: {options.latency}s")
+        print(f"{'并发':>6} {'耗时(s)':>10} {'任务/分钟':>12} {'模型调用':>10} {'失败':>6}")
+        for concurrency in options.concurrency:
+            result = await run_load(concurrency, options.tasks, options.latency, file_path)
+            print(f"{result['concurrency']:>6} {result['elapsed']:>10.2f} {result['tasks_per_minute']:>12.1f} "
+                  f"{result['model_calls']:>10} {result['failures']:>6}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,299 @@
+"""
+终端命令执行后端
+- 超时后杀掉整个进程组，失控的构建不会让 agent 永远卡住
+- stdout/stderr 实时输出到控制台，同时只保留有限的头部和尾部作为 observation
+- 可选：复用一个常驻 shell 会话，避免每条命令都启动新进程
+- 可选：在 POSIX 系统上用 rlimit 限制 CPU 时间和内存
+"""
+
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+@dataclass
+class CommandResult:
+    returncode: Optional[int]
+    output: str
+    timed_out: bool = False
+    truncated: bool = False
+    duration: float = 0.0
+
+    def to_observation(self) -> str:
+        """转换成给模型看的 observation"""
+        if self.timed_out:
+            status = f"命令超时（{self.duration:.1f}s），已被终止"
+        elif self.returncode == 0:
+            status = "执行成功"
+        else:
+            status = f"执行失败，退出码 {self.returncode}"
+        return f"{status}\n{self.output}" if self.output else status
+
+
+class BoundedOutput:
+    """只保留前 head_chars 和后 tail_chars 个字符的输出缓冲区，内存占用与命令输出量无关"""
+
+    def __init__(self, head_chars: int = 4000, tail_chars: int = 4000):
+        self.head_chars = head_chars
+        self.tail_chars = tail_chars
+        self.head = []
+        self.head_size = 0
+        self.tail = deque()
+        self.tail_size = 0
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def write(self, text: str):
+        with self.lock:
+            if self.head_size < self.head_chars:
+                take = text[:self.head_chars - self.head_size]
+                self.head.append(take)
+                self.head_size += len(take)
+                text = text[len(take):]
+            if not text:
+                return
+            self.tail.append(text)
+            self.tail_size += len(text)
+            # tail_chars 为 0 时会弹空整个队列，需要先检查队列非空
+            while self.tail and self.tail_size - len(self.tail[0]) >= self.tail_chars:
+                removed = self.tail.popleft()
+                self.tail_size -= len(removed)
+                self.dropped += len(removed)
+
+    @property
+    def truncated(self) -> bool:
+        return self.dropped > 0 or self.tail_size > self.tail_chars
+
+    def getvalue(self) -> str:
+        with self.lock:
+            head = "".join(self.head)
+            tail = "".join(self.tail)
+            extra = len(tail) - self.tail_chars
+            if extra > 0:
+                tail = tail[extra:]
+            dropped = self.dropped + max(extra, 0)
+        if dropped:
+            return f"{head}\n...（省略 {dropped} 个字符）...\n{tail}"
+        return head + tail
+
+
+def _limit_resources(cpu_seconds: Optional[int], memory_mb: Optional[int]):
+    """返回子进程启动前执行的 rlimit 设置函数，不支持时返回 None"""
+    if resource is None or (cpu_seconds is None and memory_mb is None):
+        return None
+
+    def preexec():
+        if cpu_seconds is not None:
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+        if memory_mb is not None:
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    return preexec
+
+
+def _kill(process: subprocess.Popen):
+    """杀掉进程及其启动的所有子进程"""
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class PersistentShell:
+    """常驻的 bash 会话：命令通过 stdin 发送，以单独一行的随机标记判断命令结束并取回退出码"""
+
+    def __init__(self, cwd: Optional[str] = None, preexec_fn=None):
+        self.cwd = cwd
+        self.preexec_fn = preexec_fn
+        self.process = None
+        self.lines = None
+
+    def _start(self):
+        self.process = subprocess.Popen(
+            ["bash", "--noprofile", "--norc"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            cwd=self.cwd,
+            start_new_session=True,
+            preexec_fn=self.preexec_fn,
+        )
+        self.lines = queue.Queue()
+        threading.Thread(target=self._pump, args=(self.process.stdout, self.lines), daemon=True).start()
+
+    @staticmethod
+    def _pump(stream, lines: queue.Queue):
+        for line in iter(stream.readline, ""):
+            lines.put(line)
+        lines.put(None)
+
+    def run(self, command: str, timeout: float, output: BoundedOutput, echo) -> Tuple[Optional[int], bool]:
+        if self.process is None or self.process.poll() is not None:
+            self._start()
+
+        marker = f"__AGENT_DONE_{uuid.uuid4().hex}__"
+        # 命令的 stdin 重定向到 /dev/null，避免吃掉后面的结束标记；
+        # 标记前先输出一个换行，命令输出不以换行结尾时标记仍然独占一行
+        self.process.stdin.write(f"{{ {command}\n}} < /dev/null 2>&1\nprintf '\\n%s %s\\n' {marker} $?\n")
+        self.process.stdin.flush()
+
+        # 每行末尾的换行先暂缓写出：标记前多输出的那个换行不属于命令输出
+        pending_newline = False
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                line = self.lines.get(timeout=max(remaining, 0))
+            except queue.Empty:
+                self._flush_newline(pending_newline, output, echo)
+                self.close()
+                return None, True
+            if line is None:
+                # shell 自己退出了（例如命令里执行了 exit）
+                self._flush_newline(pending_newline, output, echo)
+                self.process = None
+                return None, False
+            if line.startswith(marker):
+                return int(line.split()[-1]), False
+            self._flush_newline(pending_newline, output, echo)
+            pending_newline = line.endswith("\n")
+            text = line[:-1] if pending_newline else line
+            if text:
+                output.write(text)
+                echo(text)
+
+    @staticmethod
+    def _flush_newline(pending_newline: bool, output: BoundedOutput, echo):
+        """命令没有正常结束（没有输出标记）时，暂缓的换行确实属于命令输出"""
+        if pending_newline:
+            output.write("\n")
+            echo("\n")
+
+    def close(self):
+        if self.process is not None:
+            _kill(self.process)
+            self.process = None
+
+
+class TerminalBackend:
+    def __init__(self, timeout: float = 120, head_chars: int = 4000, tail_chars: int = 4000,
+                 stream_output: bool = True, persistent_shell: bool = False, cwd: Optional[str] = None,
+                 cpu_seconds: Optional[int] = None, memory_mb: Optional[int] = None):
+        self.timeout = timeout
+        self.head_chars = head_chars
+        self.tail_chars = tail_chars
+        self.stream_output = stream_output
+        self.cwd = cwd
+        self.preexec_fn = _limit_resources(cpu_seconds, memory_mb)
+        # 常驻 shell 依赖 bash，Windows 上退回到每条命令一个进程
+        self.shell = PersistentShell(cwd, self.preexec_fn) if persistent_shell and os.name == "posix" else None
+
+    def _echo(self, text: str, stream=None):
+        if self.stream_output:
+            (stream or sys.stdout).write(text)
+            (stream or sys.stdout).flush()
+
+    def run(self, command: str, timeout: Optional[float] = None) -> CommandResult:
+        timeout = timeout or self.timeout
+        output = BoundedOutput(self.head_chars, self.tail_chars)
+        start = time.monotonic()
+
+        if self.shell is not None:
+            returncode, timed_out = self.shell.run(command, timeout, output, self._echo)
+        else:
+            returncode, timed_out = self._run_subprocess(command, timeout, output)
+
+        return CommandResult(
+            returncode=returncode,
+            output=output.getvalue(),
+            timed_out=timed_out,
+            truncated=output.truncated,
+            duration=time.monotonic() - start,
+        )
+
+    def _run_subprocess(self, command: str, timeout: float, output: BoundedOutput) -> Tuple[Optional[int], bool]:
+        process = subprocess.Popen(
+            command,
+            shell=True,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            cwd=self.cwd,
+            start_new_session=os.name == "posix",
+            preexec_fn=self.preexec_fn,
+        )
+
+        def pump(stream, console):
+            for line in iter(stream.readline, ""):
+                output.write(line)
+                self._echo(line, console)
+            stream.close()
+
+        readers = [
+            threading.Thread(target=pump, args=(process.stdout, sys.stdout), daemon=True),
+            threading.Thread(target=pump, args=(process.stderr, sys.stderr), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+
+        timed_out = False
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            _kill(process)
+            process.wait()
+        for reader in readers:
+            reader.join(timeout=1)
+
+        return (None if timed_out else process.returncode), timed_out
+
+    def close(self):
+        if self.shell is not None:
+            self.shell.close()
+
+
+if __name__ == "__main__":
+    # 自检：python terminal.py
+    bounded = BoundedOutput(head_chars=3, tail_chars=0)
+    bounded.write("abcdef")
+    assert bounded.getvalue() == "abc\n...（省略 3 个字符）...\n", bounded.getvalue()
+
+    for persistent in (False, True):
+        backend = TerminalBackend(timeout=3, stream_output=False, persistent_shell=persistent)
+        try:
+            # 输出不以换行结尾时常驻 shell 仍能识别结束标记，且标记不会混进输出
+            for command, expected in [("printf abc", "abc"), ("echo abc", "abc\n"), ("printf ''", ""),
+                                      ("printf 'a\\n\\nb'", "a\n\nb"), ("echo x; exit 3", None)]:
+                result = backend.run(command)
+                if expected is None:
+                    assert not result.timed_out and result.output == "x\n", result
+                    continue
+                assert result.returncode == 0 and not result.timed_out, (persistent, command, result)
+                assert result.output == expected, (persistent, command, result)
+            result = backend.run("sleep 5", timeout=0.5)
+            assert result.timed_out and result.returncode is None, result
+        finally:
+            backend.close()
+    print("terminal.py 自检通过")
@@ -0,0 +1,161 @@
+"""
+嵌入 / 重排模型推理后端基准：fp32 PyTorch 与 ONNX（可选动态 int8 量化）对比
+每个后端在独立的子进程中运行，报告：
+- 加载耗时、每秒嵌入条数、每秒重排 pair 数、进程峰值内存
+- 相对 fp32 基线的质量差异：同一文本嵌入的余弦相似度、检索 top-k 重合率、重排 top-1 一致率
+
+用法: python bench_backends.py [--backends torch onnx-int8] [--texts 512] [--pairs 256] [--top-k 3]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import rag
+
+# 关于 doc.md 的示例问题，用来比较不同后端的检索和重排结果
+SAMPLE_QUERIES = [
+    "哆啦A梦使用的3个秘密道具分别是什么？",
+    "特兰克斯为什么来找哆啦A梦？",
+    "黑暗赛亚人是怎么被制造出来的？",
+    "大雄在精神与时光屋里经历了什么？",
+    "最终战中大雄是如何击败敌人的？",
+    "回到现代后大雄有什么变化？",
+    "故事结尾的新闻画面里出现了谁？",
+]
+
+
+def _repeat(items: List, count: int) -> List:
+    return [items[i % len(items)] for i in range(count)]
+
+
+def run_worker(backend: str, text_count: int, pair_count: int, batch_size: int) -> Dict:
+    """在当前进程中测量一个后端，返回指标和用于质量对比的原始输出"""
+    chunks = rag.split_into_chunks(rag.DEFAULT_DOC_FILE)
+
+    start = time.perf_counter()
+    embedding_model = rag.get_embedding_model(backend)
+    cross_encoder = rag.get_cross_encoder(backend)
+    load_seconds = time.perf_counter() - start
+
+    texts = _repeat(chunks, text_count)
+    embedding_model.encode(texts[:batch_size], batch_size=batch_size)  # 预热
+    start = time.perf_counter()
+    embedding_model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+    embed_seconds = time.perf_counter() - start
+
+    pairs = _repeat([(query, chunk) for query in SAMPLE_QUERIES for chunk in chunks], pair_count)
+    cross_encoder.predict(pairs[:batch_size], batch_size=batch_size)  # 预热
+    start = time.perf_counter()
+    cross_encoder.predict(pairs, batch_size=batch_size)
+    rerank_seconds = time.perf_counter() - start
+
+    chunk_embeddings = embedding_model.encode(chunks, normalize_embeddings=True)
+    query_embeddings = embedding_model.encode(SAMPLE_QUERIES, normalize_embeddings=True)
+    rerank_scores = [
+        cross_encoder.predict([(query, chunk) for chunk in chunks]).tolist() for query in SAMPLE_QUERIES
+    ]
+
+    return {
+        "backend": backend,
+        "load_seconds": load_seconds,
+        "embeddings_per_second": text_count / embed_seconds,
+        "rerank_pairs_per_second": pair_count / rerank_seconds,
+        # Linux 上 ru_maxrss 的单位是 KB
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "chunk_embeddings": chunk_embeddings.tolist(),
+        "query_embeddings": query_embeddings.tolist(),
+        "rerank_scores": rerank_scores,
+    }
+
+
+def measure(backend: str, options) -> Dict:
+    """在子进程中运行一个后端，避免不同后端的模型和运行时互相影响内存统计"""
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", backend,
+         "--texts", str(options.texts), "--pairs", str(options.pairs), "--batch-size", str(options.batch_size)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"{backend} failed:\n{process.stderr}")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def quality_delta(baseline: Dict, candidate: Dict, top_k: int) -> Dict:
+    """候选后端相对 fp32 基线的质量差异"""
+    import numpy as np
+
+    base_chunks = np.array(baseline["chunk_embeddings"])
+    cand_chunks = np.array(candidate["chunk_embeddings"])
+    base_queries = np.array(baseline["query_embeddings"])
+    cand_queries = np.array(candidate["query_embeddings"])
+
+    # 向量均已归一化，点积即余弦相似度
+    cosine = np.concatenate([(base_chunks * cand_chunks).sum(axis=1), (base_queries * cand_queries).sum(axis=1)])
+
+    base_top = np.argsort(-(base_queries @ base_chunks.T), axis=1)[:, :top_k]
+    cand_top = np.argsort(-(cand_queries @ cand_chunks.T), axis=1)[:, :top_k]
+    overlap = np.mean([len(set(b) & set(c)) / top_k for b, c in zip(base_top, cand_top)])
+
+    base_scores = np.array(baseline["rerank_scores"])
+    cand_scores = np.array(candidate["rerank_scores"])
+    top1_agreement = np.mean(base_scores.argmax(axis=1) == cand_scores.argmax(axis=1))
+    max_score_diff = np.abs(base_scores - cand_scores).max()
+
+    return {
+        "embedding_cosine_min": float(cosine.min()),
+        "embedding_cosine_mean": float(cosine.mean()),
+        "retrieval_overlap_at_k": float(overlap),
+        "rerank_top1_agreement": float(top1_agreement),
+        "rerank_max_score_diff": float(max_score_diff),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="嵌入 / 重排模型推理后端基准")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx-int8"], choices=rag.BACKENDS)
+    parser.add_argument("--texts", type=int, default=512, help="嵌入吞吐测试的文本条数")
+    parser.add_argument("--pairs", type=int, default=256, help="重排吞吐测试的 (query, chunk) 对数")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=3, help="检索重合率使用的 k")
+    parser.add_argument("--worker", choices=rag.BACKENDS, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.worker:
+        print(json.dumps(run_worker(options.worker, options.texts, options.pairs, options.batch_size)))
+        return
+
+    # 质量差异以 fp32 PyTorch 为基线
+    backends = ["torch"] + [backend for backend in options.backends if backend != "torch"]
+    results = []
+    for backend in backends:
+        print(f"⏱️  测量 {backend} ...", flush=True)
+        results.append(measure(backend, options))
+
+    baseline = results[0]
+    print(f"\n{'后端':<10} {'加载(s)':>8} {'嵌入/秒':>10} {'重排对/秒':>10} {'峰值内存(MB)':>12}")
+    for result in results:
+        print(f"{result['backend']:<10} {result['load_seconds']:>8.1f} {result['embeddings_per_second']:>10.1f} "
+              f"{result['rerank_pairs_per_second']:>10.1f} {result['peak_rss_mb']:>12.0f}")
+
+    for result in results[1:]:
+        delta = quality_delta(baseline, result, options.top_k)
+        speedup = result["embeddings_per_second"] / baseline["embeddings_per_second"]
+        rerank_speedup = result["rerank_pairs_per_second"] / baseline["rerank_pairs_per_second"]
+        print(f"\n📊 {result['backend']} 相对 torch fp32：嵌入 {speedup:.2f}x，重排 {rerank_speedup:.2f}x，"
+              f"内存 {result['peak_rss_mb'] - baseline['peak_rss_mb']:+.0f} MB")
+        print(f"   - 嵌入余弦相似度: 平均 {delta['embedding_cosine_mean']:.4f}，最低 {delta['embedding_cosine_min']:.4f}")
+        print(f"   - 检索 top-{options.top_k} 重合率: {delta['retrieval_overlap_at_k']:.1%}")
+        print(f"   - 重排 top-1 一致率: {delta['rerank_top1_agreement']:.1%}，"
+              f"最大分数差 {delta['rerank_max_score_diff']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+多进程向量化的扩展性基准
+把 doc.md 的片段重复成指定规模的语料，分别用 1/2/4/8 个 worker 建索引，报告吞吐量、加速比和并行效率；
+同时给出单进程 embed_chunks 的基线，并检查多进程结果与基线一致
+
+用法: python bench_indexing.py [--chunks 4096] [--workers 1 2 4 8] [--batch-size 32]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+import rag
+from parallel_embed import embed_chunks_parallel
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程向量化扩展性基准")
+    parser.add_argument("--chunks", type=int, default=4096, help="语料片段数")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="要测试的 worker 数")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--task-size", type=int, default=256, help="每个任务的片段数")
+    options = parser.parse_args()
+
+    base_chunks = [chunk for chunk in rag.split_into_chunks(rag.DEFAULT_DOC_FILE) if chunk.strip()]
+    # 每个片段加上编号，避免重复文本
+    chunks = [f"{base_chunks[i % len(base_chunks)]}（{i}）" for i in range(options.chunks)]
+
+    start = time.perf_counter()
+    baseline = np.asarray(rag.embed_chunks(chunks, batch_size=options.batch_size), dtype=np.float32)
+    baseline_seconds = time.perf_counter() - start
+    print(f"片段数: {len(chunks)}，单进程基线: {baseline_seconds:.1f}s（{len(chunks) / baseline_seconds:.1f} 条/秒）\n")
+
+    print(f"{'workers':>8} {'耗时(s)':>10} {'条/秒':>10} {'加速比':>8} {'效率':>8} {'最大误差':>10}")
+    single_worker = None
+    for workers in options.workers:
+        start = time.perf_counter()
+        embeddings = embed_chunks_parallel(chunks, workers=workers, batch_size=options.batch_size,
+                                           task_size=options.task_size)
+        elapsed = time.perf_counter() - start
+        # 加速比以 1 个 worker 为基准（包含进程启动和模型加载开销）
+        single_worker = single_worker or elapsed
+        speedup = single_worker / elapsed
+        max_error = float(np.abs(embeddings - baseline).max())
+        print(f"{workers:>8} {elapsed:>10.1f} {len(chunks) / elapsed:>10.1f} {speedup:>8.2f} "
+              f"{speedup / workers:>8.1%} {max_error:>10.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+RAG 检索质量与延迟基准
+在带标注的问答集（retrieval_eval.jsonl）上跑完整流水线，对每组参数报告：
+- 质量：recall@k、MRR、nDCG@k（片段包含任一条 evidence 原文即视为相关，标注不依赖切块方式）
+- 延迟：建索引向量化、查询向量化、检索、重排、生成各阶段的 p50 / p95，以及端到端吞吐
+
+可以同时扫描切块大小、检索深度和是否重排，用数据调参。生成默认使用进程内的桩 LLM（可设置模拟延迟），
+离线即可运行；--llm openai 时调用真实接口
+
+用法:
+    python bench_retrieval.py [--chunk-sizes 0 200] [--top-k 3 5 10] [--rerank both] [--k 3]
+    python bench_retrieval.py --output retrieval_results.json
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import tempfile
+import time
+from contextlib import nullcontext
+from types import SimpleNamespace
+from typing import Dict, List
+from unittest.mock import patch
+
+import rag
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "retrieval_eval.jsonl")
+STAGES = ("embed_query", "search", "rerank", "generate")
+
+
+# ============= 数据集与切块 =============
+def load_dataset(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def window_chunks(paragraphs: List[str], size: int, overlap: int) -> List[str]:
+    """把超过 size 个字符的段落切成重叠窗口；overlap 要大于 evidence 长度，保证 evidence 不被切断"""
+    if not 0 <= overlap < size:
+        raise ValueError(f"overlap must satisfy 0 <= overlap < size (got overlap={overlap}, size={size})")
+    chunks = []
+    for paragraph in paragraphs:
+        if len(paragraph) <= size:
+            chunks.append(paragraph)
+            continue
+        step = size - overlap
+        chunks.extend(paragraph[start:start + size] for start in range(0, len(paragraph) - overlap, step))
+    return chunks
+
+
+def make_chunks(doc_file: str, chunk_size: int, overlap: int) -> List[str]:
+    """chunk_size 为 0 时使用 rag.split_into_chunks 的原始切块"""
+    chunks = rag.split_into_chunks(doc_file)
+    if chunk_size:
+        chunks = window_chunks(chunks, chunk_size, overlap)
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+# ============= 指标 =============
+def relevance(chunk: str, evidence: List[str]) -> int:
+    return int(any(text in chunk for text in evidence))
+
+
+def score_ranking(ranked: List[str], chunks: List[str], evidence: List[str], k: int) -> Dict[str, float]:
+    """ranked 为返回给生成步骤的片段（按顺序），chunks 为全部片段，用来计算相关片段总数"""
+    gains = [relevance(chunk, evidence) for chunk in ranked[:k]]
+    relevant_total = sum(relevance(chunk, evidence) for chunk in chunks)
+    first_hit = next((rank for rank, gain in enumerate(gains, 1) if gain), None)
+
+    dcg = sum(gain / math.log2(rank + 1) for rank, gain in enumerate(gains, 1))
+    ideal = sum(1 / math.log2(rank + 1) for rank in range(1, min(relevant_total, k) + 1))
+    return {
+        "recall": sum(gains) / relevant_total if relevant_total else 0.0,
+        "mrr": 1 / first_hit if first_hit else 0.0,
+        "ndcg": dcg / ideal if ideal else 0.0,
+    }
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+# ============= 桩 LLM =============
+class StubLLM:
+    """与 OpenAI 客户端接口相同的桩：等待固定延迟后返回检索片段的开头，不访问网络"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model: str, messages: List[Dict], **kwargs):
+        time.sleep(self.latency)
+        content = messages[0]["content"].split("相关片段:\n", 1)[-1][:100]
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+# ============= 基准 =============
+def build_index(chunks: List[str], store: str, name: str, index_root: str):
+    if store == "chroma":
+        collection = rag.create_collection(name)
+        rag.save_embeddings(collection, chunks, rag.embed_chunks(chunks))
+        return collection
+
+    from vector_store import CompactVectorStore
+    return CompactVectorStore.build(os.path.join(index_root, name), rag.embed_chunks(chunks), chunks, format=store)
+
+
+def run_config(collection, chunks: List[str], dataset: List[Dict], top_k: int, use_rerank: bool, k: int,
+               generate: bool) -> Dict:
+    """对一组参数跑完整个问答集"""
+    latencies = {stage: [] for stage in STAGES}
+    scores = []
+    # 每组参数都从空的重排缓存开始，避免前一组的缓存命中让重排延迟偏低
+    rag.get_rerank_cache().clear()
+    start = time.perf_counter()
+    for item in dataset:
+        question = item["question"]
+
+        t0 = time.perf_counter()
+        query_embedding = rag.embed_chunk(question)
+        t1 = time.perf_counter()
+        results = collection.query(query_embeddings=[query_embedding], n_results=min(top_k, len(chunks)))
+        ranked = results["documents"][0]
+        t2 = time.perf_counter()
+        latencies["embed_query"].append(t1 - t0)
+        latencies["search"].append(t2 - t1)
+
+        if use_rerank:
+            ranked = rag.rerank(question, ranked, k)
+            latencies["rerank"].append(time.perf_counter() - t2)
+        if generate:
+            t3 = time.perf_counter()
+            rag.generate(question, ranked[:k])
+            latencies["generate"].append(time.perf_counter() - t3)
+
+        scores.append(score_ranking(ranked, chunks, item["evidence"], k))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "top_k": top_k,
+        "rerank": use_rerank,
+        **{metric: statistics.mean(score[metric] for score in scores) for metric in ("recall", "mrr", "ndcg")},
+        "latency_ms": {
+            stage: {"p50": percentile(values, 0.5) * 1000, "p95": percentile(values, 0.95) * 1000}
+            for stage, values in latencies.items() if values
+        },
+        "queries_per_second": len(dataset) / elapsed,
+    }
+
+
+def print_table(results: List[Dict], k: int) -> None:
+    header = (f"{'切块':>6} {'片段数':>6} {'top_k':>6} {'重排':>4} {f'R@{k}':>7} {'MRR':>7} {f'nDCG@{k}':>8} "
+              + " ".join(f"{stage + '(ms)':>16}" for stage in STAGES) + f" {'QPS':>7}")
+    print(header)
+    for result in results:
+        latency = " ".join(
+            f"{result['latency_ms'][stage]['p50']:>7.1f}/{result['latency_ms'][stage]['p95']:<8.1f}"
+            if stage in result["latency_ms"] else f"{'-':>16}"
+            for stage in STAGES
+        )
+        print(f"{result['chunk_size'] or '段落':>6} {result['chunks']:>6} {result['top_k']:>6} "
+              f"{'是' if result['rerank'] else '否':>4} {result['recall']:>7.1%} {result['mrr']:>7.3f} "
+              f"{result['ndcg']:>8.3f} {latency} {result['queries_per_second']:>7.1f}")
+    print("\n延迟列为 p50/p95")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG 检索质量与延迟基准")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="标注问答集（JSONL：question, evidence）")
+    parser.add_argument("--doc", default=rag.DEFAULT_DOC_FILE)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[0, 200],
+                        help="切块大小（字符），0 表示按空行切块")
+    parser.add_argument("--overlap", type=int, default=50, help="窗口切块的重叠字符数")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[3, 5, 10], help="向量检索深度")
+    parser.add_argument("--rerank", choices=["on", "off", "both"], default="both")
+    parser.add_argument("--k", type=int, default=3, help="评估的截断位置，也是送入生成的片段数")
+    parser.add_argument("--store", choices=rag.STORES, default="chroma")
+    parser.add_argument("--llm", choices=["stub", "openai", "none"], default="stub", help="生成步骤使用的 LLM")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="桩 LLM 的模拟延迟（秒）")
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    options = parser.parse_args()
+    for chunk_size in options.chunk_sizes:
+        if chunk_size and not 0 <= options.overlap < chunk_size:
+            parser.error(f"--overlap 必须满足 0 <= overlap < 切块大小（overlap={options.overlap}，切块大小={chunk_size}）")
+
+    dataset = load_dataset(options.dataset)
+    rerank_modes = {"on": [True], "off": [False], "both": [False, True]}[options.rerank]
+    stub = StubLLM(options.stub_latency)
+
+    results = []
+    with tempfile.TemporaryDirectory() as index_root, \
+            patch.object(rag, "get_client", lambda: stub) if options.llm == "stub" else nullcontext():
+        for chunk_size in options.chunk_sizes:
+            chunks = make_chunks(options.doc, chunk_size, options.overlap)
+            start = time.perf_counter()
+            collection = build_index(chunks, options.store, f"bench_{chunk_size}", index_root)
+            index_seconds = time.perf_counter() - start
+            print(f"⏱️  切块 {chunk_size or '段落'}: {len(chunks)} 个片段，建索引 {index_seconds:.2f}s", flush=True)
+
+            for top_k in options.top_k:
+                for use_rerank in rerank_modes:
+                    result = run_config(collection, chunks, dataset, top_k, use_rerank, options.k,
+                                        generate=options.llm != "none")
+                    result.update(chunk_size=chunk_size, chunks=len(chunks), index_seconds=index_seconds)
+                    results.append(result)
+
+    print(f"\n问答集: {len(dataset)} 条，存储: {options.store}，LLM: {options.llm}\n")
+    print_table(results, options.k)
+
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n📝 结果已写入 {options.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+分片检索基准：顺序查询各分片 vs ShardedRetriever 并发扇出
+每个分片是一个合成向量的 CompactVectorStore，可以给每次查询加上固定延迟模拟远程分片的网络往返，报告：
+- 不同分片数下顺序查询与并发扇出的 p50 / p95 延迟
+- 有一个慢分片时，分片超时对查询延迟的影响
+并发扇出重叠的是各分片的等待时间；CPU 核数少于分片数时，各分片的向量计算仍会互相争用 CPU
+
+用法: python bench_sharding.py [--shards 1 2 4 8] [--vectors 20000] [--delay 0.02] [--slow-delay 0.5] [--timeout 0.1]
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from bench_vector_store import synthetic_embeddings
+from sharded_retriever import ShardedRetriever
+from vector_store import CompactVectorStore
+
+
+class DelayedShard:
+    """在真实检索前加上固定延迟，模拟远程分片"""
+
+    def __init__(self, store, delay: float):
+        self.store = store
+        self.delay = delay
+
+    def query(self, query_embeddings, n_results: int):
+        time.sleep(self.delay)
+        return self.store.query(query_embeddings, n_results)
+
+
+def latency_ms(run, queries: np.ndarray) -> Dict[str, float]:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        run(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {"p50": statistics.median(latencies), "p95": latencies[int(len(latencies) * 0.95) - 1]}
+
+
+def sequential(shards: Dict, query, top_k: int) -> List:
+    """基线：依次查询每个分片再合并"""
+    hits = []
+    for shard in shards.values():
+        results = shard.query([query], top_k)
+        hits.extend(zip(results["distances"][0], results["documents"][0]))
+    return sorted(hits)[:top_k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分片检索基准")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8], help="要测试的分片数")
+    parser.add_argument("--vectors", type=int, default=20000, help="每个分片的向量数")
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--delay", type=float, default=0.02, help="每个分片每次查询的模拟网络延迟（秒）")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="慢分片的延迟（秒）")
+    parser.add_argument("--timeout", type=float, default=0.1, help="分片超时（秒）")
+    options = parser.parse_args()
+
+    queries = synthetic_embeddings(options.queries, options.dimension, clusters=16, seed=99)
+    with tempfile.TemporaryDirectory() as root:
+        stores = []
+        for i in range(max(options.shards)):
+            embeddings = synthetic_embeddings(options.vectors, options.dimension, clusters=64, seed=i)
+            stores.append(CompactVectorStore.build(f"{root}/shard{i}", embeddings, [f"shard{i}-{j}" for j in
+                                                                                      range(options.vectors)]))
+        print(f"每个分片 {options.vectors} 条向量，模拟网络延迟 {options.delay * 1000:.0f} ms\n")
+        print(f"{'分片数':>6} {'顺序 p50(ms)':>14} {'顺序 p95(ms)':>14} {'并发 p50(ms)':>14} {'并发 p95(ms)':>14}")
+        for count in options.shards:
+            shards = {f"shard{i}": DelayedShard(stores[i], options.delay) for i in range(count)}
+            baseline = latency_ms(lambda query: sequential(shards, query, options.top_k), queries)
+            retriever = ShardedRetriever(shards)
+            fanout = latency_ms(lambda query: retriever.search(query, options.top_k), queries)
+            retriever.close()
+            print(f"{count:>6} {baseline['p50']:>14.1f} {baseline['p95']:>14.1f} "
+                  f"{fanout['p50']:>14.1f} {fanout['p95']:>14.1f}")
+
+        # 最后一个分片变慢：不设超时时每次查询都被它拖住，设了超时后按时返回其余分片的结果
+        count = max(options.shards)
+        shards = {f"shard{i}": DelayedShard(stores[i], options.delay) for i in range(count)}
+        shards[f"shard{count - 1}"].delay = options.slow_delay
+        print(f"\n{count} 个分片，其中 1 个延迟 {options.slow_delay * 1000:.0f} ms：")
+        for timeout in (None, options.timeout):
+            retriever = ShardedRetriever(shards, timeout=timeout)
+            result = latency_ms(lambda query: retriever.search(query, options.top_k), queries[:10])
+            metrics = retriever.metrics()
+            retriever.close()
+            timeouts = sum(entry["timeouts"] for entry in metrics.values())
+            label = "不设超时" if timeout is None else f"超时 {timeout * 1000:.0f} ms"
+            print(f"  {label:<12} p50 {result['p50']:>7.1f} ms，p95 {result['p95']:>7.1f} ms，分片超时 {timeouts} 次")
+        print("\n各分片延迟（最后一轮）:")
+        for name, entry in metrics.items():
+            p50 = f"{entry['p50_ms']:.1f} ms" if entry["p50_ms"] is not None else "-"
+            print(f"  {name}: 查询 {entry['queries']} 次，超时 {entry['timeouts']} 次，p50 {p50}")
+
+
+if __name__ == "__main__":
+    main()
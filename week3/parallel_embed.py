@@ -0,0 +1,114 @@
+"""
+多进程批量向量化
+大规模建索引时单个 Python 进程只能用上一部分 CPU。这里用进程池并行向量化：
+- 每个 worker 进程只在启动时加载一次嵌入模型，并按 CPU 核数分配 torch 线程数，避免线程超额订阅
+- 所有文本以 UTF-8 拼接后放进共享内存，worker 只收到 [start, end) 的行号区间，不需要 pickle 文本
+- 结果直接写入共享的 float32 矩阵，不经过进程间序列化
+
+用法:
+    from parallel_embed import embed_chunks_parallel
+    embeddings = embed_chunks_parallel(chunks, workers=4)   # numpy.ndarray, shape (len(chunks), dim)
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context, shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import rag
+
+# worker 进程内的状态：文本缓冲区、偏移量、嵌入模型，以及按名称缓存的输出矩阵
+_worker: Dict = {}
+
+
+def _init_worker(text_name: str, offsets_name: str, count: int, backend: Optional[str], threads: int):
+    """worker 启动时执行一次：限制线程数、连接共享内存、加载模型"""
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+
+    text_shm = shared_memory.SharedMemory(name=text_name)
+    offsets_shm = shared_memory.SharedMemory(name=offsets_name)
+    _worker.update(
+        text_shm=text_shm,
+        offsets_shm=offsets_shm,
+        offsets=np.ndarray((count + 1,), dtype=np.int64, buffer=offsets_shm.buf),
+        model=rag.get_embedding_model(backend),
+        outputs={},
+    )
+
+
+def _dimension() -> int:
+    return _worker["model"].get_sentence_embedding_dimension()
+
+
+def _output(name: str, shape: Tuple[int, int]) -> np.ndarray:
+    if name not in _worker["outputs"]:
+        shm = shared_memory.SharedMemory(name=name)
+        _worker["outputs"][name] = (shm, np.ndarray(shape, dtype=np.float32, buffer=shm.buf))
+    return _worker["outputs"][name][1]
+
+
+def _embed_range(start: int, end: int, output_name: str, shape: Tuple[int, int], batch_size: int) -> int:
+    """向量化第 start..end-1 条文本，结果写入共享输出矩阵的对应行"""
+    offsets = _worker["offsets"]
+    buffer = _worker["text_shm"].buf
+    texts = [bytes(buffer[offsets[i]:offsets[i + 1]]).decode("utf-8") for i in range(start, end)]
+    embeddings = _worker["model"].encode(texts, batch_size=batch_size, normalize_embeddings=True)
+    _output(output_name, shape)[start:end] = embeddings
+    return end - start
+
+
+def _shared_texts(chunks: List[str]) -> Tuple[shared_memory.SharedMemory, shared_memory.SharedMemory]:
+    """把文本编码后连续写入共享内存，另用一个 int64 数组记录每条文本的起止偏移"""
+    encoded = [chunk.encode("utf-8") for chunk in chunks]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+
+    text_shm = shared_memory.SharedMemory(create=True, size=max(int(offsets[-1]), 1))
+    text_shm.buf[:offsets[-1]] = b"".join(encoded)
+    offsets_shm = shared_memory.SharedMemory(create=True, size=offsets.nbytes)
+    np.ndarray(offsets.shape, dtype=np.int64, buffer=offsets_shm.buf)[:] = offsets
+    return text_shm, offsets_shm
+
+
+def embed_chunks_parallel(chunks: List[str], workers: Optional[int] = None, batch_size: int = 32,
+                          task_size: int = 256, backend: Optional[str] = None) -> np.ndarray:
+    """
+    多进程向量化，返回 float32 矩阵（每行一个归一化后的向量）
+
+    Args:
+        chunks: 文本列表
+        workers: 进程数，默认等于 CPU 核数
+        batch_size: 模型每次前向的 batch 大小
+        task_size: 每个任务包含的文本条数（负载均衡的粒度）
+        backend: 推理后端，默认使用 rag.RAG_BACKEND
+    """
+    workers = workers or os.cpu_count() or 1
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    text_shm, offsets_shm = _shared_texts(chunks)
+    output_shm = None
+    try:
+        # spawn：torch 在 fork 出的子进程中可能死锁
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"), initializer=_init_worker,
+                                 initargs=(text_shm.name, offsets_shm.name, len(chunks), backend, threads)) as pool:
+            dimension = pool.submit(_dimension).result()
+            shape = (len(chunks), dimension)
+            output_shm = shared_memory.SharedMemory(create=True, size=max(len(chunks) * dimension * 4, 1))
+
+            futures = [
+                pool.submit(_embed_range, start, min(start + task_size, len(chunks)), output_shm.name, shape,
+                            batch_size)
+                for start in range(0, len(chunks), task_size)
+            ]
+            for future in as_completed(futures):
+                future.result()
+
+        return np.ndarray(shape, dtype=np.float32, buffer=output_shm.buf).copy()
+    finally:
+        for shm in (text_shm, offsets_shm, output_shm):
+            if shm is not None:
+                shm.close()
+                shm.unlink()
@@ -0,0 +1,141 @@
+"""
+持久化 RAG 索引
+EphemeralClient 每次进程重启都要重新切块、向量化、写入。这里把索引保存在 INDEX_DIR 下，重启后直接加载：
+- chroma：chromadb.PersistentClient
+- float16 / pq：vector_store.CompactVectorStore（本身就是磁盘上的内存映射格式）
+
+索引目录中的 manifest.json 记录构建参数（清单格式版本、嵌入模型、推理后端和 int8 量化配置、切块设置、存储格式、文档哈希）。
+加载时与当前配置逐项比较，不一致说明索引已过期（例如换了嵌入模型，查询向量和索引向量不在同一空间），
+此时拒绝加载并抛出 StaleIndexError，需要显式 rebuild。manifest 最后写入，构建中断的目录不会被当作可用索引
+
+用法:
+    from persistent_index import open_index
+    collection = open_index("doc.md")                 # 没有索引时构建，有则直接加载
+    collection = open_index("doc.md", rebuild=True)   # 强制重建
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional
+
+import rag
+
+MANIFEST_VERSION = 2
+MANIFEST_FILE = "manifest.json"
+INDEX_DIR = os.getenv("INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rag_index"))
+COLLECTION_NAME = "rag"
+
+
+class StaleIndexError(RuntimeError):
+    """磁盘上的索引与当前配置不一致"""
+
+    def __init__(self, index_dir: str, mismatches: List[str]):
+        self.index_dir = index_dir
+        self.mismatches = mismatches
+        super().__init__(f"Stale index at {index_dir}: {'; '.join(mismatches)} (rebuild it with --rebuild)")
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def expected_manifest(doc_file: str, store: str) -> Dict[str, Any]:
+    """根据当前配置生成清单（不含构建结果相关的字段）"""
+    return {
+        "version": MANIFEST_VERSION,
+        "embedding_model": rag.EMBEDDING_MODEL,
+        "backend": rag.RAG_BACKEND,
+        # 量化配置不同，int8 嵌入向量也不同；只有 onnx-int8 后端使用，其他后端记为 None
+        "quantization": rag.ONNX_QUANTIZATION if rag.RAG_BACKEND == "onnx-int8" else None,
+        "chunker": {"name": "split_into_chunks", "separator": rag.CHUNK_SEPARATOR},
+        "store": store,
+        "documents": {os.path.basename(doc_file): file_hash(doc_file)},
+    }
+
+
+def read_manifest(index_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_manifest(manifest: Dict[str, Any], expected: Dict[str, Any]) -> List[str]:
+    """返回不一致的字段说明，空列表表示索引可用"""
+    return [
+        f"{key}: index has {manifest.get(key)!r}, expected {value!r}"
+        for key, value in expected.items()
+        if manifest.get(key) != value
+    ]
+
+
+def _write_manifest(index_dir: str, manifest: Dict[str, Any]) -> None:
+    # 先写临时文件再替换，避免留下半个 manifest
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _load_store(index_dir: str, store: str):
+    if store == "chroma":
+        import chromadb
+
+        client = chromadb.PersistentClient(path=os.path.join(index_dir, "chroma"))
+        return client.get_collection(name=COLLECTION_NAME)
+
+    from vector_store import CompactVectorStore
+    return CompactVectorStore(os.path.join(index_dir, store))
+
+
+def build_index(doc_file: str, index_dir: str = INDEX_DIR, store: str = "chroma", workers: int = 1):
+    """切块、向量化并写入 index_dir，最后写 manifest"""
+    # 先删除 manifest，构建中途失败时旧索引也不会再被加载
+    if os.path.exists(os.path.join(index_dir, MANIFEST_FILE)):
+        os.remove(os.path.join(index_dir, MANIFEST_FILE))
+    for name in rag.STORES:
+        if os.path.exists(os.path.join(index_dir, name)):
+            shutil.rmtree(os.path.join(index_dir, name))
+    os.makedirs(index_dir, exist_ok=True)
+
+    chunks = rag.split_into_chunks(doc_file)
+    embeddings = rag.embed_corpus(chunks, workers)
+    if store == "chroma":
+        import chromadb
+
+        client = chromadb.PersistentClient(path=os.path.join(index_dir, store))
+        collection = client.get_or_create_collection(name=COLLECTION_NAME)
+        rag.save_embeddings(collection, chunks, embeddings)
+    else:
+        from vector_store import CompactVectorStore
+        collection = CompactVectorStore.build(os.path.join(index_dir, store), embeddings, chunks, format=store)
+
+    manifest = expected_manifest(doc_file, store)
+    manifest.update(chunk_count=len(chunks), dimension=len(embeddings[0]) if embeddings else 0)
+    _write_manifest(index_dir, manifest)
+    return collection
+
+
+def open_index(doc_file: str, index_dir: str = INDEX_DIR, store: str = "chroma", rebuild: bool = False,
+               workers: int = 1):
+    """
+    加载持久化索引；目录中没有索引（或 rebuild=True）时重新构建
+
+    Raises:
+        StaleIndexError: 已有索引与当前模型 / 切块设置 / 文档不一致且未指定 rebuild
+    """
+    manifest = None if rebuild else read_manifest(index_dir)
+    if manifest is None:
+        return build_index(doc_file, index_dir, store, workers)
+
+    mismatches = check_manifest(manifest, expected_manifest(doc_file, store))
+    if mismatches:
+        raise StaleIndexError(index_dir, mismatches)
+    return _load_store(index_dir, store)
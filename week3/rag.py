@@ -0,0 +1,257 @@
+"""
+RAG 流水线（从 main.ipynb 中提取）：切块 → 向量化 → 存入 Chroma → 检索 → 重排 → 生成
+嵌入模型、重排模型、chromadb 和 OpenAI 客户端都在第一次使用时才加载并缓存，
+命令行只为真正用到的步骤付出启动开销（例如 --no-rerank 时不会加载 CrossEncoder）
+
+推理后端通过环境变量 RAG_BACKEND 选择：
+- torch（默认）：fp32 PyTorch
+- onnx：导出为 ONNX，用 onnxruntime 推理
+- onnx-int8：导出为 ONNX 并做动态 int8 量化（首次使用时导出到 ONNX_CACHE_DIR，之后直接加载）
+ONNX 后端需要安装 sentence-transformers[onnx]（optimum + onnxruntime）
+
+向量存储通过 --store 选择：chroma（默认）或 vector_store.py 中内存映射的紧凑索引（float16 / pq），
+紧凑索引写入 COMPACT_INDEX_DIR；--persist 时索引保存在 INDEX_DIR，重启后直接加载（见 persistent_index.py）
+--shards 为每个文档建一个分片，查询时并发检索所有分片后归并（见 sharded_retriever.py）
+
+用法: python rag.py "哆啦A梦使用的3个秘密道具分别是什么？" [--doc doc.md] [--top-k 5] [--rerank-k 3]
+"""
+
+import argparse
+import os
+import re
+import sys
+from functools import lru_cache
+from typing import List, Optional
+
+# 无法通过命令行访问 huggingface 时，下载到本地后把环境变量设置为本地路径，例如：./text2vec-base-chinese
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "shibing624/text2vec-base-chinese")
+RERANK_MODEL = os.getenv("RERANK_MODEL", "./mmarco-mMiniLMv2-L12-H384-v1")
+GENERATION_MODEL = os.getenv("GENERATION_MODEL", "gemini-2.5-flash")
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+RAG_BACKEND = os.getenv("RAG_BACKEND", "torch")
+# 动态量化针对的指令集：avx2 / avx512 / avx512_vnni / arm64
+ONNX_QUANTIZATION = os.getenv("ONNX_QUANTIZATION", "avx2")
+# 重排分数缓存的条目数（0 表示不缓存）；RERANK_MODEL_VERSION 用于本地模型权重更新后手动让缓存失效
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "100000"))
+RERANK_MODEL_VERSION = os.getenv("RERANK_MODEL_VERSION", "")
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx_models"))
+
+COMPACT_INDEX_DIR = os.getenv("COMPACT_INDEX_DIR",
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), "compact_index"))
+STORES = ("chroma", "float16", "pq")
+
+# split_into_chunks 的切块方式，会记录到持久化索引的 manifest 中
+CHUNK_SEPARATOR = "\n\n"
+
+DEFAULT_DOC_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "doc.md")
+
+
+# ============= 延迟加载的依赖 =============
+def quantized_model_dir(model_name: str) -> str:
+    """量化后的 ONNX 模型在本地缓存的目录"""
+    return os.path.join(ONNX_CACHE_DIR, re.sub(r"[^\w.-]+", "_", model_name.strip("./")))
+
+
+def _load_model(model_class, model_name: str, backend: str):
+    """按后端加载 SentenceTransformer / CrossEncoder"""
+    if backend == "torch":
+        return model_class(model_name)
+    if backend == "onnx":
+        return model_class(model_name, backend="onnx")
+    if backend == "onnx-int8":
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        save_dir = quantized_model_dir(model_name)
+        file_name = f"onnx/model_qint8_{ONNX_QUANTIZATION}.onnx"
+        if not os.path.exists(os.path.join(save_dir, file_name)):
+            # 首次使用：先导出 fp32 ONNX，再做动态 int8 量化，都保存到缓存目录
+            model = model_class(model_name, backend="onnx")
+            model.save_pretrained(save_dir)
+            export_dynamic_quantized_onnx_model(model, ONNX_QUANTIZATION, save_dir)
+        return model_class(save_dir, backend="onnx", model_kwargs={"file_name": file_name})
+    raise ValueError(f"Unknown RAG backend: {backend} (expected one of {', '.join(BACKENDS)})")
+
+
+@lru_cache(maxsize=None)
+def get_embedding_model(backend: Optional[str] = None):
+    """第一次向量化时才导入 sentence_transformers（连带 torch / onnxruntime）并加载嵌入模型"""
+    from sentence_transformers import SentenceTransformer
+    return _load_model(SentenceTransformer, EMBEDDING_MODEL, backend or RAG_BACKEND)
+
+
+@lru_cache(maxsize=None)
+def get_cross_encoder(backend: Optional[str] = None):
+    """重排模型只加载一次，之后每次 rerank 复用"""
+    from sentence_transformers import CrossEncoder
+    return _load_model(CrossEncoder, RERANK_MODEL, backend or RAG_BACKEND)
+
+
+def reranker_version(backend: Optional[str] = None) -> str:
+    """重排模型版本：模型名、推理后端（int8 还包括量化配置）和手动指定的版本号，任一变化都会让分数缓存失效"""
+    backend = backend or RAG_BACKEND
+    if backend == "onnx-int8":
+        backend = f"{backend}-{ONNX_QUANTIZATION}"
+    return "|".join([RERANK_MODEL, backend, RERANK_MODEL_VERSION])
+
+
+@lru_cache(maxsize=None)
+def get_rerank_cache():
+    from rerank_cache import RerankScoreCache
+    return RerankScoreCache(RERANK_CACHE_SIZE)
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    # 客户端工厂（加载 .env、按 LLM_CACHE 包装）与 week2 共用
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "week2"))
+    from llm_client import create_client
+    return create_client()
+
+
+# ============= 流水线各步骤 =============
+def split_into_chunks(doc_file: str) -> List[str]:
+    with open(doc_file, 'r', encoding='utf-8') as file:
+        content = file.read()
+
+    return [chunk for chunk in content.split(CHUNK_SEPARATOR)]
+
+
+def embed_chunk(chunk: str) -> List[float]:
+    embedding = get_embedding_model().encode(chunk, normalize_embeddings=True)
+    return embedding.tolist()
+
+
+def embed_chunks(chunks: List[str], batch_size: int = 32) -> List[List[float]]:
+    """批量向量化，比逐条调用 embed_chunk 快得多"""
+    embeddings = get_embedding_model().encode(chunks, batch_size=batch_size, normalize_embeddings=True)
+    return embeddings.tolist()
+
+
+def embed_corpus(chunks: List[str], workers: int = 1) -> List[List[float]]:
+    """建索引时向量化全部片段，workers 大于 1 时使用多进程"""
+    if workers > 1:
+        from parallel_embed import embed_chunks_parallel
+        return embed_chunks_parallel(chunks, workers=workers).tolist()
+    return embed_chunks(chunks)
+
+
+def create_collection(name: str = "default"):
+    import chromadb
+
+    chromadb_client = chromadb.EphemeralClient()
+    return chromadb_client.get_or_create_collection(name=name)
+
+
+def save_embeddings(collection, chunks: List[str], embeddings: List[List[float]]) -> None:
+    collection.add(
+        documents=chunks,
+        embeddings=embeddings,
+        ids=[str(i) for i in range(len(chunks))]
+    )
+
+
+def retrieve(collection, query: str, top_k: int) -> List[str]:
+    query_embedding = embed_chunk(query)
+    results = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=top_k
+    )
+    return results['documents'][0]
+
+
+def rerank(query: str, retrieved_chunks: List[str], top_k: int) -> List[str]:
+    # 只有缓存中没有的 pair 才会送进 CrossEncoder；全部命中时连模型都不需要加载
+    scores = get_rerank_cache().scores(query, retrieved_chunks, lambda pairs: get_cross_encoder().predict(pairs),
+                                       reranker_version())
+
+    scored_chunks = list(zip(retrieved_chunks, scores))
+    scored_chunks.sort(key=lambda x: x[1], reverse=True)
+
+    return [chunk for chunk, _ in scored_chunks][:top_k]
+
+
+def generate(query: str, chunks: List[str]) -> str:
+    system_prompt = f"""你是一位知识助手，请根据用户的问题和下列片段生成准确的回答。
+相关片段:
+{"".join(chunks)}
+请基于上述内容作答，不要编造信息。"""
+
+    response = get_client().chat.completions.create(
+        model=GENERATION_MODEL,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": query}
+        ],
+        temperature=0.7
+    )
+
+    return response.choices[0].message.content
+
+
+def build_in_memory(doc_file: str, store: str = "chroma", workers: int = 1, name: str = "default"):
+    """每次启动都重新切块、向量化（chroma 为内存中的 EphemeralClient），name 区分同一进程中的多个索引"""
+    chunks = split_into_chunks(doc_file)
+    embeddings = embed_corpus(chunks, workers)
+    if store == "chroma":
+        collection = create_collection(name)
+        save_embeddings(collection, chunks, embeddings)
+        return collection
+
+    from vector_store import CompactVectorStore
+    return CompactVectorStore.build(os.path.join(COMPACT_INDEX_DIR, name), embeddings, chunks, format=store)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基于文档的 RAG 问答")
+    parser.add_argument("query", help="用户问题")
+    parser.add_argument("--doc", default=DEFAULT_DOC_FILE, help="知识文档，按空行切块")
+    parser.add_argument("--top-k", type=int, default=5, help="向量检索返回的片段数")
+    parser.add_argument("--rerank-k", type=int, default=3, help="重排后保留的片段数")
+    parser.add_argument("--no-rerank", action="store_true", help="跳过重排（不加载 CrossEncoder）")
+    parser.add_argument("--no-generate", action="store_true", help="只输出检索结果，不调用 LLM")
+    parser.add_argument("--workers", type=int, default=1, help="向量化进程数，大于 1 时使用多进程建索引")
+    parser.add_argument("--store", choices=STORES, default="chroma", help="向量存储格式")
+    parser.add_argument("--persist", action="store_true", help="使用持久化索引，已有索引时直接加载")
+    parser.add_argument("--index-dir", help="持久化索引目录（默认 INDEX_DIR）")
+    parser.add_argument("--rebuild", action="store_true", help="重建持久化索引（模型或文档变化后使用）")
+    parser.add_argument("--shards", nargs="+", metavar="DOC", help="每个文档建一个分片，并发检索后归并（代替 --doc）")
+    parser.add_argument("--shard-timeout", type=float, help="每个分片的检索超时（秒）")
+    options = parser.parse_args()
+
+    if options.shards:
+        from sharded_retriever import ShardedRetriever
+        shards = {}
+        for i, doc in enumerate(options.shards):
+            # 分片名取文件名，重名时加上序号
+            name = os.path.splitext(os.path.basename(doc))[0]
+            shards[name if name not in shards else f"{name}{i}"] = build_in_memory(doc, options.store,
+                                                                                   options.workers, f"shard{i}")
+        collection = ShardedRetriever(shards, timeout=options.shard_timeout)
+    elif options.persist:
+        from persistent_index import INDEX_DIR, StaleIndexError, open_index
+        try:
+            collection = open_index(options.doc, options.index_dir or INDEX_DIR, options.store, options.rebuild,
+                                    options.workers)
+        except StaleIndexError as e:
+            sys.exit(f"❌ {e}")
+    else:
+        collection = build_in_memory(options.doc, options.store, options.workers)
+
+    retrieved_chunks = retrieve(collection, options.query, options.top_k)
+    if options.shards:
+        for shard, entry in collection.last_report.items():
+            print(f"🔀 分片 {shard}: {entry['status']}，{entry['latency'] * 1000:.1f} ms")
+        collection.close()
+    if not options.no_rerank:
+        retrieved_chunks = rerank(options.query, retrieved_chunks, options.rerank_k)
+
+    for i, chunk in enumerate(retrieved_chunks):
+        print(f"[{i}] {chunk}\n")
+
+    if not options.no_generate:
+        print(generate(options.query, retrieved_chunks))
+
+
+if __name__ == "__main__":
+    main()
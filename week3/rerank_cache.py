@@ -0,0 +1,99 @@
+"""
+重排分数缓存
+热门问题和生成失败后的重试会反复对同样的 (query, chunk) 重新打分。这里在 CrossEncoder.predict 前加一层有界 LRU 缓存：
+- 键为规范化后的问题（NFKC、去首尾空白、合并空白、小写）和片段内容的 SHA-1
+- 只有未命中的 pair 才会组成一个批次送进模型，同一批中重复的片段只算一次
+- 缓存与重排模型版本绑定，版本变化（换模型、换推理后端）时整体失效
+
+用法:
+    cache = RerankScoreCache(max_entries=100000)
+    scores = cache.scores(query, chunks, predict=cross_encoder.predict, model_version="model|torch")
+    print(cache.metrics())
+"""
+
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, List, Sequence, Tuple
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", query)).strip().lower()
+
+
+def chunk_hash(chunk: str) -> str:
+    return hashlib.sha1(chunk.encode("utf-8")).hexdigest()
+
+
+class RerankScoreCache:
+    def __init__(self, max_entries: int = 100000):
+        """max_entries 为 0 时不缓存，每次都直接调用模型"""
+        self.max_entries = max_entries
+        self.model_version = None
+        self._entries: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "model_calls": 0, "evictions": 0, "invalidations": 0}
+
+    def scores(self, query: str, chunks: Sequence[str], predict: Callable, model_version: str) -> List[float]:
+        """
+        返回每个片段的重排分数，顺序与 chunks 相同
+
+        Args:
+            predict: 接收 [(query, chunk)] 返回分数序列的函数，只在有未命中的 pair 时调用一次
+            model_version: 重排模型版本，与缓存中的版本不同时先清空缓存
+        """
+        normalized = normalize_query(query)
+        keys = [(normalized, chunk_hash(chunk)) for chunk in chunks]
+
+        with self._lock:
+            if model_version != self.model_version:
+                if self._entries:
+                    self.stats["invalidations"] += 1
+                self._entries.clear()
+                self.model_version = model_version
+            cached: Dict[Tuple[str, str], float] = {}
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    cached[key] = self._entries[key]
+            self.stats["hits"] += sum(1 for key in keys if key in cached)
+            self.stats["misses"] += sum(1 for key in keys if key not in cached)
+
+        # 未命中的片段去重后一次性送进模型（在锁外执行，不阻塞其他线程的命中查询）
+        missing = {key: chunk for key, chunk in zip(keys, chunks) if key not in cached}
+        if missing:
+            predicted = predict([(query, chunk) for chunk in missing.values()])
+            computed = dict(zip(missing, (float(score) for score in predicted)))
+            with self._lock:
+                self.stats["model_calls"] += 1
+                if self.model_version == model_version:
+                    for key, score in computed.items():
+                        self._store(key, score)
+            cached.update(computed)
+
+        return [cached[key] for key in keys]
+
+    def _store(self, key: Tuple[str, str], score: float) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = score
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "model_version": self.model_version,
+            }
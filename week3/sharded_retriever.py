@@ -0,0 +1,120 @@
+"""
+分片检索
+每条产品线各有一个知识库（Chroma collection 或 CompactVectorStore）。ShardedRetriever 把同一个查询向量并发发给所有分片：
+- 线程池并发查询，总延迟取决于最慢的分片而不是分片数之和
+- 每个分片有自己的超时，超时的分片本次直接跳过，不拖慢整个查询
+- 各分片返回的 top-k 用堆按距离归并（所有分片必须使用相同的嵌入模型和距离度量）
+- 记录每个分片的延迟和超时次数
+
+查询接口与 Chroma collection.query 相同，rag.retrieve 可以直接使用
+
+用法:
+    retriever = ShardedRetriever({"手机": collection_a, "电脑": collection_b}, timeout=0.5)
+    chunks = rag.retrieve(retriever, "问题", top_k=5)
+    print(retriever.last_report, retriever.metrics())
+"""
+
+import heapq
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Any, Dict, List, Optional
+
+
+class ShardedRetriever:
+    def __init__(self, shards: Dict[str, Any], timeout: Optional[float] = None,
+                 shard_timeouts: Optional[Dict[str, float]] = None, workers: Optional[int] = None):
+        """
+        Args:
+            shards: 分片名 → 支持 query(query_embeddings, n_results) 的集合
+            timeout: 默认的分片超时（秒），None 表示一直等待
+            shard_timeouts: 个别分片的超时，覆盖 timeout
+            workers: 线程数，默认是分片数的 2 倍（超时的查询仍占着线程，留出余量）
+        """
+        self.shards = dict(shards)
+        self.timeout = timeout
+        self.shard_timeouts = shard_timeouts or {}
+        self.pool = ThreadPoolExecutor(max_workers=workers or 2 * max(len(self.shards), 1),
+                                       thread_name_prefix="shard")
+        self.last_report: Dict[str, Dict] = {}
+        # 只保留每个分片最近的延迟样本
+        self._latencies: Dict[str, deque] = {name: deque(maxlen=1000) for name in self.shards}
+        self._stats = {name: {"queries": 0, "timeouts": 0, "errors": 0} for name in self.shards}
+        self._lock = threading.Lock()
+
+    def _query_shard(self, name: str, query_embedding, n_results: int):
+        start = time.perf_counter()
+        results = self.shards[name].query(query_embeddings=[query_embedding], n_results=n_results)
+        return results, time.perf_counter() - start
+
+    def search(self, query_embedding, top_k: int) -> List[Dict]:
+        """返回合并后的 top_k：[{"shard", "id", "document", "distance"}]，按距离从小到大"""
+        start = time.perf_counter()
+        futures = {name: self.pool.submit(self._query_shard, name, query_embedding, top_k) for name in self.shards}
+
+        report, candidates = {}, []
+        for name, future in futures.items():
+            timeout = self.shard_timeouts.get(name, self.timeout)
+            # 所有分片同时开始，所以按同一个起点计算各自的剩余时间
+            remaining = None if timeout is None else max(0.0, start + timeout - time.perf_counter())
+            try:
+                results, latency = future.result(timeout=remaining)
+            except TimeoutError:
+                future.cancel()
+                report[name] = {"status": "timeout", "latency": time.perf_counter() - start}
+                continue
+            except Exception as e:
+                report[name] = {"status": "error", "error": str(e), "latency": time.perf_counter() - start}
+                continue
+
+            report[name] = {"status": "ok", "latency": latency}
+            for id_, document, distance in zip(results["ids"][0], results["documents"][0], results["distances"][0]):
+                candidates.append((distance, name, id_, document))
+
+        self._record(report)
+        return [
+            {"shard": name, "id": id_, "document": document, "distance": distance}
+            for distance, name, id_, document in heapq.nsmallest(top_k, candidates, key=lambda item: item[0])
+        ]
+
+    def _record(self, report: Dict[str, Dict]) -> None:
+        with self._lock:
+            self.last_report = report
+            for name, entry in report.items():
+                stats = self._stats[name]
+                stats["queries"] += 1
+                if entry["status"] == "timeout":
+                    stats["timeouts"] += 1
+                elif entry["status"] == "error":
+                    stats["errors"] += 1
+                else:
+                    self._latencies[name].append(entry["latency"])
+
+    def query(self, query_embeddings, n_results: int) -> Dict[str, List]:
+        """与 Chroma collection.query 相同的返回结构，id 带上分片名前缀"""
+        results = {"ids": [], "documents": [], "distances": []}
+        for query_embedding in query_embeddings:
+            hits = self.search(query_embedding, n_results)
+            results["ids"].append([f"{hit['shard']}:{hit['id']}" for hit in hits])
+            results["documents"].append([hit["document"] for hit in hits])
+            results["distances"].append([hit["distance"] for hit in hits])
+        return results
+
+    def metrics(self) -> Dict[str, Dict]:
+        """每个分片的查询数、超时 / 出错次数和成功查询的延迟分位数（毫秒）"""
+        with self._lock:
+            metrics = {}
+            for name, stats in self._stats.items():
+                latencies = sorted(self._latencies[name])
+                metrics[name] = {
+                    **stats,
+                    "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else None,
+                    "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+                    if latencies else None,
+                }
+            return metrics
+
+    def close(self) -> None:
+        # 不等待超时分片上仍在运行的查询
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,200 @@
+"""
+紧凑的内存映射向量索引
+embed_chunk 返回的 Python float 列表每维约占 32 字节，存入 Chroma 后仍是 float32。为了在检索节点上放下更多片段：
+- float16：每维 2 字节，检索时按块转换为 float32 计算内积
+- pq（乘积量化）：把向量切成 M 个子空间，每个子空间用 256 个聚类中心编码，每个向量只占 M 字节
+两种格式都可以额外保存一份 float32 全精度向量，检索时先在压缩向量上选出候选，再用全精度向量对候选重新打分；
+所有数组都通过 numpy.memmap 映射，只有真正访问到的页才会进入内存
+
+目录结构:
+    meta.json       格式、数量、维度、PQ 参数
+    documents.json  片段文本
+    vectors.f16     float16 向量（float16 格式）
+    codes.u8        PQ 编码（pq 格式）
+    codebooks.f32   PQ 聚类中心 (M, K, D/M)
+    full.f32        float32 全精度向量（可选，用于重新打分）
+
+查询接口与 Chroma collection.query 相同，rag.retrieve 可以直接使用
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+FORMATS = ("float16", "pq")
+
+# 检索时每次转换 / 计算的行数，控制临时 float32 数组的大小
+_BLOCK_ROWS = 65536
+
+
+def train_pq(vectors: np.ndarray, subspaces: int, centroids: int = 256, iterations: int = 20,
+             sample_size: int = 65536, seed: int = 0) -> np.ndarray:
+    """对每个子空间分别做 k-means，返回形状为 (M, K, D/M) 的聚类中心"""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample_size:
+        vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    vectors = np.asarray(vectors, dtype=np.float32)
+    dimension = vectors.shape[1]
+    if dimension % subspaces:
+        raise ValueError(f"dimension {dimension} is not divisible by {subspaces} subspaces")
+    sub_dimension = dimension // subspaces
+    centroids = min(centroids, len(vectors))
+
+    codebooks = np.empty((subspaces, centroids, sub_dimension), dtype=np.float32)
+    for m in range(subspaces):
+        data = vectors[:, m * sub_dimension:(m + 1) * sub_dimension]
+        centers = data[rng.choice(len(data), centroids, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = _nearest(data, centers)
+            sums = np.zeros_like(centers)
+            np.add.at(sums, assignment, data)
+            counts = np.bincount(assignment, minlength=centroids)
+            filled = counts > 0
+            centers[filled] = sums[filled] / counts[filled, None]
+            # 空簇重新随机取一个样本作为中心
+            empty = np.flatnonzero(~filled)
+            if len(empty):
+                centers[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+        codebooks[m] = centers
+    return codebooks
+
+
+def _nearest(data: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """每行最近的聚类中心下标（欧氏距离）"""
+    distances = (data ** 2).sum(axis=1, keepdims=True) - 2 * data @ centers.T + (centers ** 2).sum(axis=1)
+    return distances.argmin(axis=1)
+
+
+def encode_pq(vectors: np.ndarray, codebooks: np.ndarray) -> np.ndarray:
+    subspaces, _, sub_dimension = codebooks.shape
+    codes = np.empty((len(vectors), subspaces), dtype=np.uint8)
+    for start in range(0, len(vectors), _BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+        for m in range(subspaces):
+            codes[start:start + len(block), m] = _nearest(block[:, m * sub_dimension:(m + 1) * sub_dimension],
+                                                          codebooks[m])
+    return codes
+
+
+class CompactVectorStore:
+    def __init__(self, path: str):
+        """打开已经构建好的索引目录（只读映射）"""
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, "documents.json"), "r", encoding="utf-8") as f:
+            self.documents: List[str] = json.load(f)
+        self.format = self.meta["format"]
+        self.count = self.meta["count"]
+        self.dimension = self.meta["dimension"]
+        shape = (self.count, self.dimension)
+
+        self.vectors = self.codes = self.codebooks = self.full = None
+        if self.format == "float16":
+            self.vectors = self._map("vectors.f16", np.float16, shape)
+        else:
+            subspaces = self.meta["pq_subspaces"]
+            self.codes = self._map("codes.u8", np.uint8, (self.count, subspaces))
+            self.codebooks = np.fromfile(os.path.join(path, "codebooks.f32"), dtype=np.float32).reshape(
+                subspaces, -1, self.dimension // subspaces)
+        if self.meta["full_precision"]:
+            self.full = self._map("full.f32", np.float32, shape)
+
+    def _map(self, name: str, dtype, shape) -> np.ndarray:
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode="r", shape=shape)
+
+    @classmethod
+    def build(cls, path: str, embeddings, documents: List[str], format: str = "float16", subspaces: int = 16,
+              full_precision: bool = True) -> "CompactVectorStore":
+        """把向量写成紧凑格式并返回打开的索引；embeddings 可以是列表或 numpy 数组"""
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format: {format} (expected one of {', '.join(FORMATS)})")
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        os.makedirs(path, exist_ok=True)
+
+        if format == "float16":
+            embeddings.astype(np.float16).tofile(os.path.join(path, "vectors.f16"))
+        else:
+            codebooks = train_pq(embeddings, subspaces)
+            codebooks.tofile(os.path.join(path, "codebooks.f32"))
+            encode_pq(embeddings, codebooks).tofile(os.path.join(path, "codes.u8"))
+        if full_precision:
+            embeddings.tofile(os.path.join(path, "full.f32"))
+
+        with open(os.path.join(path, "documents.json"), "w", encoding="utf-8") as f:
+            json.dump(list(documents), f, ensure_ascii=False)
+        meta = {
+            "format": format,
+            "count": len(embeddings),
+            "dimension": embeddings.shape[1],
+            "pq_subspaces": subspaces if format == "pq" else None,
+            "full_precision": full_precision,
+        }
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        return cls(path)
+
+    def resident_bytes_per_vector(self) -> float:
+        """检索时需要常驻内存的字节数 / 向量（全精度向量只访问候选所在的页，不计入）"""
+        if self.format == "float16":
+            return self.dimension * 2
+        return self.codes.shape[1] + self.codebooks.nbytes / max(self.count, 1)
+
+    def _approximate_scores(self, query: np.ndarray) -> np.ndarray:
+        """压缩向量上的近似内积"""
+        scores = np.empty(self.count, dtype=np.float32)
+        if self.format == "float16":
+            for start in range(0, self.count, _BLOCK_ROWS):
+                block = self.vectors[start:start + _BLOCK_ROWS]
+                scores[start:start + len(block)] = block.astype(np.float32) @ query
+        else:
+            # ADC：先算查询子向量与每个聚类中心的内积表，再按编码查表求和
+            subspaces, _, sub_dimension = self.codebooks.shape
+            table = np.einsum("mkd,md->mk", self.codebooks, query.reshape(subspaces, sub_dimension))
+            rows = np.arange(subspaces)
+            for start in range(0, self.count, _BLOCK_ROWS):
+                codes = self.codes[start:start + _BLOCK_ROWS]
+                scores[start:start + len(codes)] = table[rows, codes].sum(axis=1)
+        return scores
+
+    def search(self, query_embedding, top_k: int, rescore: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        返回 [(下标, 内积)]，按分数从高到低排列
+
+        Args:
+            query_embedding: 归一化后的查询向量
+            top_k: 返回条数
+            rescore: 用全精度向量重新打分的候选数，默认 max(4 * top_k, 32)；为 0 或没有全精度向量时不重新打分
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        top_k = min(top_k, self.count)
+        if top_k <= 0:
+            # 空索引或 top_k=0：argpartition 的 kth 会变成 -1
+            return []
+        scores = self._approximate_scores(query)
+
+        if rescore is None:
+            rescore = max(4 * top_k, 32)
+        if self.full is not None and rescore:
+            candidates = min(max(rescore, top_k), self.count)
+            indices = np.argpartition(-scores, candidates - 1)[:candidates]
+            indices.sort()  # 按顺序访问 memmap，减少随机读
+            scores = self.full[indices] @ query
+        else:
+            indices = np.argpartition(-scores, top_k - 1)[:top_k]
+            scores = scores[indices]
+
+        order = np.argsort(-scores)[:top_k]
+        return [(int(indices[i]), float(scores[i])) for i in order]
+
+    def query(self, query_embeddings, n_results: int) -> Dict[str, Any]:
+        """与 Chroma collection.query 相同的返回结构（distances 为余弦距离）"""
+        results = {"ids": [], "documents": [], "distances": []}
+        for query_embedding in query_embeddings:
+            hits = self.search(query_embedding, n_results)
+            results["ids"].append([str(index) for index, _ in hits])
+            results["documents"].append([self.documents[index] for index, _ in hits])
+            results["distances"].append([1.0 - score for _, score in hits])
+        return results
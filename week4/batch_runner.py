@@ -0,0 +1,185 @@
+"""
+FunctionCallingAgent 批量任务运行器
+从 JSONL 读取任务，在有界线程池中并发执行，每完成一个任务立即追加写入结果 JSONL；
+中断后重新运行会跳过结果文件中已完成的任务
+
+每个任务在自己的工作目录（<workdir_root>/<任务 id>-<id 的哈希>）中运行：工具的相对路径都解析到这个目录，
+并发任务之间不会互相读写文件。目录在任务开始时重新创建，先复制 template_dir，再写入任务的 files
+
+任务文件每行一个 JSON 对象：
+    {"id": "task-1", "query": "...", "files": {"相对路径": "内容"}}
+也兼容 requests.jsonl 的格式（request_id / title / body）；没有 id 时按任务内容的哈希生成，
+编辑任务文件（插入、删除其他行）不会改变已有任务的 id，断点续跑仍能对上
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Set
+
+from function_calling_agent import QUIET, FunctionCallingAgent, argument_validator
+from scheduler import RateLimitScheduler
+
+
+def _short_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:10]
+
+
+def load_tasks(path: str) -> List[Dict[str, Any]]:
+    """读取任务；没有 id 时由 query 和 files 的哈希生成，id 重复时报错"""
+    tasks = []
+    seen = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            data = json.loads(line)
+            query = data.get("query")
+            if query is None:
+                query = "\n\n".join(part for part in (data.get("title"), data.get("body")) if part)
+            files = data.get("files", {})
+            task_id = data.get("id") or data.get("request_id")
+            if not task_id:
+                content = json.dumps({"query": query, "files": files}, ensure_ascii=False, sort_keys=True)
+                task_id = f"task-{_short_hash(content)}"
+            task_id = str(task_id)
+            if task_id in seen:
+                raise ValueError(f"{path}:{line_number}: 任务 id '{task_id}' 与第 {seen[task_id]} 行重复"
+                                 f"（没有 id 的任务按内容生成 id，内容相同的任务也会重复）")
+            seen[task_id] = line_number
+            tasks.append({"id": task_id, "query": query, "files": files})
+    return tasks
+
+
+def load_finished(path: str, retry_failed: bool = False) -> Set[str]:
+    """从已有结果文件中读出已完成的任务 id；最后一行可能因中断而不完整，直接忽略"""
+    finished = set()
+    if not os.path.exists(path):
+        return finished
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if result.get("status") == "ok" or not retry_failed:
+                finished.add(result["id"])
+    return finished
+
+
+def prepare_workdir(task: Dict[str, Any], workdir_root: str, template_dir: Optional[str] = None) -> str:
+    """创建任务的工作目录；重跑时先删除上一次留下的目录，保证每次从相同的初始状态开始"""
+    # 清理后的 id 可能重名（例如 a/b 和 a_b），加上原始 id 的哈希，保证不同任务不会共用或删除同一个目录
+    name = re.sub(r"[^\w.-]", "_", task["id"]) + "-" + _short_hash(task["id"])
+    workdir = os.path.abspath(os.path.join(workdir_root, name))
+    shutil.rmtree(workdir, ignore_errors=True)
+    if template_dir:
+        shutil.copytree(template_dir, workdir)
+    else:
+        os.makedirs(workdir)
+    for relative_path, content in task.get("files", {}).items():
+        file_path = os.path.join(workdir, relative_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(content)
+    return workdir
+
+
+def run_task(task: Dict[str, Any], model: str, max_iterations: int,
+             scheduler: Optional[RateLimitScheduler], speculative: bool = False,
+             workdir_root: str = "batch_workdirs", template_dir: Optional[str] = None) -> Dict[str, Any]:
+    """每个任务使用独立的 agent 实例和工作目录，异常只影响当前任务"""
+    start = time.perf_counter()
+    workdir = None
+    try:
+        workdir = prepare_workdir(task, workdir_root, template_dir)
+        agent = FunctionCallingAgent(model=model, verbosity=QUIET, scheduler=scheduler, speculative=speculative,
+                                     workdir=workdir)
+        outcome = agent.run(task["query"], max_iterations=max_iterations)
+        status = "ok" if outcome["success"] else "incomplete"
+        error = None
+    except Exception as e:
+        outcome = {}
+        status = "error"
+        error = f"{type(e).__name__}: {e}"
+    result = {
+        "id": task["id"],
+        "status": status,
+        "response": outcome.get("response"),
+        "tokens": outcome.get("tokens", 0),
+        "tool_calls": outcome.get("tool_calls", 0),
+        "iterations": outcome.get("iterations", 0),
+        "latency": time.perf_counter() - start,
+        "workdir": workdir,
+        "error": error,
+    }
+    if "prefetch" in outcome:
+        result["prefetch"] = outcome["prefetch"]
+    return result
+
+
+def run_batch(tasks_file: str, output_file: str, workers: int = 8, model: str = "gpt-5-mini",
+              max_iterations: int = 10, requests_per_minute: Optional[float] = None,
+              tokens_per_minute: Optional[float] = None, retry_failed: bool = False,
+              speculative: bool = False, workdir_root: Optional[str] = None,
+              template_dir: Optional[str] = None) -> Dict[str, Any]:
+    """运行批量任务并返回汇总统计；workdir_root 默认为结果文件旁的 <output>_workdirs"""
+    workdir_root = workdir_root or os.path.splitext(output_file)[0] + "_workdirs"
+    tasks = load_tasks(tasks_file)
+    finished = load_finished(output_file, retry_failed)
+    pending = [task for task in tasks if task["id"] not in finished]
+    print(f"📋 共 {len(tasks)} 个任务，已完成 {len(tasks) - len(pending)} 个，本次运行 {len(pending)} 个")
+
+    scheduler = None
+    if requests_per_minute or tokens_per_minute:
+        scheduler = RateLimitScheduler(requests_per_minute or float("inf"), tokens_per_minute or float("inf"))
+
+    totals = {"ok": 0, "incomplete": 0, "error": 0, "tokens": 0, "tool_calls": 0}
+    start = time.perf_counter()
+
+    with open(output_file, "a", encoding="utf-8") as output, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_task, task, model, max_iterations, scheduler, speculative,
+                               workdir_root, template_dir) for task in pending]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            # 结果只在主线程写入；每个结果立即落盘，作为断点续跑的检查点
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            totals[result["status"]] += 1
+            totals["tokens"] += result["tokens"]
+            totals["tool_calls"] += result["tool_calls"]
+            elapsed = time.perf_counter() - start
+            print(f"   [{done}/{len(pending)}] {result['id']}: {result['status']} "
+                  f"({result['latency']:.1f}s, {result['tokens']} tokens) "
+                  f"- {done / elapsed * 60:.1f} 任务/分钟")
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "tasks": len(pending),
+        "skipped": len(tasks) - len(pending),
+        "elapsed": elapsed,
+        "tasks_per_minute": len(pending) / elapsed * 60 if elapsed > 0 else 0.0,
+        "tokens_per_minute": totals["tokens"] / elapsed * 60 if elapsed > 0 else 0.0,
+        **totals,
+    }
+    summary["arguments"] = argument_validator.metrics()
+    if scheduler is not None:
+        summary["scheduler"] = scheduler.metrics()
+
+    print(f"\n📊 批量运行完成")
+    print(f"   - 成功: {totals['ok']}，未完成: {totals['incomplete']}，出错: {totals['error']}")
+    print(f"   - 耗时: {elapsed:.1f}s，吞吐量: {summary['tasks_per_minute']:.1f} 任务/分钟")
+    print(f"   - Tokens: {totals['tokens']}（{summary['tokens_per_minute']:.0f}/分钟），"
+          f"平均每个任务 {totals['tokens'] / len(pending) if pending else 0:.0f}")
+    print(f"   - 工具调用: {totals['tool_calls']}，参数修复率 {summary['arguments']['repair_rate']:.1%}，"
+          f"拒绝率 {summary['arguments']['rejection_rate']:.1%}")
+    if scheduler is not None:
+        metrics = summary["scheduler"]
+        print(f"   - 调度器: 最大排队 {metrics['max_queue_depth']}，平均等待 {metrics['avg_wait']:.2f}s，"
+              f"429 次数 {metrics['rate_limited']}")
+    return summary
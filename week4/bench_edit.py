@@ -0,0 +1,140 @@
+"""
+edit_file 与整文件重写的对比基准
+以仓库中的源文件为语料，每个文件随机改动若干行，比较模型为完成同一修改需要输出的工具调用参数：
+- write_file：整个文件内容
+- edit_file + search/replace：改动行加上足以唯一定位的上下文
+- edit_file + unified diff：3 行上下文的 hunk
+报告输出 token 数，以及按解码速度估算的生成耗时（输出 token 是生成延迟的主要来源），
+并实际执行一次 edit_file 确认结果与整文件重写一致
+
+用法: python bench_edit.py [--files ../week2/agent.py ...] [--changes 1 3] [--tokens-per-second 50]
+"""
+
+import argparse
+import difflib
+import glob
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from functools import lru_cache
+from typing import Dict, List
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'week2'))
+import file_edit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    import tiktoken
+    return tiktoken.encoding_for_model("gpt-5-mini")
+
+
+def count_tokens(text: str) -> int:
+    return len(get_encoding().encode(text))
+
+
+def mutate(lines: List[str], changes: int, rng: random.Random) -> List[str]:
+    """在随机的非空行末尾追加注释，模拟小范围修改"""
+    candidates = [i for i, line in enumerate(lines) if line.strip()]
+    updated = list(lines)
+    for i in rng.sample(candidates, min(changes, len(candidates))):
+        ending = "\n" if updated[i].endswith("\n") else ""
+        updated[i] = updated[i].rstrip("\n") + "  # changed" + ending
+    return updated
+
+
+def search_replace_edits(old: List[str], new: List[str]) -> List[Dict[str, str]]:
+    """每个改动块生成一个 search/replace，不唯一时逐步向前后扩展上下文"""
+    text = "".join(old)
+    edits = []
+    matcher = difflib.SequenceMatcher(a=old, b=new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        before, after = i1, i2
+        while True:
+            search = "".join(old[before:after])
+            if search and text.count(search) == 1:
+                break
+            before, after = max(0, before - 1), min(len(old), after + 1)
+        replace = "".join(old[before:i1] + new[j1:j2] + old[i2:after])
+        edits.append({"search": search, "replace": replace})
+    return edits
+
+
+def unified_diff(old: List[str], new: List[str]) -> str:
+    """difflib 不会为缺少结尾换行的行输出 "\\ No newline at end of file"，这里补上"""
+    return "".join(line if line.endswith("\n") else line + "\n\\ No newline at end of file\n"
+                   for line in difflib.unified_diff(old, new, n=3))
+
+
+def tool_arguments(path: str, old: List[str], new: List[str]) -> Dict[str, str]:
+    """三种方式的工具调用参数（JSON 字符串，即模型实际输出的内容）"""
+    diff = unified_diff(old, new)
+    return {
+        "write_file": json.dumps({"file_path": path, "content": "".join(new)}, ensure_ascii=False),
+        "edit_file (search/replace)": json.dumps(
+            {"file_path": path, "edits": search_replace_edits(old, new)}, ensure_ascii=False),
+        "edit_file (diff)": json.dumps({"file_path": path, "diff": diff}, ensure_ascii=False),
+    }
+
+
+def apply_seconds(workdir: str, name: str, source: str, arguments: str, expected: str) -> float:
+    """在临时文件上实际执行一次工具调用，返回耗时并检查结果"""
+    path = os.path.join(workdir, os.path.basename(source))
+    shutil.copyfile(source, path)
+    args = json.loads(arguments)
+    start = time.perf_counter()
+    if name == "write_file":
+        file_edit.atomic_write(path, args["content"])
+    else:
+        file_edit.edit_file(path, edits=args.get("edits"), diff=args.get("diff"))
+    elapsed = time.perf_counter() - start
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        assert f.read() == expected, f"{name} produced a different file for {source}"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="edit_file 与整文件重写的对比基准")
+    parser.add_argument("--files", nargs="+", help="语料文件，默认使用仓库中的 week2 / week3 / week4 源文件")
+    parser.add_argument("--changes", type=int, nargs="+", default=[1, 3], help="每个文件改动的行数")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="估算生成耗时使用的解码速度")
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args()
+
+    files = options.files or sorted(
+        path for week in ("week2", "week3", "week4") for path in glob.glob(os.path.join(ROOT, week, "*.py")))
+    rng = random.Random(options.seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for changes in options.changes:
+            totals: Dict[str, List[float]] = {}
+            for source in files:
+                with open(source, "r", encoding="utf-8", newline="") as f:
+                    old = f.read().splitlines(keepends=True)
+                new = mutate(old, changes, rng)
+                expected = "".join(new)
+                for name, arguments in tool_arguments(source, old, new).items():
+                    tokens = count_tokens(arguments)
+                    seconds = apply_seconds(workdir, name, source, arguments, expected)
+                    entry = totals.setdefault(name, [0, 0.0])
+                    entry[0] += tokens
+                    entry[1] += seconds
+
+            baseline_tokens = totals["write_file"][0]
+            print(f"\n{len(files)} 个文件，每个文件改动 {changes} 行")
+            print(f"{'方式':<28} {'输出 tokens':>12} {'节省':>8} {'估算生成耗时(s)':>16} {'应用耗时(ms)':>12}")
+            for name, (tokens, seconds) in totals.items():
+                print(f"{name:<28} {tokens:>12} {1 - tokens / baseline_tokens:>8.1%} "
+                      f"{tokens / options.tokens_per_second:>16.1f} {seconds * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Agent 基准测试框架
+- 测试用例从 JSONL 文件加载（每行 name / query / files）
+- 每个用例重复 N 次，可选预热轮次（在每个工作进程中执行，不计入统计）
+- 使用进程池并发执行，每次运行都在独立的临时目录中进行
+- 输出均值、标准差、p50/p95 延迟、token、成功率，写入 JSON / CSV 以便做回归追踪
+"""
+
+import csv
+import json
+import math
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional
+
+# 默认测试用例文件
+DEFAULT_CASES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_cases.jsonl")
+
+
+@dataclass
+class TestCase:
+    name: str
+    query: str
+    # 运行前写入临时目录的文件：{相对路径: 内容}
+    files: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class RunResult:
+    case: str
+    agent: str
+    repetition: int
+    success: bool
+    latency: float
+    tokens: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    # 每次模型调用后的累计计费 token
+    tokens_per_iteration: List[int] = field(default_factory=list)
+    tool_calls: int = 0
+    error: Optional[str] = None
+
+
+def load_test_cases(path: str = DEFAULT_CASES_FILE) -> List[TestCase]:
+    """从 JSONL 文件加载测试用例，空行和 # 开头的行会被忽略；没有任何用例时抛出 ValueError"""
+    cases = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            data = json.loads(line)
+            cases.append(TestCase(
+                name=data.get("name") or data.get("title") or data.get("request_id"),
+                query=data.get("query") or data.get("body"),
+                files=data.get("files", {}),
+            ))
+    if not cases:
+        raise ValueError(f"No test cases in {path}")
+    return cases
+
+
+def _run_isolated(runner: Callable[[str], dict], agent: str, case: TestCase, repetition: int) -> RunResult:
+    """在独立临时目录中运行一次：写入用例文件、切换工作目录、计时、清理"""
+    work_dir = tempfile.mkdtemp(prefix=f"bench-{agent}-")
+    previous_dir = os.getcwd()
+    try:
+        for relative_path, content in case.files.items():
+            file_path = os.path.join(work_dir, relative_path)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(content)
+        os.chdir(work_dir)
+
+        start = time.perf_counter()
+        try:
+            outcome = runner(case.query)
+        except Exception as e:
+            return RunResult(case.name, agent, repetition, False, time.perf_counter() - start, error=str(e))
+        latency = time.perf_counter() - start
+
+        return RunResult(
+            case=case.name,
+            agent=agent,
+            repetition=repetition,
+            success=bool(outcome.get("success", False)),
+            latency=latency,
+            tokens=outcome.get("tokens", 0),
+            prompt_tokens=outcome.get("prompt_tokens", 0),
+            completion_tokens=outcome.get("completion_tokens", 0),
+            cached_tokens=outcome.get("cached_tokens", 0),
+            tokens_per_iteration=outcome.get("tokens_per_iteration", []),
+            tool_calls=outcome.get("tool_calls", 0),
+        )
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _warm_up(runners: Dict[str, Callable[[str], dict]], case: TestCase, warmup: int):
+    """进程池的 initializer：工作进程在执行计时任务前先把每个 agent 跑 warmup 次（导入模块、建立连接等）"""
+    for agent, runner in runners.items():
+        for i in range(warmup):
+            _run_isolated(runner, agent, case, -1 - i)
+
+
+def run_suite(cases: List[TestCase], runners: Dict[str, Callable[[str], dict]], repetitions: int = 3,
+              workers: int = 4, warmup: int = 0, on_result: Optional[Callable[[RunResult], None]] = None
+              ) -> List[RunResult]:
+    """
+    并发运行所有 (用例, agent, 重复次数) 组合
+
+    Args:
+        cases: 测试用例
+        runners: {agent 名称: 运行函数}，运行函数接收 query，返回包含 success/tokens/tool_calls 的字典；
+                 必须是模块顶层函数，才能传给子进程
+        repetitions: 每个用例每个 agent 的重复次数
+        workers: 进程池大小
+        warmup: 每个工作进程在执行计时任务前，每个 agent 的预热次数（使用第一个用例），结果不计入统计
+        on_result: 每完成一次运行时的回调，用于打印进度
+
+    Returns:
+        所有运行结果；没有用例时为空列表
+    """
+    results = []
+    if not cases:
+        return results
+    # 计时的运行都在子进程中执行，预热也必须在这些子进程里做，才能预热到被测量的进程
+    initializer = _warm_up if warmup > 0 else None
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer,
+                             initargs=(runners, cases[0], warmup)) as pool:
+        futures = [
+            pool.submit(_run_isolated, runner, agent, case, repetition)
+            for case in cases
+            for agent, runner in runners.items()
+            for repetition in range(repetitions)
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if on_result:
+                on_result(result)
+
+    results.sort(key=lambda r: (r.case, r.agent, r.repetition))
+    return results
+
+
+def percentile(values: List[float], p: float) -> float:
+    """最近秩法百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(results: List[RunResult]) -> List[dict]:
+    """按 (用例, agent) 聚合统计；延迟和 token 只统计成功的运行"""
+    groups: Dict[tuple, List[RunResult]] = {}
+    for result in results:
+        groups.setdefault((result.case, result.agent), []).append(result)
+
+    summary = []
+    for (case, agent), runs in groups.items():
+        succeeded = [r for r in runs if r.success]
+        latencies = [r.latency for r in succeeded]
+        tokens = [r.tokens for r in succeeded]
+        summary.append({
+            "case": case,
+            "agent": agent,
+            "runs": len(runs),
+            "success_rate": len(succeeded) / len(runs),
+            "latency_mean": statistics.mean(latencies) if latencies else 0.0,
+            "latency_stdev": statistics.stdev(latencies) if len(latencies) > 1 else 0.0,
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "tokens_mean": statistics.mean(tokens) if tokens else 0.0,
+            "tokens_stdev": statistics.stdev(tokens) if len(tokens) > 1 else 0.0,
+            "cached_tokens_mean": statistics.mean(r.cached_tokens for r in succeeded) if succeeded else 0.0,
+            "tool_calls_mean": statistics.mean(r.tool_calls for r in succeeded) if succeeded else 0.0,
+        })
+    return summary
+
+
+def write_json(path: str, results: List[RunResult], summary: List[dict], metadata: Optional[dict] = None):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "metadata": metadata or {},
+            "summary": summary,
+            "runs": [asdict(r) for r in results],
+        }, f, ensure_ascii=False, indent=2)
+
+
+def write_csv(path: str, summary: List[dict]):
+    if not summary:
+        return
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(summary[0].keys()))
+        writer.writeheader()
+        writer.writerows(summary)
+
+
+def print_summary(summary: List[dict]):
+    print(f"\n{'用例':<12} {'Agent':<18} {'成功率':>6} {'均值(s)':>8} {'标准差':>8} "
+          f"{'p50(s)':>8} {'p95(s)':>8} {'tokens':>8} {'工具调用':>8}")
+    print("-" * 96)
+    for row in summary:
+        print(f"{row['case']:<12} {row['agent']:<18} {row['success_rate'] * 100:>5.0f}% "
+              f"{row['latency_mean']:>8.2f} {row['latency_stdev']:>8.2f} {row['latency_p50']:>8.2f} "
+              f"{row['latency_p95']:>8.2f} {row['tokens_mean']:>8.0f} {row['tool_calls_mean']:>8.1f}")
@@ -1,36 +1,86 @@
 """
 对比 ReAct Agent 和 Function Calling Agent 的性能
 比较指标：代码行数、token消耗、响应时间、成功率
+
+离线运行（只测量框架自身开销）：
+    python mock_llm_server.py --port 8765
+    BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=mock python compare.py
 """
 
+import argparse
 import sys
 import os
-import time
 import json
-import tiktoken
-from openai import OpenAI
-from dotenv import load_dotenv
-from io import StringIO
-from unittest.mock import patch
-
-# 加载环境变量
-load_dotenv()
+from functools import lru_cache
 
 # 添加week2路径以导入ReAct agent
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'week2'))
-from agent import ReActAgent, read_file as react_read_file, write_to_file as react_write_to_file
-
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    base_url=os.getenv("BASE_URL")
-)
-
-# 初始化 tiktoken encoder
-encoding = tiktoken.encoding_for_model("gpt-5-mini")
-
+from agent import ReActAgent, edit_file as react_edit_file, read_file as react_read_file, \
+    write_to_file as react_write_to_file
+from agent_events import QUIET
+# 导入时加载 .env；OpenAI 客户端在第一次调用模型时才创建
+from llm_client import get_client
+
+import benchmark
+from tools import registry
+from tracing import message_text, tracer_from_env
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    """第一次计数时才加载 tiktoken 编码表"""
+    import tiktoken
+    return tiktoken.encoding_for_model("gpt-5-mini")
+
+# 每条消息的格式开销和回复起始开销（参考 OpenAI cookbook 的估算方法）
+TOKENS_PER_MESSAGE = 3
+TOKENS_REPLY_PRIMING = 3
+
+@lru_cache(maxsize=8192)
 def count_tokens(text: str) -> int:
-    """使用 tiktoken 计算 token 数量"""
-    return len(encoding.encode(text))
+    """使用 tiktoken 计算 token 数量（按文本缓存，历史消息每轮重发时不必重新编码）"""
+    return len(get_encoding().encode(text))
+
+def estimate_prompt_tokens(messages) -> int:
+    """估算一次请求的 prompt token：完整历史每次都会重新发送"""
+    # 参与计费的文本与 trace 中统计负载大小的文本相同：content 以及 tool_calls 的函数名和参数
+    return sum(count_tokens(message_text(m)) + TOKENS_PER_MESSAGE for m in messages) + TOKENS_REPLY_PRIMING
+
+class TokenMeter:
+    """按模型调用累计计费 token：优先读取 API 返回的 usage，缺失时（例如流式请求被提前取消）用 tiktoken 估算"""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.estimated_calls = 0
+        self.tokens_per_iteration = []
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, usage, messages, reply_text: str):
+        """记录一次调用；messages 为本次请求发送的消息（不含模型回复）"""
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens
+            self.completion_tokens += usage.completion_tokens
+            details = getattr(usage, "prompt_tokens_details", None)
+            self.cached_tokens += (getattr(details, "cached_tokens", 0) or 0) if details else 0
+        else:
+            self.prompt_tokens += estimate_prompt_tokens(messages)
+            self.completion_tokens += count_tokens(reply_text or "")
+            self.estimated_calls += 1
+        self.tokens_per_iteration.append(self.total_tokens)
+
+    def as_dict(self) -> dict:
+        return {
+            "tokens": self.total_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "estimated_calls": self.estimated_calls,
+            "tokens_per_iteration": self.tokens_per_iteration,
+        }
 
 # ============= ReAct Agent 工具（与week2保持一致）=============
 def list_files(directory="."):
@@ -39,7 +89,7 @@ def list_files(directory="."):
     return "\n".join(items)
 
 # ReAct Agent 工具集
-react_tools = [react_read_file, react_write_to_file, list_files]
+react_tools = [react_read_file, react_write_to_file, react_edit_file, list_files]
 
 # ============= ReAct Agent Token 计数包装器 =============
 class ReActAgentWithTokenCounting(ReActAgent):
@@ -47,151 +97,55 @@ class ReActAgentWithTokenCounting(ReActAgent):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.total_tokens = 0
-        self.messages_log = []
-
-    def call_model(self, messages):
-        """重写 call_model 方法以统计 tokens"""
-        # 统计输入 tokens
-        for msg in messages:
-            if msg not in self.messages_log:
-                self.total_tokens += count_tokens(msg["content"])
-                self.messages_log.append(msg)
-
-        # 调用原始方法
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-        )
-        content = response.choices[0].message.content
-        messages.append({"role": "assistant", "content": content})
+        self.meter = TokenMeter()
+        self._last_usage = None
 
-        # 统计输出 tokens
-        self.total_tokens += count_tokens(content)
-        self.messages_log.append({"role": "assistant", "content": content})
+    def record_usage(self, usage):
+        self._last_usage = usage
+        return super().record_usage(usage)
 
+    def call_model(self, messages):
+        """重写 call_model 方法以统计 tokens：每次调用都按完整历史计费"""
+        self._last_usage = None
+        content = super().call_model(messages)
+        # super() 已把模型回复追加到 messages 末尾，本次请求发送的是此前的消息
+        self.meter.add(self._last_usage, messages[:-1], content)
         return content
 
     def get_total_tokens(self):
         """获取总 token 数"""
-        return self.total_tokens
+        return self.meter.total_tokens
 
 
 # ============= Function Calling Agent =============
-def read_file(file_path: str) -> str:
-    """读取文件内容"""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except Exception as e:
-        return f"Error reading file: {str(e)}"
-
-def write_file(file_path: str, content: str) -> str:
-    """写入文件"""
-    try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        return f"Successfully wrote to {file_path}"
-    except Exception as e:
-        return f"Error writing file: {str(e)}"
-
-def list_directory(path: str = ".") -> str:
-    """列出目录内容"""
-    try:
-        items = os.listdir(path)
-        return "\n".join(items)
-    except Exception as e:
-        return f"Error listing directory: {str(e)}"
-
-# Function Calling工具定义
-tools = [
-    {
-        "type": "function",
-        "function": {
-            "name": "read_file",
-            "description": "读取指定文件的内容",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "file_path": {
-                        "type": "string",
-                        "description": "文件的绝对路径或相对路径"
-                    }
-                },
-                "required": ["file_path"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "write_file",
-            "description": "将内容写入指定文件",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "file_path": {
-                        "type": "string",
-                        "description": "文件的绝对路径或相对路径"
-                    },
-                    "content": {
-                        "type": "string",
-                        "description": "要写入的内容"
-                    }
-                },
-                "required": ["file_path", "content"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "list_directory",
-            "description": "列出指定目录下的所有文件和子目录",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "path": {
-                        "type": "string",
-                        "description": "目录路径，默认为当前目录"
-                    }
-                },
-                "required": []
-            }
-        }
-    }
-]
-
-# 工具函数映射
-available_functions = {
-    "read_file": read_file,
-    "write_file": write_file,
-    "list_directory": list_directory
-}
+# 文件工具与 FunctionCallingAgent、MCP 服务器共用 tools.py 中的注册表
+# 与 ReAct Agent 的工具集保持一致，只取注册表中的对应子集（由注册表生成并缓存）
+FC_TOOL_NAMES = ["read_file", "write_file", "edit_file", "list_directory"]
+tools = registry.openai_tools(FC_TOOL_NAMES)
 
 def function_calling_agent(query: str, max_iterations: int = 5) -> dict:
     """使用Function Calling实现的Agent"""
     messages = [{"role": "user", "content": query}]
-    total_tokens = 0
+    meter = TokenMeter()
     tool_calls_count = 0
 
     for iteration in range(max_iterations):
-        response = client.chat.completions.create(
+        response = get_client().chat.completions.create(
             model="gpt-5-mini",
             messages=messages,
             tools=tools,
             tool_choice="auto"
         )
 
-        total_tokens += response.usage.total_tokens
         assistant_message = response.choices[0].message
+        meter.add(response.usage, messages, message_text(assistant_message))
 
         # 如果没有工具调用，说明任务完成
         if not assistant_message.tool_calls:
             return {
                 "success": True,
                 "response": assistant_message.content,
-                "tokens": total_tokens,
+                **meter.as_dict(),
                 "tool_calls": tool_calls_count,
                 "iterations": iteration + 1
             }
@@ -205,7 +159,7 @@ def function_calling_agent(query: str, max_iterations: int = 5) -> dict:
             function_args = json.loads(tool_call.function.arguments)
 
             # 执行函数
-            function_response = available_functions[function_name](**function_args)
+            function_response = registry.call(function_name, function_args)
 
             # 添加工具结果到消息
             messages.append({
@@ -217,167 +171,105 @@ def function_calling_agent(query: str, max_iterations: int = 5) -> dict:
     return {
         "success": False,
         "response": "Max iterations reached",
-        "tokens": total_tokens,
+        **meter.as_dict(),
         "tool_calls": tool_calls_count,
         "iterations": max_iterations
     }
 
-# ============= 测试用例 =============
-test_cases = [
-    {
-        "name": "简单文件读取",
-        "query": "读取 test_data.txt 文件的内容",
-        "setup": lambda: write_file("test_data.txt", "Hello, World!\nThis is a test file.")
-    },
-    {
-        "name": "文件修改",
-        "query": "读取 test_data.txt 并在开头添加一行 '# Modified'",
-        "setup": lambda: write_file("test_data.txt", "Original content\nLine 2")
-    },
-    {
-        "name": "目录浏览",
-        "query": "列出当前目录下的所有文件",
-        "setup": lambda: None
+# ============= 基准测试 =============
+def run_react(query: str) -> dict:
+    """在当前工作目录运行一次 ReAct Agent（供 benchmark 子进程调用）"""
+    tool_calls = []
+    react_agent = ReActAgentWithTokenCounting(
+        tools=react_tools,
+        model="gpt-5-mini",
+        project_directory=os.getcwd(),
+        tracer=tracer_from_env(),
+        verbosity=QUIET,
+        on_tool_call=tool_calls.append
+    )
+
+    # 自动回答 "y"（跳过用户交互）
+    from unittest.mock import patch
+
+    with patch('builtins.input', return_value='y'):
+        react_agent.run(query)
+
+    return {
+        "success": True,
+        **react_agent.meter.as_dict(),
+        "tool_calls": len(tool_calls)
     }
-]
 
-def run_comparison():
-    """运行对比测试"""
+
+def run_function_calling(query: str) -> dict:
+    """在当前工作目录运行一次 Function Calling Agent（供 benchmark 子进程调用）"""
+    return function_calling_agent(query)
+
+
+# 参与对比的 agent
+runners = {
+    "react": run_react,
+    "function_calling": run_function_calling,
+}
+
+
+def run_comparison(cases_file: str = benchmark.DEFAULT_CASES_FILE, repetitions: int = 3, workers: int = 4,
+                   warmup: int = 1, output_json: str = "benchmark_results.json",
+                   output_csv: str = "benchmark_results.csv"):
+    """运行对比测试：每个用例重复多次、并发执行、每次运行使用独立临时目录，输出统计结果"""
     print("=" * 80)
     print("ReAct Agent vs Function Calling Agent 对比测试")
     print("=" * 80)
 
-    results = []
-
-    for test_case in test_cases:
-        print(f"\n📝 测试用例: {test_case['name']}")
-        print(f"   查询: {test_case['query']}")
-        print("-" * 80)
-
-        # 准备测试环境
-        if test_case['setup']:
-            test_case['setup']()
-
-        # 测试 ReAct Agent
-        print("\n🔧 ReAct Agent:")
-        react_start = time.time()
-        react_tokens = 0
-        react_tool_calls = 0
-
-        try:
-            # 创建 ReAct Agent 实例（使用带 token 统计的版本）
-            react_agent = ReActAgentWithTokenCounting(
-                tools=react_tools,
-                model="gpt-5-mini",
-                project_directory=os.getcwd()
-            )
-
-            # 捕获输出并自动回答 "y"（跳过用户交互）
-            with patch('builtins.input', return_value='y'):
-                # 使用 StringIO 捕获打印输出以避免干扰
-                output = StringIO()
-                with patch('sys.stdout', output):
-                    react_result = react_agent.run(test_case['query'])
-
-            react_time = time.time() - react_start
-            react_success = True
-
-            # 获取 token 统计
-            react_tokens = react_agent.get_total_tokens()
-            output_text = output.getvalue()
-            react_tool_calls = output_text.count("🔧 Action:")
-
-            print(f"   ✓ 完成 (耗时: {react_time:.2f}s)")
-            print(f"   Tokens: {react_tokens}")
-            print(f"   Tool calls: {react_tool_calls}")
-
-        except Exception as e:
-            react_time = time.time() - react_start
-            react_success = False
-            react_result = {"response": str(e)}
-            print(f"   ✗ 失败: {str(e)}")
-
-        # 测试 Function Calling Agent
-        print("\n🚀 Function Calling Agent:")
-        fc_start = time.time()
-        try:
-            fc_result = function_calling_agent(test_case['query'])
-            fc_time = time.time() - fc_start
-            print(f"   ✓ 完成 (耗时: {fc_time:.2f}s)")
-            print(f"   Tokens: {fc_result['tokens']}")
-            print(f"   Tool calls: {fc_result['tool_calls']}")
-        except Exception as e:
-            fc_time = time.time() - fc_start
-            fc_result = {"success": False, "tokens": 0, "tool_calls": 0}
-            print(f"   ✗ 失败: {str(e)}")
-
-        # 记录结果
-        results.append({
-            "test_case": test_case['name'],
-            "react": {
-                "success": react_success,
-                "time": react_time,
-                "tokens": react_tokens,
-                "tool_calls": react_tool_calls
-            },
-            "function_calling": {
-                "success": fc_result.get('success', False),
-                "time": fc_time,
-                "tokens": fc_result.get('tokens', 0),
-                "tool_calls": fc_result.get('tool_calls', 0)
-            }
-        })
+    cases = benchmark.load_test_cases(cases_file)
+    print(f"用例: {len(cases)} 个, 重复: {repetitions} 次, 并发: {workers}, 每个进程预热: {warmup} 次")
+
+    def on_result(result: benchmark.RunResult):
+        status = "✓" if result.success else f"✗ {result.error}"
+        print(f"   [{result.agent}] {result.case} #{result.repetition + 1}: "
+              f"{result.latency:.2f}s, {result.tokens} tokens（每轮累计 {result.tokens_per_iteration}） {status}")
+
+    results = benchmark.run_suite(cases, runners, repetitions=repetitions, workers=workers,
+                                  warmup=warmup, on_result=on_result)
+    summary = benchmark.summarize(results)
 
-    # 打印总结
     print("\n" + "=" * 80)
     print("📊 测试总结")
     print("=" * 80)
+    benchmark.print_summary(summary)
 
-    for result in results:
-        print(f"\n{result['test_case']}:")
-        print(f"  ReAct: {'✓' if result['react']['success'] else '✗'} "
-              f"({result['react']['time']:.2f}s, {result['react']['tokens']} tokens, {result['react']['tool_calls']} tool calls)")
-        print(f"  Function Calling: {'✓' if result['function_calling']['success'] else '✗'} "
-              f"({result['function_calling']['time']:.2f}s, "
-              f"{result['function_calling']['tokens']} tokens, "
-              f"{result['function_calling']['tool_calls']} tool calls)")
-
-    # 计算平均值
-    react_avg_tokens = sum(r['react']['tokens'] for r in results) / len(results)
-    fc_avg_tokens = sum(r['function_calling']['tokens'] for r in results) / len(results)
-    fc_avg_tools = sum(r['function_calling']['tool_calls'] for r in results) / len(results)
-    react_avg_tools = sum(r['react']['tool_calls'] for r in results) / len(results)
-
-    fc_success_rate = sum(1 for r in results if r['function_calling']['success']) / len(results)
-    react_success_rate = sum(1 for r in results if r['react']['success']) / len(results)
-
+    # 按 agent 汇总所有用例
     print(f"\n平均指标:")
-    print(f"  ReAct Agent:")
-    print(f"    - 成功率: {react_success_rate*100:.0f}%")
-    print(f"    - 平均 tokens: {react_avg_tokens:.0f} (tiktoken)")
-    print(f"    - 平均工具调用: {react_avg_tools:.1f} 次")
-    print(f"\n  Function Calling Agent:")
-    print(f"    - 成功率: {fc_success_rate*100:.0f}%")
-    print(f"    - 平均 tokens: {fc_avg_tokens:.0f} (OpenAI API)")
-    print(f"    - 平均工具调用: {fc_avg_tools:.1f} 次")
-
-    print(f"\n性能对比:")
-    if fc_success_rate > react_success_rate:
-        print(f"  ✓ Function Calling 成功率更高 (+{(fc_success_rate - react_success_rate)*100:.0f}%)")
-
-    # Token 对比
-    token_diff = react_avg_tokens - fc_avg_tokens
-    token_diff_pct = (token_diff / react_avg_tokens) * 100 if react_avg_tokens > 0 else 0
-    if token_diff > 0:
-        print(f"  ✓ Function Calling tokens 更少 (-{token_diff:.0f} tokens, {token_diff_pct:.1f}% 节省)")
-    else:
-        print(f"  ⚠ ReAct tokens 更少 ({abs(token_diff):.0f} tokens, {abs(token_diff_pct):.1f}% 节省)")
-
-    print(f"  ✓ Function Calling 代码更简洁（~120行 vs ~220行）")
-
-    # 清理测试文件
-    if os.path.exists("test_data.txt"):
-        os.remove("test_data.txt")
+    for agent in runners:
+        rows = [row for row in summary if row["agent"] == agent]
+        print(f"  {agent}:")
+        print(f"    - 成功率: {sum(r['success_rate'] for r in rows) / len(rows) * 100:.0f}%")
+        print(f"    - 平均延迟: {sum(r['latency_mean'] for r in rows) / len(rows):.2f}s")
+        print(f"    - 平均计费 tokens: {sum(r['tokens_mean'] for r in rows) / len(rows):.0f}"
+              f"（其中缓存命中 {sum(r['cached_tokens_mean'] for r in rows) / len(rows):.0f}）")
+        print(f"    - 平均工具调用: {sum(r['tool_calls_mean'] for r in rows) / len(rows):.1f} 次")
+
+    from llm_cache import LLM_CACHE_MODE
+    metadata = {"cases_file": cases_file, "repetitions": repetitions, "workers": workers, "warmup": warmup,
+                "llm_cache": LLM_CACHE_MODE}
+    if output_json:
+        benchmark.write_json(output_json, results, summary, metadata)
+        print(f"\n结果已写入 {output_json}")
+    if output_csv:
+        benchmark.write_csv(output_csv, summary)
+        print(f"汇总已写入 {output_csv}")
+
 
 if __name__ == "__main__":
-    run_comparison()
+    parser = argparse.ArgumentParser(description="ReAct Agent vs Function Calling Agent 基准测试")
+    parser.add_argument("--cases", default=benchmark.DEFAULT_CASES_FILE, help="测试用例 JSONL 文件")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例的重复次数")
+    parser.add_argument("--workers", type=int, default=4, help="并发进程数")
+    parser.add_argument("--warmup", type=int, default=1, help="每个工作进程的预热次数（不计入统计）")
+    parser.add_argument("--output-json", default="benchmark_results.json", help="详细结果 JSON 输出路径")
+    parser.add_argument("--output-csv", default="benchmark_results.csv", help="汇总 CSV 输出路径")
+    options = parser.parse_args()
+
+    run_comparison(options.cases, options.repeat, options.workers, options.warmup,
+                   options.output_json, options.output_csv)
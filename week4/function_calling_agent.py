@@ -5,189 +5,78 @@ Function Calling Agent 完整实现
 
 import json
 import os
-from openai import OpenAI
-from typing import List, Dict, Any
-from dotenv import load_dotenv
-
-# 加载环境变量
-load_dotenv()
-
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    base_url=os.getenv("BASE_URL")
-)
-
-# ============= 工具函数实现 =============
-def read_file(file_path: str) -> str:
-    """读取文件内容"""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return content
-    except FileNotFoundError:
-        return f"Error: File '{file_path}' not found"
-    except Exception as e:
-        return f"Error reading file: {str(e)}"
-
-def write_file(file_path: str, content: str) -> str:
-    """写入文件"""
-    try:
-        # 确保目录存在
-        directory = os.path.dirname(file_path)
-        if directory and not os.path.exists(directory):
-            os.makedirs(directory)
-
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        return f"Successfully wrote {len(content)} characters to {file_path}"
-    except Exception as e:
-        return f"Error writing file: {str(e)}"
-
-def list_directory(path: str = ".") -> str:
-    """列出目录内容"""
-    try:
-        items = os.listdir(path)
-        if not items:
-            return f"Directory '{path}' is empty"
-
-        # 分类文件和目录
-        files = []
-        dirs = []
-        for item in items:
-            full_path = os.path.join(path, item)
-            if os.path.isdir(full_path):
-                dirs.append(f"📁 {item}/")
-            else:
-                size = os.path.getsize(full_path)
-                files.append(f"📄 {item} ({size} bytes)")
-
-        result = f"Contents of '{path}':\n"
-        if dirs:
-            result += "\nDirectories:\n" + "\n".join(dirs)
-        if files:
-            result += "\n\nFiles:\n" + "\n".join(files)
-
-        return result
-    except Exception as e:
-        return f"Error listing directory: {str(e)}"
-
-def search_in_file(file_path: str, keyword: str) -> str:
-    """在文件中搜索关键词"""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-
-        matches = []
-        for i, line in enumerate(lines, 1):
-            if keyword in line:
-                matches.append(f"Line {i}: {line.strip()}")
-
-        if matches:
-            return f"Found {len(matches)} matches in {file_path}:\n" + "\n".join(matches)
-        else:
-            return f"No matches found for '{keyword}' in {file_path}"
-    except Exception as e:
-        return f"Error searching file: {str(e)}"
-
-# ============= 工具定义 (JSON Schema) =============
-tools = [
-    {
-        "type": "function",
-        "function": {
-            "name": "read_file",
-            "description": "读取指定文件的完整内容。适用于查看文本文件、配置文件、代码文件等。",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "file_path": {
-                        "type": "string",
-                        "description": "文件的路径（绝对路径或相对路径）"
-                    }
-                },
-                "required": ["file_path"],
-                "additionalProperties": False
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "write_file",
-            "description": "将内容写入指定文件。如果文件已存在会覆盖，如果目录不存在会自动创建。",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "file_path": {
-                        "type": "string",
-                        "description": "目标文件的路径"
-                    },
-                    "content": {
-                        "type": "string",
-                        "description": "要写入的内容"
-                    }
-                },
-                "required": ["file_path", "content"],
-                "additionalProperties": False
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "list_directory",
-            "description": "列出指定目录下的所有文件和子目录，显示文件大小信息。",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "path": {
-                        "type": "string",
-                        "description": "目录路径，默认为当前目录 (.)"
-                    }
-                },
-                "required": [],
-                "additionalProperties": False
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "search_in_file",
-            "description": "在指定文件中搜索包含关键词的所有行，返回行号和内容。",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "file_path": {
-                        "type": "string",
-                        "description": "要搜索的文件路径"
-                    },
-                    "keyword": {
-                        "type": "string",
-                        "description": "要搜索的关键词"
-                    }
-                },
-                "required": ["file_path", "keyword"],
-                "additionalProperties": False
-            }
-        }
-    }
-]
+import sys
+from typing import List, Dict, Any, Optional
+
+from prefetch import SpeculativePrefetcher
+from scheduler import RateLimitScheduler, estimate_tokens
+from tool_arguments import ToolCallValidator
+from tools import registry, working_directory
+from tracing import Tracer, message_chars, tracer_from_env
+
+# agent_events、llm_client 等共用模块在 week2
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'week2'))
+from agent_events import DEBUG, NORMAL, QUIET, EventCallback, usage_dict
+# 导入时加载 .env；OpenAI 客户端在第一次调用模型时才创建
+from llm_client import get_client
+
+# ============= 工具定义 =============
+# 文件工具定义在 tools.py，与 compare.py 和 MCP 服务器共用；JSON Schema 由注册表根据类型注解生成并缓存
+tools = registry.openai_tools()
 
 # ============= 工具映射 =============
-available_functions = {
-    "read_file": read_file,
-    "write_file": write_file,
-    "list_directory": list_directory,
-    "search_in_file": search_in_file
-}
+available_functions = registry.functions
+
+# 参数解码与校验（所有 agent 实例共享，统计修复率）
+argument_validator = ToolCallValidator.from_registry(registry)
 
 # ============= Function Calling Agent =============
+# 控制台输出级别和事件结构与 week2 的 ReActAgent 共用（agent_events.py）
 class FunctionCallingAgent:
-    def __init__(self, model: str = "gpt-5-mini", verbose: bool = True):
+    def __init__(self, model: str = "gpt-5-mini", verbose: bool = True, tracer: Optional[Tracer] = None,
+                 verbosity: Optional[int] = None,
+                 on_model_call: Optional[EventCallback] = None,
+                 on_tool_call: Optional[EventCallback] = None,
+                 on_final: Optional[EventCallback] = None,
+                 scheduler: Optional[RateLimitScheduler] = None, priority: int = 0,
+                 speculative: bool = False, workdir: Optional[str] = None):
         self.model = model
-        self.verbose = verbose
-        self.tools = tools
-        self.available_functions = available_functions
+        # verbose 保留用于兼容；指定 verbosity 时以 verbosity 为准
+        self.verbosity = verbosity if verbosity is not None else (NORMAL if verbose else QUIET)
+        self.registry = registry
+        self.tools = registry.openai_tools()
+        self.validator = argument_validator
+        self.tracer = tracer or tracer_from_env()
+        self.hooks = {"on_model_call": on_model_call, "on_tool_call": on_tool_call, "on_final": on_final}
+        # 多个 agent 共享同一个调度器时，模型调用会按 RPM/TPM 预算排队
+        self.scheduler = scheduler
+        self.priority = priority
+        # 推测模式：list_directory 之后在后台预取可能的只读工具调用
+        self.speculative = speculative
+        # 工具相对路径的解析目录（批量模式下每个任务一个），None 表示进程的当前目录
+        self.workdir = workdir
+        self._tools_chars = len(json.dumps(self.tools, ensure_ascii=False))
+
+    def _emit(self, event: str, **payload):
+        """触发事件回调；未注册回调时没有任何开销"""
+        callback = self.hooks[event]
+        if callback is not None:
+            callback(payload)
+
+    def _create_completion(self, messages):
+        """发出一次模型调用；配置了调度器时先按速率限制排队"""
+        def request():
+            return get_client().chat.completions.create(
+                model=self.model,
+                messages=messages,
+                tools=self.tools,
+                tool_choice="auto"
+            )
+
+        if self.scheduler is None:
+            return request()
+        estimated = estimate_tokens(message_chars(messages) + self._tools_chars)
+        return self.scheduler.call(request, estimated_tokens=estimated, priority=self.priority)
 
     def run(self, user_query: str, max_iterations: int = 10) -> Dict[str, Any]:
         """
@@ -200,36 +89,59 @@ class FunctionCallingAgent:
         Returns:
             包含结果和统计信息的字典
         """
+        with self.tracer.span("task", agent="function_calling", model=self.model,
+                              query_chars=len(user_query)) as task_span, working_directory(self.workdir):
+            prefetcher = SpeculativePrefetcher(self.registry) if self.speculative else None
+            try:
+                result = self._run(user_query, max_iterations, prefetcher)
+            finally:
+                if prefetcher is not None:
+                    prefetch_stats = prefetcher.close()
+            task_span.set(success=result["success"], tokens=result["tokens"],
+                          tool_calls=result["tool_calls"], iterations=result["iterations"])
+            if prefetcher is not None:
+                result["prefetch"] = prefetch_stats
+                task_span.set(prefetched=prefetch_stats["prefetched"], prefetch_hits=prefetch_stats["prefetch_hits"])
+                if self.verbosity >= NORMAL:
+                    print(f"   - Prefetch: {prefetch_stats['prefetch_hits']}/{prefetch_stats['prefetched']} hits, "
+                          f"{prefetch_stats['wasted']} wasted")
+            return result
+
+    def _run(self, user_query: str, max_iterations: int,
+             prefetcher: Optional[SpeculativePrefetcher] = None) -> Dict[str, Any]:
         messages = [{"role": "user", "content": user_query}]
         total_tokens = 0
         tool_calls_count = 0
 
-        if self.verbose:
+        if self.verbosity >= NORMAL:
             print(f"\n{'='*60}")
             print(f"🤖 Function Calling Agent")
             print(f"{'='*60}")
             print(f"📝 User Query: {user_query}\n")
 
         for iteration in range(max_iterations):
-            if self.verbose:
+            if self.verbosity >= NORMAL:
                 print(f"--- Iteration {iteration + 1} ---")
 
             # 调用 API
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                tools=self.tools,
-                tool_choice="auto"
-            )
+            with self.tracer.span("model_call", iteration=iteration + 1, messages=len(messages)) as span:
+                if self.tracer.enabled:
+                    span.set(payload_chars=message_chars(messages))
+                response = self._create_completion(messages)
+                span.set(prompt_tokens=response.usage.prompt_tokens,
+                         completion_tokens=response.usage.completion_tokens)
 
             total_tokens += response.usage.total_tokens
             assistant_message = response.choices[0].message
+            self._emit("on_model_call", iteration=iteration + 1, content=assistant_message.content,
+                       usage=usage_dict(response.usage))
 
             # 检查是否需要调用工具
             if not assistant_message.tool_calls:
                 # 任务完成
                 final_response = assistant_message.content
-                if self.verbose:
+                self._emit("on_final", answer=final_response, iterations=iteration + 1)
+                if self.verbosity >= NORMAL:
                     print(f"\n✅ Final Response:\n{final_response}")
                     print(f"\n📊 Statistics:")
                     print(f"   - Total tokens used: {total_tokens}")
@@ -244,37 +156,60 @@ class FunctionCallingAgent:
                     "iterations": iteration + 1
                 }
 
-            # 添加 assistant 消息到历史
-            messages.append(assistant_message)
-
-            # 执行所有工具调用
+            # 执行所有工具调用；工具结果先收集起来，本轮结束时和 assistant 消息一起加入历史
+            tool_messages = []
             for tool_call in assistant_message.tool_calls:
                 tool_calls_count += 1
                 function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
+                with self.tracer.span("parse", tool=function_name, payload_chars=len(tool_call.function.arguments)) as span:
+                    function_args, error = self.validator.prepare(function_name, tool_call.function.arguments)
+                    if error is not None:
+                        span.set(error=True)
 
-                if self.verbose:
+                if self.verbosity >= NORMAL:
                     print(f"\n🔧 Tool Call #{tool_calls_count}:")
                     print(f"   Function: {function_name}")
-                    print(f"   Arguments: {json.dumps(function_args, ensure_ascii=False)}")
-
-                # 执行函数
-                function_response = self.available_functions[function_name](**function_args)
-
-                if self.verbose:
+                    print(f"   Arguments: {json.dumps(function_args, ensure_ascii=False) if error is None else tool_call.function.arguments}")
+
+                if error is not None:
+                    # 参数不合法时不执行工具，把结构化错误直接返回给模型
+                    function_response = error
+                else:
+                    with self.tracer.span("tool_call", tool=function_name) as span:
+                        if prefetcher is None:
+                            function_response = self.registry[function_name].func(**function_args)
+                        else:
+                            function_response = prefetcher.call(function_name, function_args)
+                            prefetcher.observe(function_name, function_args,
+                                               user_query + "\n" + (assistant_message.content or ""))
+                        span.set(result_chars=len(function_response))
+                # 参数无法解码或校验失败时 arguments 为空字典，result 为返回给模型的错误信息
+                self._emit("on_tool_call", iteration=iteration + 1, tool=function_name,
+                           arguments=function_args if function_args is not None else {}, result=function_response)
+
+                if self.verbosity >= DEBUG:
+                    print(f"   Result: {function_response}")
+                elif self.verbosity >= NORMAL:
                     # 截断长输出
                     display_response = function_response[:200] + "..." if len(function_response) > 200 else function_response
                     print(f"   Result: {display_response}")
 
-                # 添加工具结果到消息历史
-                messages.append({
+                tool_messages.append({
                     "role": "tool",
                     "tool_call_id": tool_call.id,
                     "content": function_response
                 })
 
+            # 组装下一次请求的消息历史（每轮一个 span）
+            with self.tracer.span("history", iteration=iteration + 1) as span:
+                messages.append(assistant_message)
+                messages.extend(tool_messages)
+                span.set(messages=len(messages))
+                if self.tracer.enabled:
+                    span.set(payload_chars=message_chars(messages))
+
         # 达到最大迭代次数
-        if self.verbose:
+        if self.verbosity >= NORMAL:
             print(f"\n⚠️  Reached maximum iterations ({max_iterations})")
 
         return {
@@ -287,7 +222,32 @@ class FunctionCallingAgent:
 
 # ============= 示例用法 =============
 def main():
-    agent = FunctionCallingAgent(verbose=True)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Function Calling Agent")
+    parser.add_argument("--batch", help="任务 JSONL 文件；指定后进入批量模式")
+    parser.add_argument("--output", default="batch_results.jsonl", help="结果 JSONL（同时作为断点续跑的检查点）")
+    parser.add_argument("--workers", type=int, default=8, help="并发线程数")
+    parser.add_argument("--model", default="gpt-5-mini")
+    parser.add_argument("--max-iterations", type=int, default=10)
+    parser.add_argument("--rpm", type=float, help="每分钟请求数上限")
+    parser.add_argument("--tpm", type=float, help="每分钟 token 数上限")
+    parser.add_argument("--retry-failed", action="store_true", help="重新运行结果文件中未成功的任务")
+    parser.add_argument("--speculative", action="store_true", help="list_directory 之后在后台预取可能的只读工具调用")
+    parser.add_argument("--workdir-root", help="批量模式下各任务工作目录的父目录，默认为 <output>_workdirs")
+    parser.add_argument("--template-dir", help="批量模式下复制到每个任务工作目录中的初始文件")
+    options = parser.parse_args()
+
+    if options.batch:
+        from batch_runner import run_batch
+        run_batch(options.batch, options.output, workers=options.workers, model=options.model,
+                  max_iterations=options.max_iterations, requests_per_minute=options.rpm,
+                  tokens_per_minute=options.tpm, retry_failed=options.retry_failed,
+                  speculative=options.speculative, workdir_root=options.workdir_root,
+                  template_dir=options.template_dir)
+        return
+
+    agent = FunctionCallingAgent(model=options.model, verbose=True, speculative=options.speculative)
 
     # 测试案例 1: 简单文件读取
     print("\n" + "="*60)
@@ -6,17 +6,20 @@
 import asyncio
 import json
 import os
+import sys
 from typing import Optional
 from contextlib import AsyncExitStack
-from dotenv import load_dotenv
 
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
-from openai import OpenAI
+from tool_arguments import ToolCallValidator
+from tool_registry import compile_validator
+from tracing import Tracer, message_chars, tracer_from_env
 
-# 加载环境变量
-load_dotenv()
+# 客户端工厂与 week2 共用（导入时加载环境变量）
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'week2'))
+from llm_client import create_client
 
 # ============= MCP 客户端配置 =============
 # 官方文件系统服务器参数
@@ -31,13 +34,12 @@ server_params = StdioServerParameters(
 )
 
 class MCPClient:
-    def __init__(self):
+    def __init__(self, tracer: Optional[Tracer] = None):
         self.exit_stack = AsyncExitStack()
         self.session: Optional[ClientSession] = None
-        self.openai = OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            base_url=os.getenv("BASE_URL")
-        )
+        self.openai = create_client()
+        self.tracer = tracer or tracer_from_env()
+        self.validator: Optional[ToolCallValidator] = None
 
     async def connect_to_server(self, server_params: StdioServerParameters):
         """连接到 MCP 服务器"""
@@ -58,17 +60,29 @@ class MCPClient:
         for tool in tools:
             print(f"   - {tool.name}: {tool.description}")
 
+        # 连接时按服务器返回的 schema 预编译参数校验函数
+        self.validator = ToolCallValidator(
+            {tool.name: compile_validator(tool.name, tool.inputSchema) for tool in tools},
+            {tool.name: tool.inputSchema for tool in tools},
+        )
         return tools
 
     async def process_query(self, query: str, max_iterations: int = 10):
         """处理用户查询，使用 MCP 工具"""
+        with self.tracer.span("task", agent="mcp", model="gpt-5-mini", query_chars=len(query)) as task_span:
+            final_response = await self._process_query(query, max_iterations)
+            task_span.set(success=final_response is not None)
+            return final_response
+
+    async def _process_query(self, query: str, max_iterations: int):
         print(f"\n{'='*60}")
         print(f"🤖 MCP Client with LLM")
         print(f"{'='*60}")
         print(f"📝 User Query: {query}\n")
 
         # 获取可用工具并转换为 OpenAI 格式
-        response = await self.session.list_tools()
+        with self.tracer.span("list_tools"):
+            response = await self.session.list_tools()
         available_tools = [{
             "type": "function",
             "function": {
@@ -85,11 +99,17 @@ class MCPClient:
             print(f"\n--- Iteration {iteration + 1} ---")
 
             # 调用 OpenAI API
-            response = self.openai.chat.completions.create(
-                model="gpt-5-mini",
-                messages=messages,
-                tools=available_tools
-            )
+            with self.tracer.span("model_call", iteration=iteration + 1, messages=len(messages)) as span:
+                if self.tracer.enabled:
+                    span.set(payload_chars=message_chars(messages))
+                response = self.openai.chat.completions.create(
+                    model="gpt-5-mini",
+                    messages=messages,
+                    tools=available_tools
+                )
+                if response.usage is not None:
+                    span.set(prompt_tokens=response.usage.prompt_tokens,
+                             completion_tokens=response.usage.completion_tokens)
 
             message = response.choices[0].message
             print(f"Stop reason: {response.choices[0].finish_reason}")
@@ -102,8 +122,8 @@ class MCPClient:
 
             # 处理工具调用
             if response.choices[0].finish_reason == "tool_calls" and message.tool_calls:
-                # 添加 assistant 的响应到消息历史
-                messages.append({
+                # assistant 的响应和工具结果在本轮结束时一起加入消息历史
+                assistant_message = {
                     "role": "assistant",
                     "content": message.content,
                     "tool_calls": [
@@ -116,41 +136,63 @@ class MCPClient:
                             }
                         } for tc in message.tool_calls
                     ]
-                })
+                }
 
                 # 执行所有工具调用
+                tool_messages = []
                 for tool_call in message.tool_calls:
                     tool_name = tool_call.function.name
-                    tool_args = json.loads(tool_call.function.arguments)
+                    with self.tracer.span("parse", tool=tool_name, payload_chars=len(tool_call.function.arguments)) as span:
+                        tool_args, error = self.validator.prepare(tool_name, tool_call.function.arguments)
+                        if error is not None:
+                            span.set(error=True)
 
                     print(f"\n🔧 Tool Call:")
                     print(f"   Tool: {tool_name}")
+                    if error is not None:
+                        # 参数不合法时不发给服务器，把结构化错误直接返回给模型
+                        print(f"   Invalid arguments: {tool_call.function.arguments}")
+                        tool_messages.append({
+                            "role": "tool",
+                            "tool_call_id": tool_call.id,
+                            "content": error
+                        })
+                        continue
                     print(f"   Arguments: {json.dumps(tool_args, ensure_ascii=False, indent=2)}")
 
                     # 通过 MCP 执行工具
-                    result = await self.session.call_tool(tool_name, tool_args)
-
-                    # 提取文本内容
-                    result_text = ""
-                    if hasattr(result, 'content') and result.content:
-                        if isinstance(result.content, list):
-                            # 合并所有文本内容
-                            result_text = "\n".join(
-                                item.text if hasattr(item, 'text') else str(item)
-                                for item in result.content
-                            )
-                        else:
-                            result_text = str(result.content)
+                    with self.tracer.span("tool_call", tool=tool_name) as span:
+                        result = await self.session.call_tool(tool_name, tool_args)
+
+                        # 提取文本内容
+                        result_text = ""
+                        if hasattr(result, 'content') and result.content:
+                            if isinstance(result.content, list):
+                                # 合并所有文本内容
+                                result_text = "\n".join(
+                                    item.text if hasattr(item, 'text') else str(item)
+                                    for item in result.content
+                                )
+                            else:
+                                result_text = str(result.content)
+                        span.set(result_chars=len(result_text))
 
                     print(f"   Result: {result_text[:200]}...")
 
-                    # 添加工具结果到消息
-                    messages.append({
+                    tool_messages.append({
                         "role": "tool",
                         "tool_call_id": tool_call.id,
                         "content": result_text
                     })
 
+                # 组装下一次请求的消息历史（每轮一个 span）
+                with self.tracer.span("history", iteration=iteration + 1) as span:
+                    messages.append(assistant_message)
+                    messages.extend(tool_messages)
+                    span.set(messages=len(messages))
+                    if self.tracer.enabled:
+                        span.set(payload_chars=message_chars(messages))
+
         print("\n⚠️  Reached maximum iterations")
         return None
 
@@ -187,6 +229,10 @@ async def main():
             "找到所有 .py 文件，读取第一个文件，并告诉我它的主要功能是什么"
         )
 
+        metrics = client.validator.metrics()
+        print(f"\n📊 工具参数: {metrics['calls']} 次调用，修复率 {metrics['repair_rate']:.1%}，"
+              f"拒绝率 {metrics['rejection_rate']:.1%}")
+
     finally:
         await client.cleanup()
 
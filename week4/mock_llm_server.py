@@ -0,0 +1,246 @@
+"""
+本地 OpenAI 兼容的模拟 LLM 服务器
+按脚本回放确定性的回复（包括 tool_calls 和 ReAct 标签文本），支持可配置的延迟和流式输出，
+用于在不访问远程模型的情况下测量 agent 自身的开销（解析、工具分发、历史增长等）
+
+用法:
+    python mock_llm_server.py --port 8765 --latency 0.1
+    BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=mock python compare.py
+
+脚本格式（JSON）:
+    {
+      "rules": [
+        {"match": "用户问题中的子串", "mode": "tools" | "react",
+         "turns": [{"content": "...", "tool_calls": [{"name": "...", "arguments": {...}}]}, ...]}
+      ],
+      "default": {"tools": "...", "react": "..."}
+    }
+第 N 轮（请求中已有 N 条 assistant 消息）返回 turns[N]，超出时返回最后一轮；
+ReAct 回复中的 ${project_path} 会被替换为系统提示中的项目路径
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+from typing import Any, Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("mock-llm-server")
+
+DEFAULT_SCRIPT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_llm_script.json")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数（约 4 个字符一个 token），只用于填充 usage 字段"""
+    return max(1, len(text) // 4) if text else 0
+
+
+class ScriptedResponder:
+    """根据脚本为一次 chat.completions 请求选择回复"""
+
+    def __init__(self, script: Dict[str, Any]):
+        self.rules = script.get("rules", [])
+        self.default = script.get("default", {})
+
+    @classmethod
+    def from_file(cls, path: str) -> "ScriptedResponder":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def respond(self, messages: List[Dict[str, Any]], has_tools: bool) -> Dict[str, Any]:
+        mode = "tools" if has_tools else "react"
+        question = next((m.get("content") or "" for m in messages if m.get("role") == "user"), "")
+        turn = sum(1 for m in messages if m.get("role") == "assistant")
+
+        for rule in self.rules:
+            if rule.get("mode", mode) == mode and rule["match"] in question:
+                turns = rule["turns"]
+                reply = dict(turns[min(turn, len(turns) - 1)])
+                break
+        else:
+            reply = {"content": self.default.get(mode, "OK")}
+
+        if reply.get("content") and mode == "react":
+            system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+            project_path = re.search(r"当前项目绝对路径：(.+)", system)
+            reply["content"] = Template(reply["content"]).safe_substitute(
+                project_path=project_path.group(1).strip() if project_path else os.getcwd()
+            )
+        return reply
+
+
+def apply_stop(content: Optional[str], stop) -> Optional[str]:
+    """与真实 API 一样：在第一个 stop 序列处截断，且不包含 stop 序列本身"""
+    if not content or not stop:
+        return content
+    stops = [stop] if isinstance(stop, str) else stop
+    positions = [content.find(s) for s in stops if s and s in content]
+    return content[:min(positions)] if positions else content
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    server_version = "MockLLM/0.1"
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json({"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        config = self.server.config
+        messages = request.get("messages", [])
+
+        reply = config["responder"].respond(messages, bool(request.get("tools")))
+        content = apply_stop(reply.get("content"), request.get("stop"))
+        tool_calls = [
+            {
+                "id": f"call_{index}_{call['name']}",
+                "type": "function",
+                "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}), ensure_ascii=False)},
+            }
+            for index, call in enumerate(reply.get("tool_calls", []))
+        ]
+
+        with config["lock"]:
+            config["request_count"] += 1
+            request_id = f"chatcmpl-mock-{config['request_count']}"
+            delay = config["latency"] + config["random"].uniform(0, config["jitter"])
+        time.sleep(delay)
+
+        prompt_tokens = estimate_tokens(json.dumps(messages, ensure_ascii=False))
+        completion_tokens = estimate_tokens(content or "") + estimate_tokens(json.dumps(tool_calls))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+        model = request.get("model", "mock")
+        finish_reason = "tool_calls" if tool_calls else "stop"
+
+        try:
+            if request.get("stream"):
+                include_usage = (request.get("stream_options") or {}).get("include_usage", False)
+                self._stream(request_id, model, content, tool_calls, finish_reason, usage if include_usage else None)
+            else:
+                message = {"role": "assistant", "content": content}
+                if tool_calls:
+                    message["tool_calls"] = tool_calls
+                self._send_json({
+                    "id": request_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                    "usage": usage,
+                })
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端提前断开（例如 ReAct 流式模式收到 </action> 后关闭连接）
+            logger.debug("Client closed connection early: %s", request_id)
+
+    def _send_json(self, data: Dict[str, Any]):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, request_id: str, model: str, content: Optional[str], tool_calls: List[Dict[str, Any]],
+                finish_reason: str, usage: Optional[Dict[str, Any]]):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def send(choices, **extra):
+            chunk = {"id": request_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": choices, **extra}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        send([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        chunk_chars = self.server.config["chunk_chars"]
+        for start in range(0, len(content or ""), chunk_chars):
+            time.sleep(self.server.config["token_delay"])
+            send([{"index": 0, "delta": {"content": content[start:start + chunk_chars]}, "finish_reason": None}])
+        if tool_calls:
+            deltas = [{"index": index, **call} for index, call in enumerate(tool_calls)]
+            send([{"index": 0, "delta": {"tool_calls": deltas}, "finish_reason": None}])
+        send([{"index": 0, "delta": {}, "finish_reason": finish_reason}])
+        if usage is not None:
+            send([], usage=usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def create_server(host: str = "127.0.0.1", port: int = 8765, script_file: str = DEFAULT_SCRIPT_FILE,
+                  latency: float = 0.0, jitter: float = 0.0, token_delay: float = 0.0, chunk_chars: int = 4,
+                  seed: int = 0) -> ThreadingHTTPServer:
+    """创建服务器（不启动）；port=0 时由系统分配端口，可通过 server.server_address 获取"""
+    server = ThreadingHTTPServer((host, port), MockLLMHandler)
+    server.daemon_threads = True
+    server.config = {
+        "responder": ScriptedResponder.from_file(script_file),
+        "latency": latency,
+        "jitter": jitter,
+        "token_delay": token_delay,
+        "chunk_chars": chunk_chars,
+        "random": random.Random(seed),
+        "lock": threading.Lock(),
+        "request_count": 0,
+    }
+    return server
+
+
+def start_in_background(**kwargs) -> ThreadingHTTPServer:
+    """在后台线程中启动服务器，返回后可用 server.shutdown() 停止；方便在基准测试脚本内部使用"""
+    server = create_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 兼容的本地模拟 LLM 服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--script", default=DEFAULT_SCRIPT_FILE, help="回复脚本 JSON 文件")
+    parser.add_argument("--latency", type=float, default=0.0, help="每次请求的固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="额外随机延迟上限（秒，使用固定种子）")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="流式输出时每个 chunk 之间的延迟（秒）")
+    parser.add_argument("--chunk-chars", type=int, default=4, help="流式输出时每个 chunk 的字符数")
+    parser.add_argument("--seed", type=int, default=0, help="随机延迟的种子")
+    options = parser.parse_args()
+
+    server = create_server(options.host, options.port, options.script, options.latency, options.jitter,
+                           options.token_delay, options.chunk_chars, options.seed)
+    host, port = server.server_address[:2]
+    logger.info(f"Mock LLM server listening on http://{host}:{port}/v1")
+    logger.info(f"Script: {options.script}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+只读工具结果缓存与推测性预取
+多步骤任务中，模型在拿到 list_directory 的结果后，下一轮通常会读取或搜索其中的部分文件。
+开启推测模式后，每次 list_directory 返回时，根据用户问题和模型回复中提到的文件名、扩展名和引号中的关键词，
+在后台线程中预先执行 read_file / search_in_file，结果放进工具缓存；下一轮同样的调用直接命中缓存。
+
+- 缓存只保存注册表中标记为 read_only 的工具的结果，任何写操作都会清空缓存
+- 统计预取命中率和浪费的预取（从未被使用的结果）
+"""
+
+import contextvars
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from tool_registry import ToolRegistry
+from tools import resolve_path
+
+# 视为路径的参数名，缓存键中会做规范化（"./a.py" 与 "a.py" 命中同一项）
+PATH_ARGUMENTS = ("file_path", "path")
+
+# 问题或模型回复中提到的扩展名（如 .py）、完整文件名，以及引号中的关键词
+_EXTENSION = re.compile(r"(?<![\w/])\.([A-Za-z0-9]{1,8})\b")
+_FILE_NAME = re.compile(r"[\w\-]+\.[A-Za-z0-9]{1,8}")
+_QUOTED = re.compile(r"""['"‘“「]([^'"’”」\n]{1,64})['"’”」]""")
+
+
+def cache_key(tool: str, arguments: Dict[str, Any]) -> Tuple:
+    items = []
+    for name, value in sorted(arguments.items()):
+        if name in PATH_ARGUMENTS and isinstance(value, str):
+            value = os.path.normpath(value)
+        items.append((name, value))
+    return tool, tuple(items)
+
+
+class _Entry:
+    __slots__ = ("future", "speculative", "used")
+
+    def __init__(self, future: Future, speculative: bool):
+        self.future = future
+        self.speculative = speculative
+        self.used = False
+
+
+class SpeculativePrefetcher:
+    """
+    包装一次任务中的工具调用：只读工具走缓存，list_directory 之后在后台预取后续可能的调用
+
+    Args:
+        registry: 工具注册表（用于查找工具函数和 read_only 标记）
+        workers: 预取线程数
+        max_prefetch: 每次 list_directory 之后最多预取的调用数
+    """
+
+    def __init__(self, registry: ToolRegistry, workers: int = 4, max_prefetch: int = 8):
+        self.registry = registry
+        self.max_prefetch = max_prefetch
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self.cache: Dict[Tuple, _Entry] = {}
+        self.lock = threading.Lock()
+        self.stats = {
+            "prefetched": 0,
+            "prefetch_hits": 0,
+            # 命中时预取已经完成，模型这一轮完全不用等待工具
+            "prefetch_ready": 0,
+            "cache_hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "wasted": 0,
+            "wasted_seconds": 0.0,
+        }
+
+    def _run(self, tool: str, arguments: Dict[str, Any]) -> Tuple[Any, float]:
+        start = time.perf_counter()
+        result = self.registry[tool].func(**arguments)
+        return result, time.perf_counter() - start
+
+    def call(self, tool: str, arguments: Dict[str, Any]) -> Any:
+        """执行一次工具调用，只读工具优先使用缓存（包括仍在后台执行的预取）"""
+        if not self.registry[tool].read_only:
+            self.invalidate()
+            return self.registry[tool].func(**arguments)
+
+        key = cache_key(tool, arguments)
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None:
+                self.stats["cache_hits"] += 1
+                if entry.speculative and not entry.used:
+                    self.stats["prefetch_hits"] += 1
+                    if entry.future.done():
+                        self.stats["prefetch_ready"] += 1
+                entry.used = True
+            else:
+                self.stats["misses"] += 1
+        if entry is not None:
+            return entry.future.result()[0]
+
+        outcome = self._run(tool, arguments)
+        future: Future = Future()
+        future.set_result(outcome)
+        with self.lock:
+            self.cache[key] = _Entry(future, speculative=False)
+        return outcome[0]
+
+    def invalidate(self):
+        """写操作之后文件系统可能已改变，丢弃所有缓存（未使用的预取计为浪费）"""
+        with self.lock:
+            self._count_wasted()
+            self.cache.clear()
+            self.stats["invalidations"] += 1
+
+    def _count_wasted(self):
+        for entry in self.cache.values():
+            if entry.speculative and not entry.used:
+                self.stats["wasted"] += 1
+                if entry.future.done() and entry.future.exception() is None:
+                    self.stats["wasted_seconds"] += entry.future.result()[1]
+                else:
+                    entry.future.cancel()
+
+    def predict(self, directory: str, hint_text: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """根据目录内容和提示文本（用户问题 + 模型回复）预测后续的只读工具调用"""
+        extensions = {"." + ext.lower() for ext in _EXTENSION.findall(hint_text)}
+        names = set(_FILE_NAME.findall(hint_text))
+        keywords = [keyword.strip() for keyword in _QUOTED.findall(hint_text) if keyword.strip()]
+        if not extensions and not names:
+            return []
+
+        try:
+            entries = sorted(os.scandir(resolve_path(directory)), key=lambda entry: entry.name)
+        except OSError:
+            return []
+
+        predictions = []
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            if entry.name not in names and os.path.splitext(entry.name)[1].lower() not in extensions:
+                continue
+            file_path = os.path.join(directory, entry.name) if directory != "." else entry.name
+            if "read_file" in self.registry:
+                predictions.append(("read_file", {"file_path": file_path}))
+            if "search_in_file" in self.registry:
+                predictions.extend(("search_in_file", {"file_path": file_path, "keyword": keyword})
+                                   for keyword in keywords)
+        return predictions[:self.max_prefetch]
+
+    def observe(self, tool: str, arguments: Dict[str, Any], hint_text: str):
+        """工具返回后调用；list_directory 之后在后台预取预测的调用"""
+        if tool != "list_directory":
+            return
+        directory = arguments.get("path", ".")
+        for name, predicted in self.predict(directory, hint_text):
+            if name not in self.registry or not self.registry[name].read_only:
+                continue
+            key = cache_key(name, predicted)
+            with self.lock:
+                if key in self.cache:
+                    continue
+                # 在调用方的上下文中运行，预取线程使用与任务相同的工作目录
+                context = contextvars.copy_context()
+                self.cache[key] = _Entry(self.executor.submit(context.run, self._run, name, predicted),
+                                         speculative=True)
+                self.stats["prefetched"] += 1
+
+    def close(self) -> Dict[str, Any]:
+        """任务结束：统计浪费的预取，关闭线程池，返回统计信息"""
+        with self.lock:
+            self._count_wasted()
+            self.cache.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        return self.metrics()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self.lock:
+            prefetched = self.stats["prefetched"]
+            return {
+                **self.stats,
+                "hit_rate": self.stats["prefetch_hits"] / prefetched if prefetched else 0.0,
+            }
@@ -0,0 +1,175 @@
+"""
+速率限制感知的请求调度器
+多个并发任务（线程）共享同一个调度器，模型调用在发出前先排队：
+- 用令牌桶同时限制每分钟请求数（RPM）和每分钟 token 数（TPM，按估算的 prompt token 预扣，调用后按实际 usage 多退少补）
+- 按优先级（数字越小越优先）和到达顺序放行
+- 收到 429 时读取 Retry-After，暂停所有请求直到窗口恢复，然后重试
+- 提供队列深度、吞吐量等指标
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class TokenBucket:
+    """容量为每分钟额度、按秒匀速补充的令牌桶（非线程安全，由调度器加锁保护）"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.available = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """还需要等待多少秒才能取出 amount 个令牌"""
+        amount = min(amount, self.capacity)
+        return 0.0 if self.available >= amount else (amount - self.available) / self.rate
+
+    def take(self, amount: float):
+        self.available -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        self.available = min(self.capacity, self.available + amount)
+
+
+def estimate_tokens(text_chars: int, max_output_tokens: int = 0) -> int:
+    """按约 4 个字符一个 token 粗略估算本次调用会消耗的 token 数"""
+    return text_chars // 4 + max_output_tokens
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """从 429 错误中读取 Retry-After（兼容 retry-after-ms），读不到时返回 None"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+class RateLimitScheduler:
+    def __init__(self, requests_per_minute: float = 500, tokens_per_minute: float = 200_000,
+                 max_retries: int = 5, default_retry_after: float = 5.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.default_retry_after = default_retry_after
+        self.condition = threading.Condition()
+        self.waiting = []
+        self.sequence = itertools.count()
+        self.paused_until = 0.0
+        self.started = time.monotonic()
+        self.stats = {
+            "granted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rate_limited": 0,
+            "tokens_used": 0,
+            "total_wait": 0.0,
+            "max_queue_depth": 0,
+        }
+
+    def acquire(self, estimated_tokens: int, priority: int = 0) -> float:
+        """阻塞直到本次调用被放行，返回排队等待的秒数"""
+        entry = (priority, next(self.sequence))
+        start = time.monotonic()
+        with self.condition:
+            heapq.heappush(self.waiting, entry)
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self.waiting))
+            while True:
+                now = time.monotonic()
+                self.requests.refill(now)
+                self.tokens.refill(now)
+                if self.waiting[0] == entry:
+                    wait = max(self.paused_until - now, self.requests.wait_time(1),
+                               self.tokens.wait_time(estimated_tokens))
+                    if wait <= 0:
+                        heapq.heappop(self.waiting)
+                        self.requests.take(1)
+                        self.tokens.take(estimated_tokens)
+                        waited = now - start
+                        self.stats["granted"] += 1
+                        self.stats["total_wait"] += waited
+                        # 唤醒下一个排在队首的调用
+                        self.condition.notify_all()
+                        return waited
+                    self.condition.wait(timeout=wait)
+                else:
+                    self.condition.wait()
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """调用结束后按实际 token 数修正令牌桶：多扣的退回，少扣的补扣"""
+        with self.condition:
+            if actual_tokens is None:
+                actual_tokens = estimated_tokens
+            self.stats["tokens_used"] += actual_tokens
+            difference = estimated_tokens - actual_tokens
+            if difference > 0:
+                self.tokens.give_back(difference)
+                self.condition.notify_all()
+            else:
+                self.tokens.take(-difference)
+
+    def pause(self, seconds: float):
+        """服务端返回 429 时暂停所有调用"""
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.stats["rate_limited"] += 1
+            self.condition.notify_all()
+
+    def call(self, func: Callable[[], Any], estimated_tokens: int, priority: int = 0) -> Any:
+        """
+        排队后执行一次模型调用；遇到 429 按 Retry-After 暂停并重试
+
+        Args:
+            func: 无参函数，实际发出请求，返回值需带有 usage（可为 None）
+            estimated_tokens: 预估的 token 数，用于 TPM 预扣
+            priority: 优先级，数字越小越先放行
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire(estimated_tokens, priority)
+            try:
+                response = func()
+            except Exception as e:
+                # 请求没有真正消耗 token，退回预扣额度
+                self.settle(estimated_tokens, 0)
+                if _is_rate_limit_error(e) and attempt < self.max_retries:
+                    self.pause(_retry_after_seconds(e) or self.default_retry_after * (2 ** attempt))
+                    continue
+                with self.condition:
+                    self.stats["failed"] += 1
+                raise
+            usage = getattr(response, "usage", None)
+            self.settle(estimated_tokens, getattr(usage, "total_tokens", None))
+            with self.condition:
+                self.stats["completed"] += 1
+            return response
+
+    def metrics(self) -> Dict[str, Any]:
+        """队列深度、吞吐量、限流次数等指标"""
+        with self.condition:
+            elapsed_minutes = max(time.monotonic() - self.started, 1e-9) / 60
+            granted = self.stats["granted"]
+            return {
+                **self.stats,
+                "queue_depth": len(self.waiting),
+                "avg_wait": self.stats["total_wait"] / granted if granted else 0.0,
+                "requests_per_minute": self.stats["completed"] / elapsed_minutes,
+                "tokens_per_minute": self.stats["tokens_used"] / elapsed_minutes,
+                "paused_for": max(self.paused_until - time.monotonic(), 0.0),
+            }
@@ -0,0 +1,134 @@
+"""
+命令行入口的冷启动基准
+对每个入口模块在全新的解释器中运行 python -X importtime -c "import <模块>"，
+取多次运行的中位数作为导入耗时，并与启动预算比较；任何入口超出预算时以非零状态退出，可以直接放进 CI
+
+用法: python startup_benchmark.py [--runs 5] [--budget-scale 1.0] [--top 5] [--only agent rag]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+@dataclass
+class EntryPoint:
+    directory: str
+    module: str
+    # 冷启动预算（毫秒）：只统计导入入口模块本身，不包括解释器启动
+    budget_ms: float
+
+
+# 重依赖（openai、click、tiktoken、sentence_transformers、chromadb）都应推迟到第一次使用时才导入
+ENTRY_POINTS = [
+    EntryPoint("week2", "agent", 80),
+    EntryPoint("week2", "async_agent", 120),
+    EntryPoint("week3", "rag", 40),
+    EntryPoint("week4", "compare", 150),
+    EntryPoint("week4", "function_calling_agent", 120),
+    EntryPoint("week4", "mock_llm_server", 120),
+]
+
+# -X importtime 的输出行：import time: self [us] | cumulative | imported package
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """解析为 (模块名, 缩进层级, self 微秒, cumulative 微秒) 列表"""
+    records = []
+    for line in stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            records.append((name, len(indent) // 2, int(self_us), int(cumulative_us)))
+    return records
+
+
+def measure_once(entry: EntryPoint) -> Tuple[Optional[float], List[Tuple[str, int, int, int]], str]:
+    """运行一次，返回 (入口模块导入毫秒, 导入记录, 错误信息)"""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {entry.module}"],
+        cwd=os.path.join(REPO_ROOT, entry.directory),
+        capture_output=True,
+        text=True,
+    )
+    records = parse_importtime(process.stderr)
+    if process.returncode != 0:
+        error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else f"exit {process.returncode}"
+        return None, records, error
+    for name, level, _, cumulative_us in records:
+        if name == entry.module and level == 0:
+            return cumulative_us / 1000, records, ""
+    return None, records, "entry module not found in importtime output"
+
+
+def heaviest_imports(records: List[Tuple[str, int, int, int]], top: int) -> List[Tuple[str, float]]:
+    """按 self 时间排序的最慢导入（毫秒）"""
+    ranked = sorted(records, key=lambda record: record[2], reverse=True)[:top]
+    return [(name, self_us / 1000) for name, _, self_us, _ in ranked]
+
+
+def benchmark(entries: List[EntryPoint], runs: int, budget_scale: float, top: int) -> List[Dict]:
+    results = []
+    for entry in entries:
+        timings = []
+        records = []
+        error = ""
+        for _ in range(runs):
+            elapsed, records, error = measure_once(entry)
+            if elapsed is None:
+                break
+            timings.append(elapsed)
+
+        budget = entry.budget_ms * budget_scale
+        median = statistics.median(timings) if timings and not error else None
+        results.append({
+            "entry": f"{entry.directory}/{entry.module}.py",
+            "median_ms": median,
+            "min_ms": min(timings) if median is not None else None,
+            "budget_ms": budget,
+            "ok": median is not None and median <= budget,
+            "error": error,
+            "heaviest": heaviest_imports(records, top),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="命令行入口冷启动基准（python -X importtime）")
+    parser.add_argument("--runs", type=int, default=5, help="每个入口运行的次数（取中位数）")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="预算倍数，慢机器上可以调大")
+    parser.add_argument("--top", type=int, default=5, help="每个入口列出最慢的几个导入")
+    parser.add_argument("--only", nargs="+", help="只测试这些模块")
+    options = parser.parse_args()
+
+    entries = [entry for entry in ENTRY_POINTS if not options.only or entry.module in options.only]
+    results = benchmark(entries, options.runs, options.budget_scale, options.top)
+
+    print(f"{'入口':<34} {'中位数(ms)':>10} {'最小(ms)':>10} {'预算(ms)':>10}  结果")
+    for result in results:
+        if result["error"]:
+            print(f"{result['entry']:<34} {'-':>10} {'-':>10} {result['budget_ms']:>10.0f}  ❌ {result['error']}")
+            continue
+        status = "✅" if result["ok"] else "❌ 超出预算"
+        print(f"{result['entry']:<34} {result['median_ms']:>10.1f} {result['min_ms']:>10.1f} "
+              f"{result['budget_ms']:>10.0f}  {status}")
+        if not result["ok"]:
+            for name, self_ms in result["heaviest"]:
+                print(f"    {self_ms:>8.1f} ms  {name}")
+
+    failed = [result["entry"] for result in results if not result["ok"]]
+    if failed:
+        print(f"\n{len(failed)} 个入口未达标: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
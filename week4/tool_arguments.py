@@ -0,0 +1,133 @@
+"""
+工具调用参数的快速解码与校验
+在执行工具之前：
+- 优先使用 orjson（已安装时）解析 tool_call.function.arguments
+- 解析失败时修复模型常见的格式错误（字符串中未转义的换行/控制字符、尾随逗号、空参数）
+- 用预编译的 schema 校验函数检查参数
+- 不合法时立即生成结构化错误作为工具结果返回给模型，而不是在工具内部抛异常
+并统计修复率、错误率等指标
+"""
+
+import json
+import re
+import threading
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+try:
+    import orjson
+    _fast_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _fast_loads = json.loads
+
+from tool_registry import ToolRegistry
+
+# 对象或数组结束前多余的逗号；只在严格解析失败后使用，极少数情况下可能误改字符串中的 ",}"
+_TRAILING_COMMA = re.compile(r",\s*(?=[}\]])")
+
+
+def decode_arguments(raw: Optional[str]) -> Tuple[Any, Optional[str]]:
+    """
+    解析参数 JSON，返回 (参数, 修复类型)；无需修复时修复类型为 None
+    无法修复时抛出 json.JSONDecodeError
+    """
+    if raw is None or not raw.strip():
+        return {}, "empty"
+    try:
+        return _fast_loads(raw), None
+    except ValueError:
+        pass
+    # strict=False 允许字符串中出现未转义的换行、制表符等控制字符
+    try:
+        return json.loads(raw, strict=False), "control_characters"
+    except json.JSONDecodeError as e:
+        error = e
+    repaired = _TRAILING_COMMA.sub("", raw)
+    if repaired != raw:
+        try:
+            return json.loads(repaired, strict=False), "trailing_comma"
+        except json.JSONDecodeError:
+            pass
+    raise error
+
+
+def error_result(tool: str, kind: str, details: List[str], schema: Optional[Dict[str, Any]] = None) -> str:
+    """返回给模型的结构化错误，附带 schema 方便模型在下一轮直接改正"""
+    payload = {"error": kind, "tool": tool, "details": details}
+    if schema is not None:
+        payload["parameters"] = schema
+    return json.dumps(payload, ensure_ascii=False)
+
+
+class ToolCallValidator:
+    """
+    解码并校验工具调用参数（线程安全，可以被多个 agent 共享）
+
+    Args:
+        validators: 工具名到预编译校验函数的映射
+        schemas: 工具名到参数 schema 的映射，出错时附在错误信息中
+    """
+
+    def __init__(self, validators: Mapping[str, Callable[[Dict[str, Any]], List[str]]],
+                 schemas: Optional[Mapping[str, Dict[str, Any]]] = None):
+        self.validators = dict(validators)
+        self.schemas = dict(schemas or {})
+        self._lock = threading.Lock()
+        self.stats = {
+            "calls": 0,
+            "repaired": 0,
+            "invalid_json": 0,
+            "invalid_arguments": 0,
+            "unknown_tool": 0,
+            "repairs": {},
+        }
+
+    @classmethod
+    def from_registry(cls, registry: ToolRegistry) -> "ToolCallValidator":
+        return cls({tool.name: tool.validate for tool in registry},
+                   {tool.name: tool.parameters for tool in registry})
+
+    def _record(self, outcome: Optional[str], repair: Optional[str] = None):
+        """记录一次调用的结果：outcome 为错误类型（合法时为 None），repair 为修复类型"""
+        with self._lock:
+            self.stats["calls"] += 1
+            if outcome is not None:
+                self.stats[outcome] += 1
+            if repair is not None:
+                self.stats["repaired"] += 1
+                self.stats["repairs"][repair] = self.stats["repairs"].get(repair, 0) + 1
+
+    def prepare(self, tool: str, raw: Optional[str]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        返回 (参数, 错误)：参数合法时错误为 None；否则参数为 None，错误是应直接作为工具结果返回给模型的字符串
+        """
+        validate = self.validators.get(tool)
+        if validate is None:
+            self._record("unknown_tool")
+            return None, error_result(tool, "unknown_tool", [f"available tools: {', '.join(self.validators)}"])
+
+        try:
+            arguments, repair = decode_arguments(raw)
+        except json.JSONDecodeError as e:
+            self._record("invalid_json")
+            return None, error_result(tool, "invalid_json", [str(e)], self.schemas.get(tool))
+
+        errors = validate(arguments)
+        if errors:
+            self._record("invalid_arguments", repair)
+            return None, error_result(tool, "invalid_arguments", errors, self.schemas.get(tool))
+        self._record(None, repair)
+        return arguments, None
+
+    def metrics(self) -> Dict[str, Any]:
+        """修复率、各类错误率等指标"""
+        with self._lock:
+            calls = self.stats["calls"]
+            rejected = self.stats["invalid_json"] + self.stats["invalid_arguments"] + self.stats["unknown_tool"]
+            return {
+                **self.stats,
+                "repairs": dict(self.stats["repairs"]),
+                "repair_rate": self.stats["repaired"] / calls if calls else 0.0,
+                "rejection_rate": rejected / calls if calls else 0.0,
+                "json_backend": "orjson" if orjson is not None else "json",
+            }
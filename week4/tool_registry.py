@@ -0,0 +1,251 @@
+"""
+基于装饰器的工具注册表
+注册时根据类型注解一次性生成 JSON Schema，并缓存 OpenAI / MCP / ReAct 文本三种序列化形式，
+同时预编译参数校验函数，之后每次渲染提示或调用工具都不再重复计算
+
+用法:
+    registry = ToolRegistry()
+
+    @registry.tool("读取指定文件的完整内容", file_path="文件的路径")
+    def read_file(file_path: str) -> str:
+        ...
+
+    registry.openai_tools()          # 传给 chat.completions.create(tools=...)
+    registry.call("read_file", args) # 校验参数后执行
+"""
+
+import inspect
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union, get_args, get_origin, get_type_hints
+
+# Python 类型注解到 JSON Schema 类型的映射
+JSON_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    tuple: "array",
+    dict: "object",
+}
+
+# JSON Schema 类型对应的 Python 类型（用于校验；JSON 中的整数也是合法的 number）
+PYTHON_TYPES = {
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "array": (list,),
+    "object": (dict,),
+}
+
+
+class ToolArgumentError(ValueError):
+    """工具参数不符合 schema"""
+
+    def __init__(self, tool: str, errors: List[str]):
+        super().__init__(f"Invalid arguments for {tool}: " + "; ".join(errors))
+        self.tool = tool
+        self.errors = errors
+
+
+def _json_schema(annotation) -> Dict[str, Any]:
+    """
+    把类型注解转换为 JSON Schema；Optional[X] 取 X，List[X] 同时生成 items，
+    无法识别时返回空 schema（不做类型约束）
+    """
+    origin = get_origin(annotation)
+    if origin is Union:
+        candidates = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return _json_schema(candidates[0]) if len(candidates) == 1 else {}
+    json_type = JSON_TYPES.get(origin or annotation)
+    if json_type is None:
+        return {}
+    schema = {"type": json_type}
+    args = get_args(annotation)
+    if json_type == "array" and args:
+        schema["items"] = _json_schema(args[0])
+    return schema
+
+
+def _python_types(json_type) -> Optional[Tuple[type, ...]]:
+    """JSON Schema 的 type（字符串或列表）对应的 Python 类型；包含无法识别的类型时返回 None（不做类型约束）"""
+    json_types = json_type if isinstance(json_type, list) else [json_type]
+    python_types = []
+    for item in json_types:
+        if item == "null":
+            python_types.append(type(None))
+        elif item in PYTHON_TYPES:
+            python_types.extend(PYTHON_TYPES[item])
+        else:
+            return None
+    return tuple(python_types)
+
+
+def compile_validator(name: str, schema: Dict[str, Any]) -> Callable[[Dict[str, Any]], List[str]]:
+    """
+    把对象类型的 JSON Schema 预编译为参数校验函数，返回错误列表（为空表示通过）
+    只校验顶层的必填参数、参数类型和多余参数，足以拦截模型最常见的错误
+    """
+    properties = schema.get("properties") or {}
+    required = list(schema.get("required") or [])
+    checks = []
+    for param, param_schema in properties.items():
+        python_types = _python_types(param_schema.get("type"))
+        if python_types and param not in required and "default" in param_schema and param_schema["default"] is None:
+            # 默认值为 null 的可选参数：模型显式传 null 等同于省略
+            python_types += (type(None),)
+        if python_types:
+            json_type = param_schema["type"]
+            # bool 是 int 的子类，schema 不允许 boolean 时需要单独排除
+            allow_bool = json_type == "boolean" or (isinstance(json_type, list) and "boolean" in json_type)
+            type_name = "|".join(json_type) if isinstance(json_type, list) else json_type
+            checks.append((param, python_types, allow_bool, type_name))
+    required_set = frozenset(required)
+    known = frozenset(properties) if schema.get("additionalProperties") is False else None
+
+    def validate(arguments: Dict[str, Any]) -> List[str]:
+        if not isinstance(arguments, dict):
+            return [f"arguments must be a JSON object, got {type(arguments).__name__}"]
+        errors = []
+        if not required_set <= arguments.keys():
+            errors.extend(f"missing required argument '{param}'" for param in required if param not in arguments)
+        for param, python_types, allow_bool, type_name in checks:
+            if param in arguments:
+                value = arguments[param]
+                if not isinstance(value, python_types) or (isinstance(value, bool) and not allow_bool):
+                    errors.append(f"argument '{param}' must be of type {type_name}, got {type(value).__name__}")
+        if known is not None and not arguments.keys() <= known:
+            errors.extend(f"unknown argument '{param}'" for param in arguments if param not in known)
+        return errors
+
+    validate.__name__ = f"validate_{name}"
+    return validate
+
+
+@dataclass
+class Tool:
+    name: str
+    func: Callable[..., Any]
+    description: str
+    parameters: Dict[str, Any]
+    validate: Callable[[Dict[str, Any]], List[str]]
+    # 只读工具没有副作用，可以安全地缓存或预取
+    read_only: bool = False
+    openai: Dict[str, Any] = field(init=False)
+    mcp: Dict[str, Any] = field(init=False)
+    react_text: str = field(init=False)
+
+    def __post_init__(self):
+        self.openai = {
+            "type": "function",
+            "function": {"name": self.name, "description": self.description, "parameters": self.parameters},
+        }
+        self.mcp = {"name": self.name, "description": self.description, "inputSchema": self.parameters}
+        self.react_text = f"- {self.name}{inspect.signature(self.func)}: {self.description}"
+
+
+class ToolRegistry:
+    def __init__(self):
+        self._tools: Dict[str, Tool] = {}
+        self._openai_cache: Dict[Optional[Tuple[str, ...]], List[Dict[str, Any]]] = {}
+
+    def tool(self, description: Optional[str] = None, *, name: Optional[str] = None, read_only: bool = False,
+             **param_descriptions: str) -> Callable:
+        """
+        注册工具的装饰器，返回原函数（可以照常直接调用）
+
+        Args:
+            description: 工具描述，默认使用函数的 docstring
+            name: 工具名，默认使用函数名
+            read_only: 工具是否只读
+            **param_descriptions: 各参数的描述
+        """
+        def decorator(func: Callable) -> Callable:
+            self.register(func, description, name=name, read_only=read_only, **param_descriptions)
+            return func
+        return decorator
+
+    def register(self, func: Callable, description: Optional[str] = None, *, name: Optional[str] = None,
+                 read_only: bool = False, **param_descriptions: str) -> Tool:
+        """根据函数签名和类型注解生成 schema 并注册"""
+        name = name or func.__name__
+        hints = get_type_hints(func)
+        properties = {}
+        required = []
+        for param in inspect.signature(func).parameters.values():
+            schema = _json_schema(hints.get(param.name))
+            if param.name in param_descriptions:
+                schema["description"] = param_descriptions[param.name]
+            if param.default is inspect.Parameter.empty:
+                required.append(param.name)
+            else:
+                schema["default"] = param.default
+            properties[param.name] = schema
+
+        parameters = {
+            "type": "object",
+            "properties": properties,
+            "required": required,
+            "additionalProperties": False,
+        }
+        tool = Tool(
+            name=name,
+            func=func,
+            description=description or inspect.getdoc(func) or "",
+            parameters=parameters,
+            validate=compile_validator(name, parameters),
+            read_only=read_only,
+        )
+        self._tools[name] = tool
+        self._openai_cache.clear()
+        # week2 的 ReActAgent 渲染工具列表时直接读取这个属性
+        func.react_description = tool.react_text
+        return tool
+
+    def __getitem__(self, name: str) -> Tool:
+        return self._tools[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def __iter__(self) -> Iterator[Tool]:
+        return iter(self._tools.values())
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    @property
+    def functions(self) -> Dict[str, Callable]:
+        """工具名到函数的映射"""
+        return {name: tool.func for name, tool in self._tools.items()}
+
+    def openai_tools(self, names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """OpenAI Function Calling 的 tools 参数（按名称子集缓存，每次返回同一个列表）"""
+        key = tuple(names) if names is not None else None
+        if key not in self._openai_cache:
+            selected = self._tools.values() if names is None else (self._tools[name] for name in names)
+            self._openai_cache[key] = [tool.openai for tool in selected]
+        return self._openai_cache[key]
+
+    def mcp_tools(self) -> List[Dict[str, Any]]:
+        """MCP list_tools 所需的 name / description / inputSchema"""
+        return [tool.mcp for tool in self._tools.values()]
+
+    def react_tool_list(self) -> str:
+        """ReAct 系统提示中的工具列表文本"""
+        return "\n".join(tool.react_text for tool in self._tools.values())
+
+    def validate(self, name: str, arguments: Dict[str, Any]) -> List[str]:
+        """校验参数，返回错误列表；未知工具也作为错误返回"""
+        tool = self._tools.get(name)
+        if tool is None:
+            return [f"unknown tool '{name}'"]
+        return tool.validate(arguments)
+
+    def call(self, name: str, arguments: Dict[str, Any]) -> Any:
+        """校验参数后执行工具，参数不合法时抛出 ToolArgumentError"""
+        errors = self.validate(name, arguments)
+        if errors:
+            raise ToolArgumentError(name, errors)
+        return self._tools[name].func(**arguments)
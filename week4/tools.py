@@ -0,0 +1,145 @@
+"""
+文件系统工具
+compare.py、FunctionCallingAgent 和 MCP 服务器共用同一个注册表：每个工具只定义一次，
+schema 和描述在注册时生成一次；各入口需要的额外限制（例如 MCP 服务器的路径检查）在调用方包装
+
+用法:
+    from tools import registry
+    registry.openai_tools()                     # 全部工具
+    registry.openai_tools(["read_file", ...])   # 工具子集
+
+    with working_directory("/tmp/task-1"):     # 相对路径按该目录解析（只影响当前线程 / 协程）
+        registry.call("read_file", {"file_path": "a.txt"})
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from tool_registry import ToolRegistry
+
+# 文件编辑逻辑与 week2 的 ReAct Agent 共用
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'week2'))
+import file_edit
+
+registry = ToolRegistry()
+
+# 当前任务的工作目录；并发任务共享进程的 cwd，所以各自通过这个上下文变量解析相对路径
+_workdir: ContextVar[Optional[str]] = ContextVar("workdir", default=None)
+
+
+def resolve_path(path: str) -> str:
+    """按当前任务的工作目录解析相对路径；未设置工作目录时原样返回（相对于进程 cwd）"""
+    workdir = _workdir.get()
+    return os.path.join(workdir, path) if workdir else path
+
+
+@contextmanager
+def working_directory(path: Optional[str]) -> Iterator[None]:
+    """在 with 块内（当前线程 / 协程）把工具的相对路径解析到 path；path 为 None 时不改变"""
+    token = _workdir.set(path)
+    try:
+        yield
+    finally:
+        _workdir.reset(token)
+
+
+@registry.tool("读取指定文件的完整内容。适用于查看文本文件、配置文件、代码文件等。", read_only=True,
+               file_path="文件的路径（绝对路径或相对路径）")
+def read_file(file_path: str) -> str:
+    """读取文件内容"""
+    try:
+        with open(resolve_path(file_path), 'r', encoding='utf-8') as f:
+            content = f.read()
+        return content
+    except FileNotFoundError:
+        return f"Error: File '{file_path}' not found"
+    except Exception as e:
+        return f"Error reading file: {str(e)}"
+
+
+@registry.tool("将内容写入指定文件。如果文件已存在会覆盖，如果目录不存在会自动创建。",
+               file_path="目标文件的路径", content="要写入的内容")
+def write_file(file_path: str, content: str) -> str:
+    """写入文件"""
+    try:
+        # 确保目录存在
+        target = resolve_path(file_path)
+        directory = os.path.dirname(target)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with open(target, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return f"Successfully wrote {len(content)} characters to {file_path}"
+    except Exception as e:
+        return f"Error writing file: {str(e)}"
+
+
+@registry.tool("只修改文件中需要改动的部分，不必输出整个文件。修改已有文件时优先使用本工具而不是 write_file；锚点文本不匹配时文件保持不变。",
+               file_path="要修改的文件路径",
+               edits='search/replace 块列表，如 [{"search": "文件中的原文", "replace": "替换后的内容"}]，每个 search 必须在文件中恰好出现一次',
+               diff="unified diff 文本（以 @@ -起始行,行数 +起始行,行数 @@ 开头的 hunk），与 edits 二选一")
+def edit_file(file_path: str, edits: Optional[List[Dict[str, str]]] = None, diff: Optional[str] = None) -> str:
+    """局部修改文件"""
+    try:
+        return file_edit.edit_file(resolve_path(file_path), edits=edits, diff=diff)
+    except FileNotFoundError:
+        return f"Error: File '{file_path}' not found"
+    except Exception as e:
+        return f"Error editing file: {str(e)}"
+
+
+@registry.tool("列出指定目录下的所有文件和子目录，显示文件大小信息。", read_only=True,
+               path="目录路径，默认为当前目录 (.)")
+def list_directory(path: str = ".") -> str:
+    """列出目录内容"""
+    try:
+        directory = resolve_path(path)
+        items = os.listdir(directory)
+        if not items:
+            return f"Directory '{path}' is empty"
+
+        # 分类文件和目录
+        files = []
+        dirs = []
+        for item in items:
+            full_path = os.path.join(directory, item)
+            if os.path.isdir(full_path):
+                dirs.append(f"📁 {item}/")
+            else:
+                size = os.path.getsize(full_path)
+                files.append(f"📄 {item} ({size} bytes)")
+
+        result = f"Contents of '{path}':\n"
+        if dirs:
+            result += "\nDirectories:\n" + "\n".join(dirs)
+        if files:
+            result += "\n\nFiles:\n" + "\n".join(files)
+
+        return result
+    except Exception as e:
+        return f"Error listing directory: {str(e)}"
+
+
+@registry.tool("在指定文件中搜索包含关键词的所有行，返回行号和内容。", read_only=True,
+               file_path="要搜索的文件路径", keyword="要搜索的关键词")
+def search_in_file(file_path: str, keyword: str) -> str:
+    """在文件中搜索关键词"""
+    try:
+        with open(resolve_path(file_path), 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+
+        matches = []
+        for i, line in enumerate(lines, 1):
+            if keyword in line:
+                matches.append(f"Line {i}: {line.strip()}")
+
+        if matches:
+            return f"Found {len(matches)} matches in {file_path}:\n" + "\n".join(matches)
+        else:
+            return f"No matches found for '{keyword}' in {file_path}"
+    except Exception as e:
+        return f"Error searching file: {str(e)}"
@@ -0,0 +1,104 @@
+"""
+追踪报告工具
+读取 tracing.py 写出的 JSONL，按任务（trace）打印火焰图式的耗时分解，以及按 span 名称的汇总
+
+用法: python trace_report.py traces.jsonl [--trace-id ID] [--width 40]
+"""
+
+import argparse
+import json
+from collections import defaultdict
+from typing import Dict, List
+
+
+def load_spans(path: str) -> Dict[str, List[dict]]:
+    """按 trace_id 分组"""
+    traces = defaultdict(list)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+def _format_attributes(attributes: dict) -> str:
+    keys = ("tool", "prompt_tokens", "completion_tokens", "cached_tokens", "payload_chars", "result_chars")
+    return " ".join(f"{key}={attributes[key]}" for key in keys if key in attributes)
+
+
+def print_trace(spans: List[dict], width: int):
+    """以缩进表示层级，条形长度与起止时间对应整个任务的时间轴"""
+    children = defaultdict(list)
+    span_ids = {span["span_id"] for span in spans}
+    roots = []
+    for span in sorted(spans, key=lambda s: s["start_ns"]):
+        if span["parent_id"] in span_ids:
+            children[span["parent_id"]].append(span)
+        else:
+            roots.append(span)
+
+    for root in roots:
+        origin = root["start_ns"]
+        total = max(root["end_ns"] - origin, 1)
+        print(f"\n🧵 trace {root['trace_id'][:8]}  {root['name']}  {root['duration_ms']:.1f} ms  "
+              f"{_format_attributes(root['attributes'])}")
+
+        def walk(span: dict, depth: int):
+            offset = int((span["start_ns"] - origin) / total * width)
+            length = max(1, int((span["end_ns"] - span["start_ns"]) / total * width))
+            bar = " " * offset + "█" * length
+            label = "  " * depth + span["name"]
+            status = " ✗" if span["status"] == "error" else ""
+            print(f"  {label:<28} {bar:<{width}} {span['duration_ms']:>9.1f} ms "
+                  f"{span['duration_ms'] / (total / 1e6) * 100:>5.1f}%{status}  {_format_attributes(span['attributes'])}")
+            for child in children[span["span_id"]]:
+                walk(child, depth + 1)
+
+        for child in children[root["span_id"]]:
+            walk(child, 0)
+
+
+def print_breakdown(spans: List[dict]):
+    """按 span 名称汇总自身耗时（扣除子 span），找出时间主要花在哪里"""
+    child_time = defaultdict(float)
+    for span in spans:
+        if span["parent_id"]:
+            child_time[span["parent_id"]] += span["duration_ms"]
+
+    totals = defaultdict(lambda: [0, 0.0])
+    for span in spans:
+        entry = totals[span["name"]]
+        entry[0] += 1
+        entry[1] += max(span["duration_ms"] - child_time[span["span_id"]], 0.0)
+
+    grand_total = sum(total for _, total in totals.values()) or 1.0
+    print(f"\n{'span':<16} {'次数':>6} {'自身耗时(ms)':>14} {'占比':>7}")
+    print("-" * 48)
+    for name, (count, total) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        print(f"{name:<16} {count:>6} {total:>14.1f} {total / grand_total * 100:>6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按任务展示 agent 追踪数据的耗时分解")
+    parser.add_argument("trace_file", help="tracing.JsonlExporter 写出的 JSONL 文件")
+    parser.add_argument("--trace-id", help="只显示指定 trace（支持前缀）")
+    parser.add_argument("--width", type=int, default=40, help="时间轴宽度（字符）")
+    options = parser.parse_args()
+
+    traces = load_spans(options.trace_file)
+    if options.trace_id:
+        traces = {tid: spans for tid, spans in traces.items() if tid.startswith(options.trace_id)}
+
+    all_spans = []
+    for spans in traces.values():
+        print_trace(spans, options.width)
+        all_spans.extend(spans)
+
+    print("\n" + "=" * 48)
+    print(f"共 {len(traces)} 个任务")
+    print_breakdown(all_spans)
+
+
+if __name__ == "__main__":
+    main()
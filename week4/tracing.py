@@ -0,0 +1,208 @@
+"""
+轻量级追踪层
+为 agent 循环中的每次模型调用、工具调用和解析记录 span（含 token 数、负载大小等属性），
+导出到本地 JSONL 文件，或在安装了 opentelemetry-sdk 时桥接到 OpenTelemetry
+
+用法:
+    tracer = Tracer([JsonlExporter("traces.jsonl")])
+    with tracer.span("task", query_chars=100) as span:
+        ...
+        span.set(tokens=42)
+
+环境变量:
+    AGENT_TRACE_FILE=traces.jsonl   写入 JSONL（可用 trace_report.py 查看）
+    AGENT_TRACE_OTEL=1              同时桥接到 OpenTelemetry 全局 TracerProvider
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+# 当前正在进行的 span，contextvars 在线程和 asyncio 任务之间都能正确传递父子关系
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.parent = _current_span.get()
+        self.trace_id = self.parent.trace_id if self.parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.start_ns = 0
+        self.end_ns = 0
+        self.status = "ok"
+        # 供导出器保存自己的状态（例如对应的 OpenTelemetry span）
+        self.exporter_state: Dict[str, Any] = {}
+        self._token = None
+
+    def set(self, **attributes):
+        """添加或覆盖属性"""
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def __enter__(self) -> "Span":
+        self.start_ns = time.time_ns()
+        self._token = _current_span.set(self)
+        for exporter in self.tracer.exporters:
+            exporter.on_start(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.status = "error"
+            self.attributes["error"] = f"{exc_type.__name__}: {exc}"
+        for exporter in self.tracer.exporters:
+            exporter.on_end(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+class Tracer:
+    def __init__(self, exporters: Optional[List[Any]] = None):
+        self.exporters = exporters or []
+
+    @property
+    def enabled(self) -> bool:
+        """没有导出器时不记录任何内容；调用方可据此跳过计算代价较高的属性（如负载大小）"""
+        return bool(self.exporters)
+
+    def span(self, name: str, **attributes):
+        if not self.exporters:
+            return _NoopSpan()
+        return Span(self, name, attributes)
+
+    def shutdown(self):
+        for exporter in self.exporters:
+            exporter.shutdown()
+
+
+class JsonlExporter:
+    """span 结束时追加一行 JSON；多线程安全"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "a", encoding="utf-8")
+
+    def on_start(self, span: Span):
+        pass
+
+    def on_end(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def shutdown(self):
+        with self.lock:
+            self.file.close()
+
+
+class OpenTelemetryExporter:
+    """把 span 桥接到 OpenTelemetry（需要安装 opentelemetry-api，导出目标由全局 TracerProvider 决定）"""
+
+    def __init__(self, service_name: str = "cs309-agent"):
+        from opentelemetry import trace
+        self.trace = trace
+        self.otel_tracer = trace.get_tracer(service_name)
+
+    def on_start(self, span: Span):
+        context = None
+        if span.parent is not None and "otel" in span.parent.exporter_state:
+            context = self.trace.set_span_in_context(span.parent.exporter_state["otel"])
+        span.exporter_state["otel"] = self.otel_tracer.start_span(span.name, context=context,
+                                                                  start_time=span.start_ns)
+
+    def on_end(self, span: Span):
+        otel_span = span.exporter_state.pop("otel")
+        for key, value in span.attributes.items():
+            otel_span.set_attribute(key, value if isinstance(value, (str, bool, int, float)) else str(value))
+        if span.status == "error":
+            otel_span.set_status(self.trace.Status(self.trace.StatusCode.ERROR))
+        otel_span.end(end_time=span.end_ns)
+
+    def shutdown(self):
+        pass
+
+
+NOOP_TRACER = Tracer()
+
+
+def tracer_from_env() -> Tracer:
+    """
+    根据 AGENT_TRACE_FILE / AGENT_TRACE_OTEL 环境变量返回 Tracer，都未设置时返回不记录任何内容的 Tracer。
+    同一进程内相同配置共用一个 Tracer：每次运行都调用也只打开一次追踪文件，
+    并发线程的 span 经同一把锁写入，不会交错；进程退出时关闭
+    """
+    return _shared_tracer(os.getenv("AGENT_TRACE_FILE") or None, os.getenv("AGENT_TRACE_OTEL") == "1")
+
+
+@lru_cache(maxsize=None)
+def _shared_tracer(trace_file: Optional[str], otel: bool) -> Tracer:
+    exporters = []
+    if trace_file:
+        exporters.append(JsonlExporter(trace_file))
+    if otel:
+        exporters.append(OpenTelemetryExporter())
+    if not exporters:
+        return NOOP_TRACER
+    tracer = Tracer(exporters)
+    atexit.register(tracer.shutdown)
+    return tracer
+
+
+def message_text(message) -> str:
+    """消息中发送给模型的文本：content 以及 tool_calls 的函数名和参数，兼容 dict 和 SDK 返回的消息对象"""
+    if isinstance(message, dict):
+        content, tool_calls = message.get("content"), message.get("tool_calls")
+    else:
+        content, tool_calls = message.content, message.tool_calls
+    parts = [content or ""]
+    for tool_call in tool_calls or []:
+        function = tool_call["function"] if isinstance(tool_call, dict) else tool_call.function
+        if isinstance(function, dict):
+            parts += [function["name"], function["arguments"]]
+        else:
+            parts += [function.name, function.arguments]
+    return "".join(parts)
+
+
+def message_chars(messages) -> int:
+    """消息历史的字符数（见 message_text）"""
+    return sum(len(message_text(message)) for message in messages)